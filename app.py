@@ -1,292 +1,610 @@
-from flask import Flask, render_template, request, jsonify
-import pickle
-import pandas as pd
+from flask import Flask, abort, g, render_template, request, jsonify, url_for
+import hmac
 import json
 import os
-from datetime import datetime, timedelta
-import random
+import re
+import secrets
+import sys
+import time
+from datetime import datetime
+from assessment_store import AssessmentStore
+from community_stats import CommunityStats, cohort_features, stats_paths
+from features import (FEATURE_COLUMNS, FeatureError, encode_records, extract_features,
+                      parse_assessment, risk_label)
+import metrics
+from health_metrics import (bmi_categories, cholesterol_levels, fitness_levels,
+                            heart_rate_zones, scalar_row)
+from inference import DECISION_THRESHOLD
+from model_loader import default_model_path
+from model_registry import ModelRegistry
+from web_assets import IMMUTABLE_MAX_AGE, AssetManifest, PageShell, choose_encoding
 
 app = Flask(__name__)
 
-# Load the trained model pipeline
-model_path = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
-try:
-    model = pickle.load(open(model_path, 'rb'))
-except FileNotFoundError:
-    print(f"Error: Model file not found at {model_path}")
-    model = None
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+# Upper bound on rows accepted by /api/predict/batch in a single request
+MAX_BATCH_SIZE = int(os.environ.get('CARDIOCHECK_MAX_BATCH_SIZE', 10000))
+# Rows per batch with ?explain=1; exact TreeSHAP costs about 1 ms per uncached row
+MAX_EXPLAIN_BATCH_SIZE = int(os.environ.get('CARDIOCHECK_MAX_EXPLAIN_BATCH', 256))
+
+# Serve the trained model: the memory-mapped bundle (model_bundle.py), or
+# the legacy pickle if there is no bundle. CARDIOCHECK_MODEL_ENGINE picks
+# how it is scored (see model_loader.py); retrained model files are picked
+# up without a restart (see model_registry.py).
+model_path = default_model_path(os.path.dirname(os.path.abspath(__file__)))
+model_registry = ModelRegistry(
+    model_path,
+    engine=os.environ.get('CARDIOCHECK_MODEL_ENGINE', 'auto'),
+    keep=int(os.environ.get('CARDIOCHECK_MODEL_HISTORY', 3)),
+    watch_interval=float(os.environ.get('CARDIOCHECK_MODEL_WATCH_INTERVAL', 5))
+)
+# The model is loaded by warm_up() (gunicorn and the ASGI lifespan call it
+# before serving) or on first use, so importing the app stays fast.
+# CARDIOCHECK_PRELOAD_MODEL=1 loads it right here instead.
+if os.environ.get('CARDIOCHECK_PRELOAD_MODEL', '0') == '1':
+    model_registry.load_initial()
+
+# Every form prediction is logged for the health timeline (see assessment_store.py).
+# Browsers are told apart by an anonymous random id kept in a cookie. The
+# database lives in the instance directory, outside the code tree.
+assessment_store = AssessmentStore.from_env(os.path.join(app.instance_path, 'assessments.db'))
+USER_COOKIE = 'cardiocheck_user'
+USER_COOKIE_MAX_AGE = 2 * 365 * 24 * 3600
+USER_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+TIMELINE_DAYS = 180
+TIMELINE_POINTS = 12
+MAX_TIMELINE_POINTS = 366
+
+# Cohort statistics per model file hash (community_stats.py build), loaded on first use
+_community_stats = {}
+
+# The page is rendered once into a shell and static files are served from a
+# fingerprinted, precompressed build (see web_assets.py); both are made on first use
+ASSET_DIR = os.environ.get('CARDIOCHECK_ASSET_DIR', os.path.join(app.static_folder, 'dist'))
+_asset_manifest = None
+_page_shell = None
+
+# Shared secret for the /admin/model endpoints; they are disabled when unset
+ADMIN_TOKEN = os.environ.get('CARDIOCHECK_ADMIN_TOKEN')
+
+@app.before_request
+def start_model_watcher():
+    model_registry.ensure_watching()
+
+@app.before_request
+def start_request_timer():
+    g.request_timer = metrics.RequestTimer(request.endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    timer = g.get('request_timer')
+    if timer is not None:
+        timer.finish(response.status_code)
+    metrics.sample_process()
+    return response
+
+def lap(stage):
+    """Close the current stage of this request's timer (see metrics.RequestTimer)"""
+    timer = g.get('request_timer')
+    if timer is not None:
+        timer.lap(stage)
+
+def uses_native_threads():
+    """Whether scoring runs through the XGBoost library and its OpenMP pool"""
+    return 'xgboost' in sys.modules
+
+def warm_up(predict=True):
+    """Build the page shell and run a dummy prediction so the first request is not slow"""
+    with app.test_request_context('/'):
+        page_shell()
+    model = model_registry.current
+    if predict and model is not None:
+        # Bypasses the cache so the dummy row is not counted or stored
+        model.predictor.predict_proba_one(extract_features({}))
+        # The TreeSHAP explainer is left to the first explanation: it imports
+        # xgboost, which the NumPy-only engines otherwise never load
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     prediction = None
+    user = current_user()
+    new_user = None
     if request.method == 'POST':
         try:
+            model = model_registry.current
             if model is None:
                 prediction = "Error: Model not loaded. Please check model file."
-                return render_template('index.html', prediction=prediction)
+                return page_response(prediction)
                 
-            # Get form data with defaults for missing fields
-            data = [
-                float(request.form.get('highbp', 0)),
-                float(request.form.get('highchol', 0)),
-                float(request.form.get('cholcheck', 1)),  # Default to Yes
-                float(request.form.get('bmi', 25)),
-                float(request.form.get('smoker', 0)),
-                0,  # Stroke, not included in UI - keeping for compatibility
-                float(request.form.get('diabetes', 0)),
-                float(request.form.get('physactivity', 1)),  # Default to Yes
-                float(request.form.get('fruits', 1)),  # Default to Yes
-                float(request.form.get('veggies', 1)),  # Default to Yes
-                float(request.form.get('hvyalcoholconsump', 0)),
-                float(request.form.get('anyhealthcare', 1)),  # Default to Yes
-                float(request.form.get('nodocbccost', 0)),
-                float(request.form.get('genhlth', 3)),  # Default to Good
-                float(request.form.get('menthlth', 0)),
-                float(request.form.get('physhlth', 0)),
-                float(request.form.get('diffwalk', 0)),
-                float(request.form.get('sex', 0)),
-                float(request.form.get('age', 30)),
-                float(request.form.get('education', 4)),  # Default to High school
-                float(request.form.get('income', 5))  # Default to middle income
-            ]
-
-            columns = [
-                'HighBP', 'HighChol', 'CholCheck', 'BMI', 'Smoker', 'Stroke',
-                'Diabetes', 'PhysActivity', 'Fruits', 'Veggies', 'HvyAlcoholConsump',
-                'AnyHealthcare', 'NoDocbcCost', 'GenHlth', 'MentHlth', 'PhysHlth',
-                'DiffWalk', 'Sex', 'Age', 'Education', 'Income'
-            ]
-
-            df = pd.DataFrame([data], columns=columns)
-            pred = model.predict(df)[0]
-            prediction = '⚠️ High Risk of Heart Disease' if pred == 1 else '✅ Low Risk of Heart Disease'
+            data = extract_features(request.form)
+            lap('parse')
+            probability = model.predict_proba_one(data)
+            pred = int(probability > DECISION_THRESHOLD)
+            prediction = risk_label(pred)
+            # The dashboard asks /api/assessment for the explanation next
+            model.explanations.prefetch(data)
+            lap('predict')
+
+            if assessment_store is not None:
+                if user is None:
+                    user = new_user = secrets.token_hex(16)
+                # Queued for the background writer; never waits on the disk
+                assessment_store.record(user, data, probability, pred, model.sha256)
+                lap('record')
 
         except Exception as e:
             prediction = f"Error in input: {str(e)}"
 
-    return render_template('index.html', prediction=prediction)
+    response = page_response(prediction)
+    lap('render')
+    if new_user is not None:
+        response.set_cookie(USER_COOKIE, new_user, max_age=USER_COOKIE_MAX_AGE,
+                            httponly=True, samesite='Lax')
+    return response
+
+def current_user():
+    """The anonymous user id from the request's cookie, or None"""
+    user = request.cookies.get(USER_COOKIE, '')
+    return user if USER_ID_PATTERN.fullmatch(user) else None
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """API endpoint to score many assessments with a single model call.
+
+    Accepts a JSON list of assessments, an object with an ``assessments``
+    list, or NDJSON with one assessment per line. Rows that fail
+    validation are reported individually and do not block the rest.
+    Like the form, rows are scored with BMI rounded to the prediction
+    cache's precision (one decimal by default).
+    With ``?explain=1`` every scored row also gets its explanation, all
+    computed with one TreeSHAP call.
+    """
+    model = model_registry.current
+    if model is None:
+        return jsonify({'error': 'Model not loaded. Please check model file.'}), 503
+
+    try:
+        records = parse_batch_payload(request)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large: {len(records)} rows (max {MAX_BATCH_SIZE})'}), 413
+    explain = request.args.get('explain') == '1'
+    if explain and len(records) > MAX_EXPLAIN_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large to explain: {len(records)} rows '
+                                 f'(max {MAX_EXPLAIN_BATCH_SIZE} with explain=1)'}), 413
+
+    matrix, errors = encode_records(records)
+    results = [None] * len(records)
+    for i, record in enumerate(records):
+        result = {'index': i}
+        if isinstance(record, dict):
+            for key in ('id', 'request_id'):
+                if key in record:
+                    result[key] = record[key]
+        if i in errors:
+            result['error'] = str(errors[i])
+            result['fields'] = errors[i].errors
+        results[i] = result
+    row_positions = [i for i in range(len(records)) if i not in errors]
+    rows = matrix[row_positions]
+    lap('parse')
+
+    if len(rows):
+        metrics.BATCH_ROWS.labels('api').observe(len(rows))
+        probabilities = model.predict_probabilities(rows)
+        lap('predict')
+        for i, probability in zip(row_positions, probabilities):
+            pred = int(probability > DECISION_THRESHOLD)
+            results[i].update({
+                'probability': float(probability),
+                'prediction': pred,
+                'risk': risk_label(pred)
+            })
+        if explain:
+            for i, explanation in zip(row_positions, model.explanations.explain_many(rows)):
+                results[i]['explanation'] = explanation
+            lap('explain')
+
+    response = jsonify({
+        'results': results,
+        'count': len(records),
+        'scored': len(rows),
+        'errors': len(records) - len(rows)
+    })
+    lap('serialize')
+    return response
+
+def validation_error(e):
+    """400 response for invalid input"""
+    return jsonify(validation_payload(e)), 400
+
+def validation_payload(e):
+    """Error body for invalid input; feature errors also list each invalid field"""
+    payload = {'error': str(e)}
+    if isinstance(e, FeatureError):
+        payload['fields'] = e.errors
+    return payload
+
+def parse_batch_payload(req):
+    """Decode a batch request body into a list of assessment records"""
+    body = req.get_data(as_text=True)
+    if not body.strip():
+        raise ValueError('Empty request body')
+
+    if req.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq'):
+        return parse_ndjson(body)
+
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        # Bodies that are not a single JSON document may still be NDJSON
+        return parse_ndjson(body)
+
+    if isinstance(payload, dict):
+        if 'assessments' not in payload:
+            # A single object is treated as a batch of one
+            return [payload]
+        payload = payload['assessments']
+    if not isinstance(payload, list):
+        raise ValueError('Expected a list of assessments')
+    return payload
+
+def parse_ndjson(body):
+    """Decode newline-delimited JSON, one assessment per non-blank line"""
+    records = []
+    for line_no, line in enumerate(body.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON on line {line_no}: {e.msg}')
+    return records
+
+def admin_denied():
+    """Error response unless the request carries the admin bearer token"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled'}), 404
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+@app.route('/admin/model')
+def model_status():
+    """Serving model version, rollback history and last load error"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    return jsonify(model_registry.status())
+
+@app.route('/admin/model/reload', methods=['POST'])
+def reload_model():
+    """Load the model file in the background and swap it in once validated.
+
+    Pass ``?wait=1`` to block until the new version is serving. Other
+    workers follow through the registry's control file.
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    model_registry.broadcast('reload')
+    if request.args.get('wait') == '1':
+        version = model_registry.reload()
+        status_code = 200 if version is not None else 500
+        return jsonify(model_registry.status()), status_code
+    model_registry.reload_async()
+    return jsonify(model_registry.status()), 202
+
+@app.route('/admin/model/rollback', methods=['POST'])
+def rollback_model():
+    """Swap back to the previous version, or the one given by ``sha256``"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    sha256 = (request.get_json(silent=True) or {}).get('sha256')
+    version = model_registry.rollback(sha256)
+    if version is None:
+        return jsonify({'error': 'No matching previous model version loaded'}), 409
+    model_registry.broadcast('rollback', version.sha256)
+    return jsonify(model_registry.status())
+
+@app.route('/metrics')
+def get_metrics():
+    """Request, model, cache and memory metrics in the Prometheus text format"""
+    return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/new-assessment')
 def new_assessment():
     """Route to start a fresh assessment"""
-    return render_template('index.html', prediction=None)
+    return page_response(None)
+
+def page_response(prediction):
+    """The assessment page showing ``prediction``, from the pre-rendered shell.
+
+    The empty form and both risk outcomes are sent precompressed when the
+    client accepts it; GETs of the empty form revalidate by ETag.
+    """
+    page = page_shell().page(prediction)
+    encoding = choose_encoding(page.variants, request.accept_encodings)
+    response = app.response_class(page.variants[encoding], mimetype='text/html')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if request.method != 'GET' or page.etag is None:
+        return response
+    response.cache_control.no_cache = True
+    response.set_etag(f"{page.etag}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+def page_shell():
+    """The index template rendered once per process (re-rendered each time in debug mode)"""
+    global _page_shell
+    if app.jinja_env.auto_reload:
+        return PageShell(lambda prediction: render_template('index.html', prediction=prediction),
+                         common=())
+    if _page_shell is None:
+        _page_shell = PageShell(
+            lambda prediction: render_template('index.html', prediction=prediction),
+            common=(None, risk_label(0), risk_label(1))
+        )
+    return _page_shell
+
+def asset_manifest():
+    """The fingerprinted asset build, or None to serve the plain /static files"""
+    global _asset_manifest
+    if _asset_manifest is None:
+        _asset_manifest = False
+        if ASSET_DIR:
+            try:
+                _asset_manifest = AssetManifest.load_or_build(app.static_folder, ASSET_DIR)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Serving plain static files; could not build assets in {ASSET_DIR}: {e}")
+    return _asset_manifest or None
+
+@app.template_global()
+def asset_url(filename):
+    """Fingerprinted URL of a static file, falling back to /static"""
+    manifest = asset_manifest()
+    url = manifest.url(filename) if manifest is not None else None
+    return url or url_for('static', filename=filename)
+
+@app.route('/assets/<path:asset_path>')
+def fingerprinted_asset(asset_path):
+    """A static file from the asset build, in the best encoding the client accepts"""
+    manifest = asset_manifest()
+    asset = manifest.get(asset_path) if manifest is not None else None
+    if asset is None:
+        abort(404)
+    encoding = choose_encoding(asset.variants, request.accept_encodings)
+    response = app.response_class(asset.variants[encoding], content_type=asset.content_type)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # The name changes whenever the content does, so it never needs revalidating
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    response.set_etag(f"{asset.sha256[:32]}-{encoding or 'identity'}")
+    return response.make_conditional(request)
 
 @app.route('/api/health-metrics', methods=['POST'])
 def get_health_metrics():
     """API endpoint to calculate health metrics from form data"""
     try:
-        data = request.json
-        
-        # Calculate heart rate zone
-        age = int(data.get('age', 30))
-        max_hr = 220 - age
-        heart_rate_zone = calculate_heart_rate_zone(age, max_hr)
-        
-        # Calculate BMI category
-        height_feet = int(data.get('height_feet', 5))
-        height_inches = int(data.get('height_inches', 8))
-        weight = int(data.get('weight', 150))
-        height_total_inches = (height_feet * 12) + height_inches
-        height_m = height_total_inches * 0.0254
-        weight_kg = weight * 0.453592
-        bmi = weight_kg / (height_m * height_m)
-        bmi_result = calculate_bmi_category(bmi)
-        
-        # Calculate cholesterol level
-        high_cholesterol = int(data.get('highchol', 0))
-        cholesterol_result = calculate_cholesterol_level(high_cholesterol)
-        
-        # Calculate fitness level
-        physical_activity = int(data.get('physactivity', 1))
-        fitness_result = calculate_fitness_level(age, physical_activity)
-        
-        return jsonify({
-            'heart_rate': heart_rate_zone,
-            'bmi': bmi_result,
-            'cholesterol': cholesterol_result,
-            'fitness': fitness_result
-        })
+        return jsonify(compute_health_metrics(request.json))
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return validation_error(e)
+
+def compute_health_metrics(data):
+    """Health metrics payload for a JSON assessment"""
+    return health_metrics_for(parse_assessment(data))
+
+def health_metrics_for(record):
+    """Health metrics for a validated Assessment"""
+    # Calculate heart rate zone
+    max_hr = 220 - record.age
+    heart_rate_zone = calculate_heart_rate_zone(record.age, max_hr)
+    
+    # Calculate BMI category
+    height_total_inches = (record.height_feet * 12) + record.height_inches
+    height_m = height_total_inches * 0.0254
+    weight_kg = record.weight * 0.453592
+    bmi = weight_kg / (height_m * height_m)
+    bmi_result = calculate_bmi_category(bmi)
+    
+    return {
+        'heart_rate': heart_rate_zone,
+        'bmi': bmi_result,
+        'cholesterol': calculate_cholesterol_level(record.highchol),
+        'fitness': calculate_fitness_level(record.age, record.physactivity)
+    }
 
 @app.route('/api/risk-factors', methods=['POST'])
 def get_risk_factors():
     """API endpoint to calculate individual risk factors"""
     try:
-        data = request.get_json()
-        
-        risk_factors = []
-        
-        # Age risk
-        age = int(data.get('age', 30))
-        age_risk = 'low' if age < 45 else 'medium' if age < 65 else 'high'
-        risk_factors.append({'name': 'Age', 'risk': age_risk, 'value': age})
-        
-        # Blood pressure
-        bp_risk = 'high' if int(data.get('highbp', 0)) else 'low'
-        risk_factors.append({'name': 'Blood Pressure', 'risk': bp_risk, 'value': int(data.get('highbp', 0))})
-        
-        # Cholesterol
-        chol_risk = 'high' if int(data.get('highchol', 0)) else 'low'
-        risk_factors.append({'name': 'Cholesterol', 'risk': chol_risk, 'value': int(data.get('highchol', 0))})
-        
-        # Exercise
-        exercise_risk = 'low' if int(data.get('physactivity', 1)) else 'high'
-        risk_factors.append({'name': 'Exercise', 'risk': exercise_risk, 'value': int(data.get('physactivity', 1))})
-        
-        # Smoking
-        smoking_risk = 'high' if int(data.get('smoker', 0)) else 'low'
-        risk_factors.append({'name': 'Smoking', 'risk': smoking_risk, 'value': int(data.get('smoker', 0))})
-        
-        # Diabetes
-        diabetes_risk = 'high' if int(data.get('diabetes', 0)) else 'low'
-        risk_factors.append({'name': 'Diabetes', 'risk': diabetes_risk, 'value': int(data.get('diabetes', 0))})
-        
-        # BMI
-        bmi = float(data.get('bmi', 25))
-        bmi_risk = 'low' if bmi < 25 else 'medium' if bmi < 30 else 'high'
-        risk_factors.append({'name': 'BMI', 'risk': bmi_risk, 'value': bmi})
-        
-        # General health
-        gen_health = int(data.get('genhlth', 3))
-        health_risk = 'low' if gen_health <= 2 else 'medium' if gen_health == 3 else 'high'
-        risk_factors.append({'name': 'General Health', 'risk': health_risk, 'value': gen_health})
-        
-        return jsonify({'risk_factors': risk_factors})
+        return jsonify(compute_risk_factors(request.get_json()))
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return validation_error(e)
+
+def compute_risk_factors(data):
+    """Risk factor breakdown for a JSON assessment"""
+    return {'risk_factors': risk_factors_for(parse_assessment(data))}
+
+def risk_factors_for(record):
+    """Risk factor matrix for a validated Assessment"""
+    age_risk = 'low' if record.age < 45 else 'medium' if record.age < 65 else 'high'
+    bmi_risk = 'low' if record.bmi < 25 else 'medium' if record.bmi < 30 else 'high'
+    health_risk = 'low' if record.genhlth <= 2 else 'medium' if record.genhlth == 3 else 'high'
+    return [
+        {'name': 'Age', 'risk': age_risk, 'value': record.age},
+        {'name': 'Blood Pressure', 'risk': 'high' if record.highbp else 'low', 'value': record.highbp},
+        {'name': 'Cholesterol', 'risk': 'high' if record.highchol else 'low', 'value': record.highchol},
+        {'name': 'Exercise', 'risk': 'low' if record.physactivity else 'high', 'value': record.physactivity},
+        {'name': 'Smoking', 'risk': 'high' if record.smoker else 'low', 'value': record.smoker},
+        {'name': 'Diabetes', 'risk': 'high' if record.diabetes else 'low', 'value': record.diabetes},
+        {'name': 'BMI', 'risk': bmi_risk, 'value': record.bmi},
+        {'name': 'General Health', 'risk': health_risk, 'value': record.genhlth}
+    ]
+
+@app.route('/api/assessment', methods=['GET', 'POST'])
+def get_assessment():
+    """API endpoint returning everything the dashboard shows in one response.
+
+    Accepts the assessment fields as a JSON body (POST, what the dashboard
+    uses, so health answers stay out of URLs and access logs) or query
+    string (GET). The payload is deterministic for a given input, model
+    and recorded history, and carries an ETag; requests with a matching
+    If-None-Match get 304. Browsers never cache POST responses, so the
+    dashboard keeps its last copy and sends the ETag itself.
+    """
+    try:
+        source = request.args if request.method == 'GET' else request.get_json()
+        record = parse_assessment(source)
+    except Exception as e:
+        return validation_error(e)
+    lap('parse')
+
+    assessment = build_assessment(record, current_user())
+    lap('build')
+    body = json.dumps(assessment, separators=(',', ':'), sort_keys=True)
+    response = app.response_class(body, mimetype='application/json')
+    lap('serialize')
+    # Health data is private to the user, but the browser may keep and revalidate it
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    if request.method == 'POST' and request.if_none_match.contains(response.get_etag()[0]):
+        # make_conditional only answers GET and HEAD with 304
+        response.status_code = 304
+        response.set_data(b'')
+        return response
+    return response.make_conditional(request)
+
+def build_assessment(record, user=None):
+    """Prediction and its explanation, metrics, risk matrix, timeline and community stats"""
+    model = model_registry.current
+    prediction = explanation = None
+    if model is not None:
+        probability = model.predict_proba_one(record.features)
+        pred = int(probability > DECISION_THRESHOLD)
+        prediction = {'probability': probability, 'prediction': pred, 'risk': risk_label(pred)}
+        explanation = model.explanations.explain(record.features)
+
+    return {
+        'prediction': prediction,
+        'explanation': explanation,
+        'model_version': model.number if model is not None else None,
+        'metrics': health_metrics_for(record),
+        'risk_factors': risk_factors_for(record),
+        'timeline': build_health_timeline(user),
+        'community_stats': build_community_stats(record)['community_stats']
+    }
 
 @app.route('/api/community-stats')
 def get_community_stats():
-    """API endpoint for community health statistics"""
-    # Simulated community data
-    stats = [
-        {
-            'label': 'Your Age Group Average Risk',
-            'value': f"{random.randint(35, 55)}%",
-            'percentile': f"{random.randint(15, 85)}th percentile",
-            'better': random.choice([True, False])
-        },
-        {
-            'label': 'Similar BMI Range',
-            'value': f"{random.randint(40, 60)}%",
-            'percentile': f"{random.randint(20, 80)}th percentile",
-            'better': random.choice([True, False])
-        },
-        {
-            'label': 'Regional Health Score',
-            'value': f"{random.randint(30, 50)}%",
-            'percentile': f"{random.randint(25, 75)}th percentile",
-            'better': random.choice([True, False])
-        },
-        {
-            'label': 'Exercise Habits Comparison',
-            'value': 'Above Average',
-            'percentile': f"{random.randint(60, 90)}th percentile",
-            'better': True
-        }
-    ]
-    return jsonify({'community_stats': stats})
+    """API endpoint comparing an assessment (query string) with cohorts of the dataset"""
+    try:
+        record = parse_assessment(request.args)
+    except Exception as e:
+        return validation_error(e)
+    return jsonify(build_community_stats(record))
+
+def build_community_stats(record):
+    """Community statistics payload; empty when no statistics were built for the model.
+
+    The user is ranked by the risk of their row coded like the cohorts'
+    rows (Age as a category), not by the displayed probability: scored with
+    Age in years, every adult age gets the same risk, which would put a
+    25-year-old near the top of the 18-24 cohort.
+    """
+    model = model_registry.current
+    stats = community_stats_for(model)
+    if stats is None:
+        return {'community_stats': []}
+    row = cohort_features(record.features)[0].tolist()
+    return {'community_stats': stats.describe(row, model.predict_proba_one(row))}
+
+def community_stats_for(model):
+    """CommunityStats built for ``model``'s file, or None if missing or stale"""
+    if model is None:
+        return None
+    if model.sha256 not in _community_stats:
+        array_path, manifest_path = stats_paths(model.path)
+        stats = None
+        if not os.path.exists(manifest_path):
+            print(f"No community statistics at {manifest_path}; run community_stats.py build")
+        else:
+            stats = CommunityStats.load(array_path, manifest_path)
+            if stats.source_sha256 != model.sha256:
+                print(f"Ignoring stale community statistics {manifest_path}; "
+                      "re-run community_stats.py build")
+                stats = None
+        _community_stats[model.sha256] = stats
+    return _community_stats[model.sha256]
 
 @app.route('/api/health-timeline')
 def get_health_timeline():
-    """API endpoint for health journey timeline data"""
-    # Generate sample timeline data
+    """API endpoint for the user's health journey, from their recorded assessments"""
+    try:
+        days = float(request.args.get('days', TIMELINE_DAYS))
+        points = min(int(request.args.get('points', TIMELINE_POINTS)), MAX_TIMELINE_POINTS)
+        if points < 1:
+            raise ValueError('points: expected a positive number')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(build_health_timeline(current_user(), days, points))
+
+def build_health_timeline(user, days=TIMELINE_DAYS, points=TIMELINE_POINTS):
+    """Health journey timeline payload: the last ``days`` of assessments in at most ``points`` steps"""
     timeline_data = {
         'labels': [],
+        'timestamps': [],
         'risk_scores': [],
-        'fitness_scores': []
+        'fitness_scores': [],
+        'assessments': []
     }
-    
-    # Generate 6 months of data
-    for i in range(6):
-        date = datetime.now() - timedelta(days=30*i)
-        timeline_data['labels'].insert(0, date.strftime('%b'))
-        timeline_data['risk_scores'].insert(0, max(20, 80 - i*8 + random.randint(-5, 5)))
-        timeline_data['fitness_scores'].insert(0, min(90, 40 + i*8 + random.randint(-5, 5)))
-    
-    return jsonify(timeline_data)
+    if user is None or assessment_store is None:
+        return timeline_data
+
+    # Long histories come back averaged into time buckets (see AssessmentStore.timeline)
+    entries = assessment_store.timeline(user, start=time.time() - days * 86400, max_points=points)
+    if not entries:
+        return timeline_data
+    ages = [features[FEATURE_COLUMNS.index('Age')] for *_, features in entries]
+    activity = [features[FEATURE_COLUMNS.index('PhysActivity')] for *_, features in entries]
+    fitness = fitness_levels(ages, activity)['percentage'].tolist()
+    for (ts, probability, count, _), fitness_score in zip(entries, fitness):
+        date = datetime.fromtimestamp(ts)
+        timeline_data['labels'].append(date.strftime('%b %d'))
+        timeline_data['timestamps'].append(date.isoformat(timespec='seconds'))
+        timeline_data['risk_scores'].append(round(probability * 100, 1))
+        timeline_data['fitness_scores'].append(round(fitness_score, 1))
+        timeline_data['assessments'].append(count)
+    return timeline_data
 
 def calculate_heart_rate_zone(age, current_hr):
     """Calculate heart rate zone and percentage"""
-    max_hr = 220 - age
-    percentage = (current_hr / max_hr) * 100
-    
-    if percentage < 50:
-        zone = 'Resting'
-    elif percentage < 60:
-        zone = 'Fat Burn'
-    elif percentage < 70:
-        zone = 'Aerobic'
-    elif percentage < 85:
-        zone = 'Anaerobic'
-    else:
-        zone = 'Red Line'
-    
-    return {
-        'zone': zone,
-        'percentage': min(percentage, 100),
-        'current_hr': current_hr,
-        'max_hr': max_hr
-    }
+    return scalar_row(heart_rate_zones(age, current_hr))
 
 def calculate_bmi_category(bmi):
     """Calculate BMI category and health percentage"""
-    if bmi < 18.5:
-        category = 'Underweight'
-        percentage = 30
-    elif bmi < 25:
-        category = 'Normal'
-        percentage = 85
-    elif bmi < 30:
-        category = 'Overweight'
-        percentage = 50
-    else:
-        category = 'Obese'
-        percentage = 20
-    
-    return {
-        'category': category,
-        'percentage': percentage,
-        'value': bmi
-    }
+    return scalar_row(bmi_categories(bmi))
 
 def calculate_cholesterol_level(high_cholesterol):
     """Calculate cholesterol risk level"""
-    if high_cholesterol:
-        level = 'High Risk'
-        percentage = 25
-    else:
-        level = 'Normal'
-        percentage = 80
-    
-    return {
-        'level': level,
-        'percentage': percentage
-    }
+    return scalar_row(cholesterol_levels(high_cholesterol))
 
 def calculate_fitness_level(age, physical_activity):
     """Calculate cardiovascular fitness level"""
-    base_fitness = 60 if physical_activity else 30
-    age_factor = max(0, (50 - age) / 50 * 20)  # Younger = higher fitness potential
-    total_fitness = min(95, base_fitness + age_factor)
-    
-    if total_fitness >= 80:
-        level = 'Excellent'
-    elif total_fitness >= 65:
-        level = 'Good'
-    elif total_fitness >= 50:
-        level = 'Fair'
-    else:
-        level = 'Poor'
-    
-    return {
-        'level': level,
-        'percentage': total_fitness
-    }
+    fitness = scalar_row(fitness_levels(age, physical_activity))
+    # The scalar formula gave an int score whenever the age term was clamped to 0
+    if not age < 50:
+        fitness['percentage'] = int(fitness['percentage'])
+    return fitness
 
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,228 @@
+"""
+ASGI entry point for CardioCheck.
+
+    uvicorn asgi:application --workers 4
+
+The JSON endpoints behind the dashboard that only compute from their
+payload (``/api/health-metrics`` and ``/api/risk-factors``) are answered
+directly on the event loop. They do almost no work, so a slow client only holds a
+coroutine rather than a whole sync worker. They record the same request
+and stage metrics as the Flask routes, under the Flask endpoint names. A
+client that disconnects before its body has arrived gets no response and
+costs no further work.
+
+Every other request, including the form POST to ``/`` that runs the
+model, is buffered on the loop and then handed to the Flask app on a
+bounded thread pool. When every pool thread is busy and
+``CARDIOCHECK_ASGI_QUEUE`` requests are already waiting for one, further
+requests are refused with 503 and ``Retry-After`` instead of piling up.
+
+Environment overrides:
+    CARDIOCHECK_ASGI_THREADS   pool threads for Flask and model work (default 4)
+    CARDIOCHECK_ASGI_QUEUE     requests allowed to wait for a thread (default 64)
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import app as webapp
+import metrics
+
+# JSON endpoints served on the event loop: (method, path) -> (Flask endpoint, handler(payload))
+NATIVE_ROUTES = {
+    ('POST', '/api/health-metrics'): ('get_health_metrics', webapp.compute_health_metrics),
+    ('POST', '/api/risk-factors'): ('get_risk_factors', webapp.compute_risk_factors)
+}
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its request body was complete"""
+
+
+class CardioCheckASGI:
+    """ASGI application: native JSON endpoints plus a bounded bridge to Flask"""
+
+    def __init__(self, wsgi_app, threads=4, queue=64, retry_after=1):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.queue = queue
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = None
+
+    @classmethod
+    def from_env(cls, wsgi_app):
+        return cls(
+            wsgi_app,
+            threads=int(os.environ.get('CARDIOCHECK_ASGI_THREADS', 4)),
+            queue=int(os.environ.get('CARDIOCHECK_ASGI_QUEUE', 64))
+        )
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads,
+                                                thread_name_prefix='cardiocheck-wsgi')
+        return self._executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.run_in_pool(webapp.warm_up)
+                    webapp.model_registry.ensure_watching()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=True)
+                    self._executor = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        route = NATIVE_ROUTES.get((scope['method'], scope['path']))
+        try:
+            body = await read_body(receive)
+        except ClientDisconnected:
+            return
+
+        if route is not None:
+            await self.native(route, body, send)
+            return
+
+        # Everything queued or running counts against the pool's capacity
+        if self.in_flight >= self.threads + self.queue:
+            self.rejected += 1
+            metrics.ASGI_REJECTED.inc()
+            await send_json(send, 503, {'error': 'Server busy, please retry'},
+                            [(b'retry-after', str(self.retry_after).encode())])
+            return
+
+        self.in_flight += 1
+        try:
+            environ = wsgi_environ(scope, body)
+            status, headers, chunks = await self.run_in_pool(call_wsgi, self.wsgi_app, environ)
+        finally:
+            self.in_flight -= 1
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    async def native(self, route, body, send):
+        """Answer a native JSON route, recording metrics like the Flask routes do"""
+        endpoint, handler = route
+        timer = metrics.RequestTimer(endpoint)
+        try:
+            payload = json.loads(body) if body else None
+            timer.lap('parse')
+            status, result = 200, handler(payload)
+            timer.lap('build')
+        except Exception as e:
+            status, result = 400, webapp.validation_payload(e)
+        await send_json(send, status, result)
+        timer.finish(status)
+        metrics.sample_process()
+
+    async def run_in_pool(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+
+async def read_body(receive):
+    """Collect the request body without blocking the loop on a slow client.
+
+    Raises ClientDisconnected if the client leaves before the body is complete.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def send_json(send, status, payload, extra_headers=()):
+    body = (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode()
+    headers = [(b'content-type', b'application/json'),
+               (b'content-length', str(len(body)).encode())]
+    headers.extend(extra_headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope with a fully buffered body"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        if key in environ and key.startswith('HTTP_'):
+            # Repeated headers are joined with commas, except cookies (RFC 6265 uses '; ')
+            value = f"{environ[key]}{'; ' if key == 'HTTP_COOKIE' else ','}{value}"
+        environ[key] = value
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """Run a WSGI app to completion and return (status, headers, body chunks)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                               for name, value in headers]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        chunks = list(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], chunks
+
+
+application = CardioCheckASGI.from_env(webapp.app)
@@ -0,0 +1,224 @@
+"""
+Persistent store of assessments behind the health timeline.
+
+Every prediction made from the assessment form is recorded with the
+user, time, feature row, probability and model version. ``record`` only
+puts the row on an in-memory queue: a background writer thread drains it
+and inserts whole batches in one transaction, flushing once ``batch_size``
+rows are waiting or the oldest has waited ``flush_interval`` seconds, so
+a request never waits on the disk. When the queue is full (the disk is
+far behind) new rows are dropped and counted rather than blocking.
+
+The default backend is a local SQLite file in WAL mode, so readers in
+every gunicorn worker see committed rows while a writer appends. An index
+on ``(user, ts, probability)`` serves the timeline: ``timeline`` reads one user's
+window and, for long histories, downsamples it in SQL to at most
+``max_points`` time buckets (mean probability per bucket, plus the
+features of the bucket's latest assessment), so the cost of a read does
+not grow with years of history.
+
+Like the micro-batcher, the writer thread is started lazily per process,
+since threads do not survive gunicorn's fork.
+
+Environment overrides:
+    CARDIOCHECK_ASSESSMENT_DB           SQLite path ('' disables recording;
+                                        default assessments.db in the app's
+                                        instance directory, created on first use)
+    CARDIOCHECK_ASSESSMENT_BATCH        rows per write transaction (default 256)
+    CARDIOCHECK_ASSESSMENT_FLUSH_MS     longest a row waits to be written (default 200)
+    CARDIOCHECK_ASSESSMENT_QUEUE        rows allowed to wait before dropping (default 10000)
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS assessments ('
+    ' id INTEGER PRIMARY KEY, user TEXT NOT NULL, ts REAL NOT NULL,'
+    ' probability REAL NOT NULL, prediction INTEGER NOT NULL, model TEXT,'
+    ' features BLOB NOT NULL)',
+    # Covers the timeline aggregates, so buckets are computed from the index alone
+    'CREATE INDEX IF NOT EXISTS assessments_user_ts ON assessments (user, ts, probability)'
+)
+WRITTEN = metrics.ASSESSMENTS.labels('written')
+DROPPED = metrics.ASSESSMENTS.labels('dropped')
+FAILED = metrics.ASSESSMENTS.labels('failed')
+
+
+class AssessmentStore:
+    """SQLite assessment log with a batching background writer"""
+
+    def __init__(self, path, batch_size=256, flush_interval=0.2, max_queue=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._writer_pid = None
+
+    @classmethod
+    def from_env(cls, default_path):
+        """Store configured by CARDIOCHECK_ASSESSMENT_* variables, or None when disabled"""
+        path = os.environ.get('CARDIOCHECK_ASSESSMENT_DB', default_path)
+        if not path:
+            return None
+        return cls(
+            path,
+            batch_size=int(os.environ.get('CARDIOCHECK_ASSESSMENT_BATCH', 256)),
+            flush_interval=float(os.environ.get('CARDIOCHECK_ASSESSMENT_FLUSH_MS', 200)) / 1000,
+            max_queue=int(os.environ.get('CARDIOCHECK_ASSESSMENT_QUEUE', 10000))
+        )
+
+    def record(self, user, features, probability, prediction, model=None, ts=None):
+        """Queue one assessment for writing; never blocks. Returns False if it was dropped."""
+        self._ensure_writer()
+        row = (user, time.time() if ts is None else ts, float(probability), int(prediction),
+               model, np.asarray(features, dtype=np.float64).tobytes())
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            DROPPED.inc()
+            return False
+        self.queued += 1
+        return True
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is written; True unless it timed out"""
+        if self._writer_pid != os.getpid():
+            return True
+        done = threading.Event()
+        deadline = time.monotonic() + timeout
+        # The marker waits behind the queued rows, so it fires once they are committed
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(max(deadline - time.monotonic(), 0))
+
+    def timeline(self, user, start=None, end=None, max_points=12):
+        """A user's assessments from ``start`` to ``end`` (epoch seconds), oldest first.
+
+        Returns a list of ``(ts, mean probability, count, features)``: one
+        entry per assessment, or per time bucket once the window holds more
+        than ``max_points`` of them. ``ts`` and ``features`` are those of the
+        latest assessment in the bucket.
+        """
+        conn = self._connection()
+        window = ('user = ? AND ts >= ? AND ts <= ?',
+                  (user, -np.inf if start is None else start, np.inf if end is None else end))
+        first, last, count = conn.execute(
+            f'SELECT MIN(ts), MAX(ts), COUNT(*) FROM assessments WHERE {window[0]}', window[1]
+        ).fetchone()
+        if not count:
+            return []
+        if count <= max_points:
+            bucket, params = 'id', ()
+        elif last == first:
+            bucket, params = 'ts', ()
+        else:
+            bucket = 'MIN(CAST((ts - ?) * ? / ? AS INTEGER), ?)'
+            params = (first, max_points, last - first, max_points - 1)
+        # Buckets come from the covering index (which holds the rowid too); with a
+        # single MAX(), SQLite takes the bare id from the row that holds the maximum
+        buckets = conn.execute(
+            f'SELECT MAX(ts), AVG(probability), COUNT(*), id FROM assessments '
+            f'WHERE {window[0]} GROUP BY {bucket} ORDER BY 1, 4',
+            window[1] + params
+        ).fetchall()
+        # Only each bucket's latest row is read from the table
+        latest = dict(conn.execute(
+            f'SELECT id, features FROM assessments WHERE id IN ({",".join("?" * len(buckets))})',
+            tuple(rowid for *_, rowid in buckets)
+        ).fetchall())
+        return [(ts, probability, n, np.frombuffer(latest[rowid], dtype=np.float64))
+                for ts, probability, n, rowid in buckets]
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'queued': self.queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'errors': self.errors,
+            'pending': self._queue.qsize()
+        }
+
+    def _ensure_writer(self):
+        if self._writer_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._writer_pid != os.getpid():
+                threading.Thread(target=self._run, name='assessment-writer', daemon=True).start()
+                self._writer_pid = os.getpid()
+                atexit.register(self.flush)
+
+    def _run(self):
+        conn = _connect(self.path, timeout=5)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(conn, batch)
+
+    def _write(self, conn, batch):
+        rows = [item for item in batch if not isinstance(item, threading.Event)]
+        if rows:
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT INTO assessments (user, ts, probability, prediction, model, features)'
+                        ' VALUES (?, ?, ?, ?, ?, ?)', rows
+                    )
+                self.written += len(rows)
+                self.batches += 1
+                WRITTEN.inc(len(rows))
+            except sqlite3.Error as e:
+                # Losing a batch of history is better than killing the writer
+                self.errors += 1
+                FAILED.inc(len(rows))
+                print(f"Failed to write {len(rows)} assessments to {self.path}: {e}")
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _connection(self):
+        # One reader connection per thread, never carried across a fork
+        pid, conn = getattr(self._local, 'conn', (None, None))
+        if pid != os.getpid():
+            conn = _connect(self.path, timeout=1)
+            self._local.conn = (os.getpid(), conn)
+        return conn
+
+
+def _connect(path, timeout):
+    # The file and schema are created on first use, not when the app is imported
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    return conn
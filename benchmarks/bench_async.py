@@ -0,0 +1,138 @@
+"""
+Concurrent-connection throughput: gunicorn sync workers vs the ASGI app.
+
+Starts ``gunicorn -c gunicorn.conf.py app:app`` with single-threaded sync
+workers and ``uvicorn asgi:application`` with the same number of worker
+processes, then drives each with a raw-socket asyncio load generator at
+several connection counts. Every client loops over the dashboard JSON
+endpoints for ``--duration`` seconds; ``--trickle-ms`` makes each client
+send its request body in small pieces with a pause between them, the way
+a slow mobile connection would.
+
+    python benchmarks/bench_async.py [--workers 2] [--concurrency 10 50 200] [--trickle-ms 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from common import ROOT
+
+PAYLOAD = json.dumps({'age': 58, 'height_feet': 5, 'height_inches': 10, 'weight': 210,
+                      'highbp': 1, 'smoker': 1, 'bmi': 30.1, 'genhlth': 4}).encode()
+REQUESTS = [
+    ('POST', '/api/health-metrics', PAYLOAD),
+    ('POST', '/api/risk-factors', PAYLOAD),
+    ('GET', '/api/community-stats', b''),
+    ('GET', '/api/health-timeline', b'')
+]
+
+
+def server_commands(workers):
+    python = sys.executable
+    return {
+        # One thread per worker makes gunicorn.conf.py pick the sync worker class
+        'gunicorn sync': [python, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        'uvicorn asgi': [python, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+                         '--workers', str(workers), '--no-access-log', '--log-level', 'warning']
+    }
+
+
+async def one_request(port, method, path, body, trickle):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        head = (f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n').encode()
+        writer.write(head)
+        if trickle and body:
+            for i in range(0, len(body), 16):
+                await writer.drain()
+                await asyncio.sleep(trickle)
+                writer.write(body[i:i + 16])
+        else:
+            writer.write(body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return response.startswith(b'HTTP/1.1 200')
+
+
+async def client(port, deadline, trickle, latencies, errors, offset):
+    i = offset
+    while time.perf_counter() < deadline:
+        method, path, body = REQUESTS[i % len(REQUESTS)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            ok = await asyncio.wait_for(one_request(port, method, path, body, trickle), 30)
+        except (OSError, asyncio.TimeoutError):
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors.append(path)
+
+
+async def load(port, concurrency, duration, trickle):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(port, deadline, trickle, latencies, errors, i)
+                           for i in range(concurrency)))
+    return latencies, errors
+
+
+def wait_until_up(port, timeout=60):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if asyncio.run(one_request(port, 'GET', '/api/community-stats', b'', 0)):
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--trickle-ms', type=float, default=0.0,
+                        help='pause between 16-byte body pieces (simulates slow clients)')
+    parser.add_argument('--port', type=int, default=5097)
+    args = parser.parse_args()
+
+    print(f"⚙️  {args.workers} worker processes, {args.duration:.0f}s per run, "
+          f"trickle {args.trickle_ms:.0f}ms")
+    print(f"{'server':<15} {'conns':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, command in server_commands(args.workers).items():
+        env = dict(os.environ, PORT=str(args.port), PYTHONWARNINGS='ignore',
+                   CARDIOCHECK_WORKERS=str(args.workers), CARDIOCHECK_THREADS='1',
+                   CARDIOCHECK_MODEL_WATCH_INTERVAL='0')
+        command = command + (['--port', str(args.port)] if 'uvicorn' in name else [])
+        server = subprocess.Popen(command, cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(args.port)
+            for concurrency in args.concurrency:
+                latencies, errors = asyncio.run(
+                    load(args.port, concurrency, args.duration, args.trickle_ms / 1000))
+                ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+                print(f"{name:<15} {concurrency:>6} {len(latencies) / args.duration:>9.0f} "
+                      f"{np.percentile(ms, 50):>9.1f} {np.percentile(ms, 99):>9.1f} {len(errors):>7}")
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Throughput of concurrent single-row predictions with and without micro-batching.
+
+Runs ``--threads`` threads that each score rows one at a time, the way
+concurrent form POSTs reach ``index()``, first with direct
+``predict_proba_one`` calls and then through a MicroBatcher at each
+``--wait-us`` setting. Reports rows/sec, per-call p50/p99 and the
+batcher's mean batch size and queue wait.
+
+    python benchmarks/bench_batching.py [--engine fast] [--threads 8] [--wait-us 250 1000]
+"""
+
+import argparse
+import json
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common import DEFAULT_MODEL_PATH, summarize, synthetic_features
+from micro_batcher import MicroBatcher
+from model_loader import ENGINES, load_model
+
+
+def run(score, rows, threads):
+    """Score ``rows`` from ``threads`` threads; returns (rows/sec, latency samples in us)"""
+    chunks = np.array_split(rows, threads)
+
+    def worker(chunk):
+        samples = np.empty(len(chunk))
+        for i, row in enumerate(chunk):
+            start = time.perf_counter()
+            score(list(row))
+            samples[i] = time.perf_counter() - start
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = np.concatenate(list(pool.map(worker, chunks)))
+    return len(rows) / (time.perf_counter() - start), samples * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--engine', choices=ENGINES, default='fast')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--wait-us', type=int, nargs='+', default=[250, 1000])
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    predictor = load_model(args.model, engine=args.engine)
+    rows = synthetic_features(args.rows)
+    run(predictor.predict_proba_one, rows[:500], args.threads)
+
+    results = {'engine': type(predictor).__name__, 'threads': args.threads, 'runs': {}}
+    throughput, samples = run(predictor.predict_proba_one, rows, args.threads)
+    results['runs']['direct'] = dict(summarize(samples), rows_per_sec=throughput)
+    for wait_us in args.wait_us:
+        batcher = MicroBatcher(predictor.predict_proba, args.max_batch_size, wait_us)
+        throughput, samples = run(batcher.submit, rows, args.threads)
+        stats = batcher.stats()
+        results['runs'][f'batched {wait_us}us'] = dict(
+            summarize(samples), rows_per_sec=throughput,
+            mean_batch_size=stats['mean_batch_size'],
+            mean_queue_wait_us=stats['mean_queue_wait_us'])
+
+    print(f"⚙️  {results['engine']}, {args.threads} threads, {args.rows} rows")
+    print(f"{'mode':<18}{'rows/s':>10}{'p50 (us)':>11}{'p99 (us)':>11}{'batch':>8}{'wait (us)':>11}")
+    for name, run_stats in results['runs'].items():
+        print(f"{name:<18}{run_stats['rows_per_sec']:>10.0f}{run_stats['p50_us']:>11.1f}"
+              f"{run_stats['p99_us']:>11.1f}{run_stats.get('mean_batch_size', 1):>8.1f}"
+              f"{run_stats.get('mean_queue_wait_us', 0):>11.1f}")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
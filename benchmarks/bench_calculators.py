@@ -0,0 +1,84 @@
+"""
+Roster throughput of the health-metric calculators: scalar loop vs vectorized.
+
+Runs the four calculators over a synthetic roster once row by row through
+the scalar functions in app.py (on a sample) and once as whole columns
+through health_metrics.py, and reports rows per second for each.
+
+    python benchmarks/bench_calculators.py [--rows 2000000] [--scalar-rows 20000]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from common import ROOT  # noqa: F401  (puts the app modules on sys.path)
+from health_metrics import bmi_categories, cholesterol_levels, fitness_levels, heart_rate_zones
+
+
+def roster(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'age': rng.integers(18, 100, n),
+        'current_hr': rng.integers(50, 190, n),
+        'bmi': rng.uniform(14, 55, n).round(1),
+        'highchol': rng.integers(0, 2, n),
+        'physactivity': rng.integers(0, 2, n)
+    }
+
+
+def score_columns(columns):
+    return (heart_rate_zones(columns['age'], columns['current_hr']),
+            bmi_categories(columns['bmi']),
+            cholesterol_levels(columns['highchol']),
+            fitness_levels(columns['age'], columns['physactivity']))
+
+
+def score_rows(columns, calculators):
+    heart_rate, bmi, cholesterol, fitness = calculators
+    rows = zip(*(columns[k].tolist() for k in ('age', 'current_hr', 'bmi', 'highchol', 'physactivity')))
+    return [(heart_rate(age, hr), bmi(b), cholesterol(chol), fitness(age, active))
+            for age, hr, b, chol, active in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=2000000, help='roster size for the vectorized run')
+    parser.add_argument('--scalar-rows', type=int, default=20000, help='rows for the scalar loop')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import app
+    scalar = (app.calculate_heart_rate_zone, app.calculate_bmi_category,
+              app.calculate_cholesterol_level, app.calculate_fitness_level)
+
+    columns = roster(args.rows)
+    score_columns(roster(1000))
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        score_columns(columns)
+        best = min(best, time.perf_counter() - start)
+    vectorized_rate = args.rows / best
+
+    sample = roster(args.scalar_rows, seed=1)
+    start = time.perf_counter()
+    score_rows(sample, scalar)
+    scalar_rate = args.scalar_rows / (time.perf_counter() - start)
+
+    results = {
+        'rows': args.rows,
+        'vectorized_rows_per_sec': vectorized_rate,
+        'scalar_rows_per_sec': scalar_rate,
+        'speedup': vectorized_rate / scalar_rate
+    }
+    print(f"Vectorized: {vectorized_rate:,.0f} rows/s over {args.rows:,} rows")
+    print(f"Scalar:     {scalar_rate:,.0f} rows/s over {args.scalar_rows:,} rows")
+    print(f"Speedup: {results['speedup']:.0f}x")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
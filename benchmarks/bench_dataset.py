@@ -0,0 +1,83 @@
+"""
+Dataset load time and memory: pandas CSV parsing vs the columnar cache.
+
+Loads the training CSV three ways — ``pd.read_csv`` with default dtypes,
+a cold ``load_dataset`` that builds the cache, and a warm ``load_dataset``
+that memory-maps it — and reports wall time and peak Python-tracked
+allocations for each. Without datasets/heart_health.csv a synthetic file
+of the same shape (253,680 rows) is written to a temp directory.
+
+    python benchmarks/bench_dataset.py [--data datasets/heart_health.csv] [--rows 253680]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from common import DEFAULT_DATA_PATH, synthetic_features
+from dataset import cache_dir_for, load_dataset
+from features import FEATURE_COLUMNS
+
+
+def write_synthetic_csv(path, rows):
+    import pandas as pd
+    frame = pd.DataFrame(synthetic_features(rows), columns=FEATURE_COLUMNS)
+    frame.insert(0, 'HeartDiseaseorAttack', np.random.default_rng(1).integers(0, 2, rows).astype(float))
+    frame.to_csv(path, index=False)
+
+
+def measure(load):
+    """(seconds, peak MiB allocated) for one call of ``load``, touching every column"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    frame = load()
+    for name in frame.columns:
+        frame[name].sum()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH)
+    parser.add_argument('--rows', type=int, default=253680, help='rows for the synthetic file')
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    scratch = None
+    data_path = args.data
+    if not os.path.exists(data_path):
+        scratch = tempfile.mkdtemp()
+        data_path = os.path.join(scratch, 'heart_health.csv')
+        print(f"Dataset not found at {args.data}; writing {args.rows:,} synthetic rows")
+        write_synthetic_csv(data_path, args.rows)
+
+    try:
+        shutil.rmtree(cache_dir_for(data_path), ignore_errors=True)
+        results = {}
+        results['read_csv'] = measure(lambda: pd.read_csv(data_path))
+        results['cache_build'] = measure(lambda: load_dataset(data_path).frame())
+        results['cache_load'] = measure(lambda: load_dataset(data_path).frame())
+        dataset = load_dataset(data_path)
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    for name, (seconds, peak) in results.items():
+        print(f"{name:12s} {seconds * 1000:9.1f} ms   peak {peak:8.1f} MiB")
+    print(f"Cached columns: {dataset.nbytes / 2**20:.1f} MiB for {dataset.rows:,} rows")
+    print(f"Warm load speedup: {results['read_csv'][0] / results['cache_load'][0]:.0f}x")
+    print(json.dumps({name: {'seconds': s, 'peak_mib': m} for name, (s, m) in results.items()}))
+
+
+if __name__ == '__main__':
+    main()
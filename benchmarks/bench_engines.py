@@ -0,0 +1,74 @@
+"""
+Cold-start time and per-worker memory for each serving engine.
+
+Each engine is measured in a fresh interpreter that imports ``app`` the way
+a gunicorn worker does, scores a fixed set of rows and reports its boot
+time and peak RSS. Predictions are compared against the sklearn pipeline.
+
+    python benchmarks/bench_engines.py [--engines trees fast pipeline] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from common import ROOT
+
+PROBE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+boot = time.perf_counter() - start
+from common import synthetic_features
+rows = synthetic_features(2000, seed=11)
+proba = app.model_registry.current.predictor.predict_proba(rows)
+print(json.dumps({
+    'engine': type(app.model_registry.current.predictor).__name__,
+    'boot_s': boot,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [m for m in ('xgboost', 'sklearn', 'pandas') if m in sys.modules],
+    'proba': proba.tolist()
+}))
+'''
+
+
+def run_engine(engine):
+    env = dict(os.environ, CARDIOCHECK_MODEL_ENGINE=engine, PYTHONWARNINGS='ignore',
+               PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, 'benchmarks')]))
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--engines', nargs='+', default=['trees', 'fast', 'pipeline'])
+    parser.add_argument('--repeat', type=int, default=3, help='fresh processes per engine')
+    args = parser.parse_args()
+
+    results = {}
+    reference = run_engine('pipeline')
+    for engine in args.engines:
+        runs = [run_engine(engine) for _ in range(args.repeat)]
+        diff = np.abs(np.array(runs[0]['proba']) - np.array(reference['proba'])).max()
+        results[engine] = {
+            'predictor': runs[0]['engine'],
+            'boot_s': min(r['boot_s'] for r in runs),
+            'max_rss_mb': min(r['max_rss_mb'] for r in runs),
+            'heavy_modules': runs[0]['heavy_modules'],
+            'max_abs_diff_vs_pipeline': float(diff)
+        }
+
+    print(f"{'engine':<10}{'boot (s)':>10}{'RSS (MB)':>10}{'max diff':>11}  heavy imports")
+    for engine, r in results.items():
+        print(f"{engine:<10}{r['boot_s']:>10.3f}{r['max_rss_mb']:>10.1f}"
+              f"{r['max_abs_diff_vs_pipeline']:>11.1e}  {', '.join(r['heavy_modules']) or '-'}")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
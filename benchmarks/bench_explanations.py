@@ -0,0 +1,74 @@
+"""
+Explanation latency: cold TreeSHAP, cached and prefetched lookups, and bulk rows/s.
+
+Times, one distinct row at a time, what ``explain()`` adds to a request
+when the row is not cached (an exact ``pred_contribs`` call), when it is
+cached, and when the form POST already queued it for the prefetch
+thread; then the vectorized bulk mode, exact and approximate, over a
+whole synthetic cohort.
+
+    python benchmarks/bench_explanations.py [--rows 500] [--bulk-rows 20000] [--model PATH]
+"""
+
+import argparse
+import json
+import time
+import warnings
+
+from common import DEFAULT_MODEL_PATH, summarize, synthetic_features, time_calls
+from explanations import Explainer, ModelExplanations
+from model_loader import file_sha256
+from prediction_cache import PredictionCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=500, help='distinct rows to time one at a time')
+    parser.add_argument('--bulk-rows', type=int, default=20000)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    def fresh():
+        return ModelExplanations(args.model, file_sha256(args.model), PredictionCache(maxsize=0),
+                                 maxsize=4 * args.rows)
+
+    rows = [(list(row),) for row in synthetic_features(args.rows, seed=6)]
+    explanations = fresh()
+    explanations.explain(rows[0][0])
+    cold = time_calls(explanations.explain, rows)
+    cached = time_calls(explanations.explain, rows)
+
+    # The dashboard's request arrives a few milliseconds after the form POST
+    explanations = fresh()
+    explanations.explain(rows[0][0])
+    for (row,) in rows:
+        explanations.prefetch(row)
+    time.sleep(0.005 * len(rows))
+    prefetched = time_calls(explanations.explain, rows)
+
+    cohort = synthetic_features(args.bulk_rows, seed=7)
+    bulk = {}
+    for mode in ('exact', 'approx'):
+        explainer = Explainer.load(args.model, approximate=mode == 'approx')
+        start = time.perf_counter()
+        explainer.explain_matrix(cohort)
+        bulk[mode] = args.bulk_rows / (time.perf_counter() - start)
+
+    results = {
+        'rows': len(rows),
+        'cold': summarize(cold),
+        'cached': summarize(cached),
+        'prefetched': summarize(prefetched),
+        'bulk_rows_per_s': bulk
+    }
+    print(f"{'path':<12}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name in ('cold', 'cached', 'prefetched'):
+        print(f"{name:<12}{results[name]['p50_us']:>12.1f}{results[name]['p99_us']:>12.1f}")
+    print(f"Bulk over {args.bulk_rows:,} rows: {bulk['exact']:,.0f} rows/s exact, "
+          f"{bulk['approx']:,.0f} rows/s approx")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
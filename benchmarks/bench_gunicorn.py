@@ -0,0 +1,92 @@
+"""
+Total memory and first-request latency of a gunicorn deployment.
+
+Starts gunicorn with gunicorn.conf.py twice (with and without preload),
+waits for the workers to boot, then reports the summed proportional set
+size (PSS, which splits shared copy-on-write pages fairly between
+processes) of the master and all workers, plus the latency of the first
+request. Linux only, since it reads /proc/<pid>/smaps_rollup.
+
+    python benchmarks/bench_gunicorn.py [--workers 4] [--engine fast]
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+from common import ROOT
+
+
+def pss_mb(pid):
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def measure(preload, workers, engine, port):
+    env = dict(os.environ, CARDIOCHECK_PRELOAD='1' if preload else '0',
+               CARDIOCHECK_WORKERS=str(workers), CARDIOCHECK_MODEL_ENGINE=engine,
+               PORT=str(port), PYTHONWARNINGS='ignore')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        started = time.perf_counter()
+        while len(children(server.pid)) < workers:
+            if time.perf_counter() - started > 60:
+                raise RuntimeError("gunicorn workers did not start")
+            time.sleep(0.1)
+        url = f'http://127.0.0.1:{port}/api/predict/batch'
+        body = json.dumps([{'age': 50, 'bmi': 31}]).encode()
+        while True:
+            try:
+                request_start = time.perf_counter()
+                urllib.request.urlopen(urllib.request.Request(
+                    url, data=body, headers={'Content-Type': 'application/json'}), timeout=30).read()
+                first_request_ms = (time.perf_counter() - request_start) * 1000
+                break
+            except OSError:
+                time.sleep(0.1)
+        boot_s = time.perf_counter() - started
+        time.sleep(1)
+        processes = [server.pid] + children(server.pid)
+        return {
+            'preload': preload,
+            'processes': len(processes),
+            'total_pss_mb': sum(pss_mb(pid) for pid in processes),
+            'boot_s': boot_s,
+            'first_request_ms': first_request_ms
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--engine', default='auto')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    results = [measure(preload, args.workers, args.engine, args.port) for preload in (False, True)]
+    print(f"{'preload':<9}{'procs':>6}{'PSS (MB)':>10}{'boot (s)':>10}{'1st req (ms)':>14}")
+    for r in results:
+        print(f"{str(r['preload']):<9}{r['processes']:>6}{r['total_pss_mb']:>10.1f}"
+              f"{r['boot_s']:>10.2f}{r['first_request_ms']:>14.1f}")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
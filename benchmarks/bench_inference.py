@@ -0,0 +1,78 @@
+"""
+Single-prediction latency: sklearn pipeline vs FastPredictor.
+
+Checks that FastPredictor matches ``model.predict`` and
+``model.predict_proba`` bit-for-bit on the held-out rows, then times one
+row at a time the way ``index()`` scores a form submission.
+
+    python benchmarks/bench_inference.py [--rows 5000] [--model PATH] [--data PATH]
+"""
+
+import argparse
+import json
+import pickle
+import warnings
+
+import numpy as np
+
+from common import (DEFAULT_DATA_PATH, DEFAULT_MODEL_PATH, load_holdout,
+                    summarize, time_calls)
+from features import FEATURE_COLUMNS
+from inference import FastPredictor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=5000, help='rows to time one at a time')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH)
+    args = parser.parse_args()
+
+    import pandas as pd
+    warnings.filterwarnings('ignore')
+
+    with open(args.model, 'rb') as f:
+        pipeline = pickle.load(f)
+    fast = FastPredictor.from_pipeline(pipeline)
+
+    rows = load_holdout(args.data)
+    df = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    expected_proba = pipeline.predict_proba(df)[:, 1]
+    expected_pred = pipeline.predict(df)
+    proba_match = np.array_equal(fast.predict_proba(rows), expected_proba)
+    pred_match = np.array_equal(fast.predict(rows), expected_pred)
+    print(f"Parity on {len(rows)} held-out rows: "
+          f"predict_proba {'identical' if proba_match else 'MISMATCH'}, "
+          f"predict {'identical' if pred_match else 'MISMATCH'}")
+
+    sample = rows[:args.rows]
+    calls = [(list(r),) for r in sample]
+
+    # The pipeline timing includes DataFrame construction, as in index()
+    pipeline_predict = lambda r: pipeline.predict(pd.DataFrame([r], columns=FEATURE_COLUMNS))
+
+    # Warm both paths before timing
+    time_calls(pipeline_predict, calls[:50])
+    time_calls(fast.predict_one, calls[:50])
+
+    pipeline_samples = time_calls(pipeline_predict, calls)
+    fast_samples = time_calls(fast.predict_one, calls)
+
+    results = {
+        'rows': len(sample),
+        'parity': {'predict_proba': proba_match, 'predict': pred_match},
+        'pipeline': summarize(pipeline_samples),
+        'fast': summarize(fast_samples)
+    }
+    results['speedup_p50'] = results['pipeline']['p50_us'] / results['fast']['p50_us']
+    results['speedup_p99'] = results['pipeline']['p99_us'] / results['fast']['p99_us']
+
+    print(f"{'path':<10}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name in ('pipeline', 'fast'):
+        print(f"{name:<10}{results[name]['p50_us']:>12.1f}{results[name]['p99_us']:>12.1f}")
+    print(f"Speedup: {results['speedup_p50']:.1f}x p50, {results['speedup_p99']:.1f}x p99")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
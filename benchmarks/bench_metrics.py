@@ -0,0 +1,79 @@
+"""
+Overhead of the request instrumentation in metrics.py.
+
+Times the primitives (counter increment, histogram observation, a stage
+lap), rendering ``/metrics``, and a full form POST through the Flask
+test client with recording on and off.
+
+    python benchmarks/bench_metrics.py [--calls 100000] [--requests 2000]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# Measure the shared-directory mode gunicorn uses
+os.environ.setdefault('CARDIOCHECK_METRICS_DIR', tempfile.mkdtemp(prefix='bench-metrics-'))
+os.environ.setdefault('CARDIOCHECK_ASSESSMENT_DB', '')
+
+from common import summarize  # noqa: E402
+import metrics  # noqa: E402
+
+
+def per_call_ns(func, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    counter = metrics.Counter('bench_total', 'Benchmark counter').labels()
+    histogram = metrics.STAGE_SECONDS.labels('bench', 'stage')
+    timer = metrics.RequestTimer('bench')
+    primitives = {
+        'counter_inc_ns': per_call_ns(counter.inc, args.calls),
+        'histogram_observe_ns': per_call_ns(lambda: histogram.observe(0.0003), args.calls),
+        'labels_and_observe_ns': per_call_ns(
+            lambda: metrics.STAGE_SECONDS.labels('bench', 'stage').observe(0.0003), args.calls),
+        'timer_lap_ns': per_call_ns(lambda: timer.lap('stage'), args.calls)
+    }
+
+    import app as webapp
+    client = webapp.app.test_client()
+    form = {'age': 63, 'bmi': 27.4, 'highbp': 1}
+    requests = {}
+    for enabled in (False, True, False, True):
+        metrics.ENABLED = enabled
+        samples = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            client.post('/', data=form)
+            samples.append((time.perf_counter() - started) * 1e6)
+        # Keep the second (warm) run of each setting
+        requests['on' if enabled else 'off'] = summarize(np.asarray(samples))
+
+    started = time.perf_counter()
+    text = metrics.render()
+    render_ms = (time.perf_counter() - started) * 1000
+
+    for name, ns in primitives.items():
+        print(f"{name:24s} {ns:8.0f} ns")
+    print(f"form POST, metrics off   p50 {requests['off']['p50_us']:8.1f} us")
+    print(f"form POST, metrics on    p50 {requests['on']['p50_us']:8.1f} us   "
+          f"(+{requests['on']['p50_us'] - requests['off']['p50_us']:.1f} us)")
+    print(f"render /metrics          {render_ms:8.2f} ms for {len(text.splitlines())} lines")
+    print(json.dumps({'primitives': primitives, 'requests': requests, 'render_ms': render_ms}))
+
+
+if __name__ == '__main__':
+    main()
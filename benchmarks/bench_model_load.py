@@ -0,0 +1,123 @@
+"""
+Model load time: legacy pipeline pickle vs the versioned model bundle.
+
+Each format is loaded with the ``fast`` (xgboost booster) and ``trees``
+(NumPy-only) engines, in a fresh interpreter (so library imports count,
+as they do for a new worker) and again in-process with the libraries
+already imported. A load ends with the first prediction, which is when a
+bundle's booster is actually parsed. The pickle's ``trees`` engine reads
+the separate export from export_trees.py and is skipped when there is
+none. Reports file size, best wall
+time, peak RSS and which heavy libraries each path imported.
+
+    python benchmarks/bench_model_load.py [--pickle best_heart_model.pkl]
+                                          [--bundle best_heart_model.bundle] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import ROOT
+from model_loader import compiled_path_for
+
+LOADERS = {
+    ('pickle', 'fast'): '''
+import pickle
+from inference import FastPredictor
+with open(PATH, 'rb') as f:
+    predictor = FastPredictor.from_pipeline(pickle.load(f))
+''',
+    ('pickle', 'trees'): '''
+from model_loader import compiled_path_for
+from tree_evaluator import CompiledTreePredictor
+predictor = CompiledTreePredictor.load(compiled_path_for(PATH))
+''',
+    ('bundle', 'fast'): '''
+from model_bundle import ModelBundle
+predictor = ModelBundle.open(PATH).predictor()
+''',
+    ('bundle', 'trees'): '''
+from model_bundle import ModelBundle
+predictor = ModelBundle.open(PATH).compiled_predictor()
+'''
+}
+
+PROBE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+PATH = {path!r}
+{loader}
+predictor.predict_proba_one([0.0] * 21)
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [m for m in ('xgboost', 'sklearn', 'pandas') if m in sys.modules]
+}}))
+'''
+
+
+def cold_load(loader, path):
+    env = dict(os.environ, PYTHONWARNINGS='ignore', PYTHONPATH=ROOT)
+    code = PROBE.format(path=path, loader=LOADERS[loader])
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def warm_load(loader, path, repeat):
+    import warnings
+    warnings.simplefilter('ignore')
+    code = compile(LOADERS[loader], '/'.join(loader), 'exec')
+    best = float('inf')
+    for _ in range(repeat):
+        namespace = {'PATH': path}
+        start = time.perf_counter()
+        exec(code, namespace)
+        namespace['predictor'].predict_proba_one([0.0] * 21)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pickle', default=os.path.join(ROOT, 'best_heart_model.pkl'))
+    parser.add_argument('--bundle', default=os.path.join(ROOT, 'best_heart_model.bundle'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paths = {'pickle': args.pickle, 'bundle': args.bundle}
+    loaders = list(LOADERS)
+    if not os.path.exists(compiled_path_for(args.pickle)):
+        print(f"Skipping pickle/trees: no export at {compiled_path_for(args.pickle)}; "
+              f"run export_trees.py --model {args.pickle}")
+        loaders.remove(('pickle', 'trees'))
+    results = {}
+    # Every cold run first: children inherit the parent's peak RSS on Linux,
+    # so the parent must not have imported xgboost yet
+    for fmt, engine in loaders:
+        path = paths[fmt]
+        runs = [cold_load((fmt, engine), path) for _ in range(args.repeat)]
+        results[f"{fmt}/{engine}"] = {
+            'bytes': os.path.getsize(path),
+            'cold_s': min(r['seconds'] for r in runs),
+            'max_rss_mb': min(r['max_rss_mb'] for r in runs),
+            'heavy_modules': runs[0]['heavy_modules']
+        }
+    for fmt, engine in loaders:
+        results[f"{fmt}/{engine}"]['warm_ms'] = warm_load((fmt, engine), paths[fmt], args.repeat) * 1000
+
+    for name, r in results.items():
+        print(f"{name:13s} {r['bytes'] / 1024:5.0f} KiB   cold {r['cold_s'] * 1000:7.1f} ms   "
+              f"warm {r['warm_ms']:6.2f} ms   peak RSS {r['max_rss_mb']:6.1f} MB   "
+              f"imports {', '.join(r['heavy_modules']) or '-'}")
+    print(f"Cold start, bundle/trees vs pickle/fast: "
+          f"{results['pickle/fast']['cold_s'] / results['bundle/trees']['cold_s']:.1f}x faster")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Cold-start import cost of the app and the evaluation tools, tracked over time.
+
+Runs ``python -X importtime -c "import <module>"`` in fresh interpreters
+for each module and reports the median cumulative import time, the
+modules that cost the most, and which heavy libraries got imported. For
+``app`` it also times ``app.warm_up()``, i.e. loading the model, which
+the import itself no longer does. Each run is appended to a JSONL history
+(with the git commit) and compared with the previous run of the same
+module, so regressions show up as workers scale up and down.
+
+    python benchmarks/bench_startup.py [--modules app asgi model_evaluation] [--repeat 5]
+                                       [--history benchmarks/startup_history.jsonl]
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from common import ROOT, git_commit
+
+HEAVY_MODULES = ('pandas', 'sklearn', 'xgboost', 'scipy', 'matplotlib', 'seaborn')
+FIRST_USE = {'app': 'app.warm_up()'}
+DEFAULT_HISTORY = os.path.join(ROOT, 'benchmarks', 'startup_history.jsonl')
+
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{first_use}
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'first_use_ms': (time.perf_counter() - imported) * 1000,
+    'heavy_modules': [m for m in {heavy!r} if m in sys.modules]
+}}))
+'''
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us, depth)} from ``-X importtime`` output"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+def measure(module):
+    """One fresh-interpreter run: probe timings plus the parsed importtime table"""
+    env = dict(os.environ, PYTHONWARNINGS='ignore', PYTHONPATH=ROOT)
+    code = PROBE.format(module=module, first_use=FIRST_USE.get(module, ''), heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    probe['process_ms'] = wall_ms
+    probe['modules'] = parse_importtime(result.stderr)
+    return probe
+
+
+def summarize(module, runs, top):
+    median = lambda values: statistics.median(values)
+    self_times = {}
+    for run in runs:
+        for name, (self_us, _, _) in run['modules'].items():
+            self_times.setdefault(name, []).append(self_us)
+    slowest = sorted(((median(v) / 1000, name) for name, v in self_times.items()), reverse=True)
+    return {
+        'module': module,
+        'import_ms': median([r['import_ms'] for r in runs]),
+        'first_use_ms': median([r['first_use_ms'] for r in runs]) if module in FIRST_USE else None,
+        'process_ms': median([r['process_ms'] for r in runs]),
+        'modules_imported': len(runs[0]['modules']),
+        'heavy_modules': runs[0]['heavy_modules'],
+        'slowest_self_ms': [[name, round(ms, 2)] for ms, name in slowest[:top]]
+    }
+
+
+def previous_runs(history):
+    """Latest recorded summary per module"""
+    latest = {}
+    if history and os.path.exists(history):
+        with open(history) as f:
+            for line in f:
+                record = json.loads(line)
+                for summary in record['results']:
+                    latest[summary['module']] = summary
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--modules', nargs='+', default=['app', 'asgi', 'model_evaluation'])
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per module')
+    parser.add_argument('--top', type=int, default=8, help='slowest modules to list')
+    parser.add_argument('--history', default=DEFAULT_HISTORY,
+                        help="JSONL file to append results to ('' to skip)")
+    args = parser.parse_args()
+
+    before = previous_runs(args.history)
+    results = []
+    for module in args.modules:
+        summary = summarize(module, [measure(module) for _ in range(args.repeat)], args.top)
+        results.append(summary)
+
+        line = f"{module:18s} import {summary['import_ms']:7.1f} ms"
+        if summary['first_use_ms'] is not None:
+            line += f"   first use {summary['first_use_ms']:7.1f} ms"
+        line += f"   process {summary['process_ms']:7.1f} ms   {summary['modules_imported']} modules"
+        if module in before:
+            delta = summary['import_ms'] - before[module]['import_ms']
+            line += f"   ({delta:+.1f} ms vs last run)"
+        print(line)
+        print(f"  heavy: {', '.join(summary['heavy_modules']) or '-'}")
+        print("  slowest: " + ', '.join(f"{name} {ms:.1f}" for name, ms in summary['slowest_self_ms']))
+
+    record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit(),
+              'python': platform.python_version(), 'results': results}
+    if args.history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    print(json.dumps(record))
+
+
+if __name__ == '__main__':
+    main()
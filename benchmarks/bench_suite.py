@@ -0,0 +1,337 @@
+"""
+Benchmark suite for the serving and evaluation hot paths, with a regression gate.
+
+Measures, with seeded inputs:
+
+- ``startup``: importing the app and loading the serving model
+  (``app.warm_up()``), each in fresh interpreters
+- ``route``: single-prediction latency of a form POST through ``index()``
+- ``api``: requests per second of every ``/api/*`` endpoint (and
+  ``/metrics``) through Flask's test client
+- ``pipeline``: the sklearn pipeline's ``predict`` and ``predict_proba``
+  at batch sizes from 1 to 100k rows
+- ``evaluation``: ``HeartDiseaseModelEvaluator.run_full_evaluation`` on a
+  synthetic dataset of ``--eval-rows`` rows
+
+Every metric is the median of ``--repeat`` runs. Results are written as
+JSON to ``--output`` and compared with ``--baseline``: a metric regresses
+when it is worse than the baseline by more than its threshold (``--threshold``,
+or the looser per-group value in THRESHOLDS for the noisier subprocess
+and evaluation timings), and the script then exits with status 1. With
+no baseline to compare with it exits with status 2, so a gate that was
+never set up cannot pass silently. ``--save-baseline`` records the run as
+the new baseline instead. Only
+compare runs from the same machine; the environment is stored with the
+results so mismatches are reported.
+
+    python benchmarks/bench_suite.py [--only api pipeline] [--quick] [--repeat 3]
+                                     [--output benchmarks/results.json]
+                                     [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from common import ROOT, git_commit, synthetic_features
+
+GROUPS = ('startup', 'route', 'api', 'pipeline', 'evaluation')
+BATCH_SIZES = (1, 10, 100, 1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.2
+# Fresh interpreters and model fitting vary more from run to run
+THRESHOLDS = {'startup': 0.5, 'evaluation': 0.35}
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results.json')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+ANSWERS = {'age': 58, 'bmi': 31.5, 'highbp': 1, 'highchol': 1, 'smoker': 1,
+           'physactivity': 0, 'diabetes': 2, 'genhlth': 4}
+
+STARTUP_PROBE = r'''
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.warm_up()
+print(json.dumps({'import_ms': (imported - start) * 1000,
+                  'model_load_ms': (time.perf_counter() - imported) * 1000}))
+'''
+
+
+def metric(value, unit, better='lower'):
+    return {'value': float(value), 'unit': unit, 'better': better}
+
+
+def bench_startup(args):
+    env = dict(os.environ, PYTHONWARNINGS='ignore', PYTHONPATH=ROOT, CARDIOCHECK_ASSESSMENT_DB='',
+               CARDIOCHECK_PRELOAD_MODEL='0')
+    env.pop('CARDIOCHECK_METRICS_DIR', None)
+    runs = []
+    for _ in range(args.repeat):
+        result = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {
+        'startup.app_import_ms': metric(statistics.median(r['import_ms'] for r in runs), 'ms'),
+        'startup.model_load_ms': metric(statistics.median(r['model_load_ms'] for r in runs), 'ms')
+    }
+
+
+def form_rows(n, seed=0):
+    """Distinct form submissions, so every one misses the prediction cache"""
+    rng = np.random.default_rng(seed)
+    return [{'age': int(age), 'bmi': round(float(bmi), 2), 'highbp': int(highbp), 'genhlth': int(genhlth)}
+            for age, bmi, highbp, genhlth in zip(rng.integers(18, 90, n), rng.uniform(15, 50, n),
+                                                 rng.integers(0, 2, n), rng.integers(1, 6, n))]
+
+
+def bench_route(webapp, args):
+    client = webapp.app.test_client()
+    for row in form_rows(20, seed=1):
+        client.post('/', data=row)
+    samples = []
+    for row in form_rows(args.requests):
+        start = time.perf_counter()
+        response = client.post('/', data=row)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    samples = np.array(samples) * 1e6
+    return {
+        'route.index_post.p50_us': metric(np.percentile(samples, 50), 'us'),
+        'route.index_post.p99_us': metric(np.percentile(samples, 99), 'us')
+    }
+
+
+def api_cases(cookie):
+    """Name -> call of each endpoint; the history endpoints run as a user with recorded assessments"""
+    cookie = {'Cookie': cookie}
+    batch = [dict(row, id=i) for i, row in enumerate(form_rows(100, seed=2))]
+    return {
+        'health_metrics': lambda c: c.post('/api/health-metrics', json=ANSWERS),
+        'risk_factors': lambda c: c.post('/api/risk-factors', json=ANSWERS),
+        'assessment_get': lambda c: c.get('/api/assessment', query_string=ANSWERS, headers=cookie),
+        'assessment_post': lambda c: c.post('/api/assessment', json=ANSWERS, headers=cookie),
+        'community_stats': lambda c: c.get('/api/community-stats', query_string=ANSWERS),
+        'health_timeline': lambda c: c.get('/api/health-timeline', headers=cookie),
+        'predict_batch_100': lambda c: c.post('/api/predict/batch', json=batch),
+        'predict_batch_100_explain': lambda c: c.post('/api/predict/batch?explain=1', json=batch),
+        'metrics': lambda c: c.get('/metrics')
+    }
+
+
+def seed_history(webapp, user, n=1000):
+    """A year of recorded assessments for ``user``, so the timeline reads real rows"""
+    store = webapp.assessment_store
+    rows = synthetic_features(n, seed=3)
+    now = time.time()
+    for i, row in enumerate(rows):
+        store.record(user, row, 0.3, 0, ts=now - (n - i) * 86400 * 365 / n)
+    store.flush()
+
+
+def bench_api(webapp, args):
+    user = 'a' * 32
+    seed_history(webapp, user)
+    client = webapp.app.test_client()
+    results = {}
+    for name, call in api_cases(f"{webapp.USER_COOKIE}={user}").items():
+        response = call(client)
+        assert response.status_code == 200, (name, response.status_code)
+        rates = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                call(client)
+            rates.append(args.requests / (time.perf_counter() - start))
+        results[f"api.{name}.req_per_s"] = metric(statistics.median(rates), 'req/s', 'higher')
+    return results
+
+
+def bench_pipeline(args):
+    import pandas as pd
+    from features import FEATURE_COLUMNS
+    from model_loader import default_model_path, read_pipeline
+
+    pipeline = read_pipeline(default_model_path(ROOT))
+    rows = synthetic_features(max(args.batch_sizes), seed=4)
+    results = {}
+    for n in args.batch_sizes:
+        frame = pd.DataFrame(rows[:n], columns=FEATURE_COLUMNS)
+        # Small batches are repeated so each sample is long enough to time reliably
+        calls = max(1, min(200, 20000 // n))
+        for method in ('predict', 'predict_proba'):
+            func = getattr(pipeline, method)
+            func(frame)
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for _ in range(calls):
+                    func(frame)
+                samples.append((time.perf_counter() - start) / calls)
+            results[f"pipeline.{method}.{n}_ms"] = metric(statistics.median(samples) * 1000, 'ms')
+    return results
+
+
+def write_dataset(path, n, seed=5):
+    """Synthetic CSV with the dataset's columns and a target that depends on them"""
+    import pandas as pd
+    from features import FEATURE_COLUMNS
+    from dataset import TARGET_COLUMN
+
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(synthetic_features(n, seed), columns=FEATURE_COLUMNS)
+    score = frame['HighBP'] + frame['Age'] / 13 + frame['GenHlth'] / 5 + rng.uniform(0, 1, n)
+    frame.insert(0, TARGET_COLUMN, (score > 2.2).astype(int))
+    frame.to_csv(path, index=False)
+
+
+def bench_evaluation(args):
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    from model_evaluation import HeartDiseaseModelEvaluator
+
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, 'heart_health.csv')
+        write_dataset(data_path, args.eval_rows)
+        for i in range(args.repeat):
+            # A fresh cache directory each run, so cross-validation is really fitted
+            evaluator = HeartDiseaseModelEvaluator(data_path=data_path, n_jobs=args.eval_jobs,
+                                                   cache_dir=os.path.join(tmp, f"cache{i}"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                ok = evaluator.run_full_evaluation()
+            samples.append(time.perf_counter() - start)
+            assert ok, 'evaluation failed'
+    return {'evaluation.run_full_evaluation_s': metric(statistics.median(samples), 's')}
+
+
+def environment():
+    import pandas, sklearn, xgboost
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__
+    }
+
+
+def threshold_for(name, default):
+    return max(default, THRESHOLDS.get(name.split('.')[0], default))
+
+
+def compare(metrics, baseline, default_threshold):
+    """One row per metric: (name, baseline, current, relative change, status)"""
+    rows = []
+    for name, current in metrics.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current['value'], None, 'new'))
+            continue
+        change = current['value'] / base['value'] - 1 if base['value'] else 0.0
+        worse = change if current['better'] == 'lower' else -change
+        threshold = threshold_for(name, default_threshold)
+        status = 'REGRESSED' if worse > threshold else 'improved' if worse < -threshold else 'ok'
+        rows.append((name, base['value'], current['value'], change, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer requests, batches up to 10k and a 5k-row evaluation')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per metric (median is kept)')
+    parser.add_argument('--requests', type=int, default=None, help='requests per route/API run')
+    parser.add_argument('--eval-rows', type=int, default=None, help='rows in the evaluation dataset')
+    parser.add_argument('--eval-jobs', type=int, default=-1, help='cores for cross-validation')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="results JSON ('' to skip)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to --baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative slowdown before a metric counts as a regression')
+    args = parser.parse_args()
+    args.requests = args.requests or (100 if args.quick else 500)
+    args.eval_rows = args.eval_rows or (5000 if args.quick else 50000)
+    args.batch_sizes = [n for n in BATCH_SIZES if not args.quick or n <= 10000]
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if 'startup' in args.only:
+            metrics.update(bench_startup(args))
+        if {'route', 'api'} & set(args.only):
+            # Recorded assessments go to a throwaway database
+            os.environ['CARDIOCHECK_ASSESSMENT_DB'] = os.path.join(tmp, 'assessments.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                import app as webapp
+                webapp.warm_up()
+            if 'route' in args.only:
+                metrics.update(bench_route(webapp, args))
+            if 'api' in args.only:
+                metrics.update(bench_api(webapp, args))
+        if 'pipeline' in args.only:
+            metrics.update(bench_pipeline(args))
+        if 'evaluation' in args.only:
+            metrics.update(bench_evaluation(args))
+
+    results = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'environment': environment(),
+        'config': {'requests': args.requests, 'eval_rows': args.eval_rows, 'repeat': args.repeat,
+                   'batch_sizes': args.batch_sizes},
+        'metrics': metrics
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['environment'] != results['environment']:
+            print(f"Warning: baseline was recorded in a different environment: {baseline['environment']}")
+        if baseline['config'] != results['config']:
+            print(f"Warning: baseline was recorded with different settings: {baseline['config']}")
+        print(f"Compared with baseline {baseline.get('commit')} from {baseline['time']}:")
+        for name, base, current, change, status in compare(metrics, baseline['metrics'], args.threshold):
+            base_text = f"{base:12.3f}" if base is not None else f"{'-':>12s}"
+            change_text = f"{change:+7.1%}" if change is not None else f"{'':7s}"
+            print(f"  {name:40s} {base_text} -> {current:12.3f} {metrics[name]['unit']:6s} "
+                  f"{change_text}  {status}")
+            if status == 'REGRESSED':
+                regressions.append(name)
+    else:
+        for name, value in metrics.items():
+            print(f"  {name:40s} {value['value']:12.3f} {value['unit']}")
+        print(f"No baseline at {args.baseline}; run with --save-baseline on this machine "
+              f"to record one", file=sys.stderr)
+        sys.exit(2)
+
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
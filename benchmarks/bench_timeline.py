@@ -0,0 +1,76 @@
+"""
+Assessment store: request-path cost of recording and timeline read latency.
+
+Fills a fresh SQLite store with ``--users`` users, each with ``--years``
+of daily assessments, through the batching writer, then times:
+
+* ``record()`` as the request path sees it (queueing only)
+* writer throughput until everything is committed
+* one user's timeline over their whole history, downsampled to
+  ``--points`` buckets, against reading every row of it
+
+    python benchmarks/bench_timeline.py [--users 200] [--years 3] [--points 12]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import summarize, synthetic_features, time_calls
+from assessment_store import AssessmentStore
+
+DAY = 86400.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--points', type=int, default=12)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    days = int(args.years * 365)
+    rows = synthetic_features(days, seed=1)
+    probabilities = np.random.default_rng(1).uniform(0, 1, days)
+    start = time.time() - days * DAY
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AssessmentStore(os.path.join(tmp, 'assessments.db'), max_queue=1 << 30)
+        calls = [(f"user{u:05d}", rows[d], probabilities[d], 0, 'bench', start + d * DAY)
+                 for d in range(days) for u in range(args.users)]
+        began = time.perf_counter()
+        record_us = time_calls(store.record, calls)
+        store.flush(timeout=600)
+        elapsed = time.perf_counter() - began
+        size = os.path.getsize(store.path) + os.path.getsize(store.path + '-wal')
+
+        users = [f"user{u:05d}" for u in np.random.default_rng(2).integers(0, args.users, args.queries)]
+        downsampled = summarize(time_calls(store.timeline, [(u, None, None, args.points) for u in users]))
+        full = summarize(time_calls(store.timeline, [(u, None, None, days) for u in users]))
+
+    results = {
+        'rows': len(calls),
+        'record': summarize(record_us),
+        'writes_per_s': len(calls) / elapsed,
+        'batches': store.stats()['batches'],
+        'db_mb': size / 1e6,
+        'timeline_downsampled': downsampled,
+        'timeline_all_rows': full
+    }
+    print(f"{len(calls):,} assessments ({args.users} users x {days} days), {size / 1e6:.1f} MB")
+    print(f"record()            p50 {results['record']['p50_us']:7.1f} us   "
+          f"p99 {results['record']['p99_us']:7.1f} us")
+    print(f"writer              {results['writes_per_s']:,.0f} rows/s in {results['batches']:,} batches")
+    print(f"timeline ({args.points} pts)   p50 {downsampled['p50_us']:7.1f} us   "
+          f"p99 {downsampled['p99_us']:7.1f} us")
+    print(f"timeline (all rows) p50 {full['p50_us']:7.1f} us   p99 {full['p99_us']:7.1f} us")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Scripts are run from the repository root, e.g.
+``python benchmarks/bench_inference.py``; this module puts the root on
+``sys.path`` so the app modules import the same way they do in production.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from features import FEATURE_COLUMNS  # noqa: E402
+
+DEFAULT_MODEL_PATH = os.path.join(ROOT, 'best_heart_model.pkl')
+DEFAULT_DATA_PATH = os.path.join(ROOT, 'datasets', 'heart_health.csv')
+
+
+def synthetic_features(n, seed=0):
+    """Random rows in FEATURE_COLUMNS order spanning the form's input ranges"""
+    rng = np.random.default_rng(seed)
+    binary = lambda: rng.integers(0, 2, n)
+    columns = {
+        'HighBP': binary(), 'HighChol': binary(), 'CholCheck': binary(),
+        'BMI': rng.uniform(12, 60, n).round(1), 'Smoker': binary(),
+        'Stroke': np.zeros(n), 'Diabetes': rng.integers(0, 3, n),
+        'PhysActivity': binary(), 'Fruits': binary(), 'Veggies': binary(),
+        'HvyAlcoholConsump': binary(), 'AnyHealthcare': binary(),
+        'NoDocbcCost': binary(), 'GenHlth': rng.integers(1, 6, n),
+        'MentHlth': rng.integers(0, 31, n), 'PhysHlth': rng.integers(0, 31, n),
+        'DiffWalk': binary(), 'Sex': binary(), 'Age': rng.integers(1, 14, n),
+        'Education': rng.integers(1, 7, n), 'Income': rng.integers(1, 9, n)
+    }
+    return np.column_stack([columns[c] for c in FEATURE_COLUMNS]).astype(np.float64)
+
+
+def load_holdout(data_path=DEFAULT_DATA_PATH, n=None, seed=0):
+    """Held-out test rows from the training split, or synthetic rows if the dataset is absent"""
+    if not os.path.exists(data_path):
+        print(f"Dataset not found at {data_path}; using synthetic rows")
+        return synthetic_features(n or 10000, seed)
+
+    from sklearn.model_selection import train_test_split
+    from dataset import load_dataset
+
+    X, y = load_dataset(data_path).split('HeartDiseaseorAttack')
+    X = X[FEATURE_COLUMNS]
+    # Same split as pickle_generator.py so these rows were never trained on
+    _, X_test, _, _ = train_test_split(X, y, stratify=y, test_size=0.2, random_state=42)
+    rows = X_test.to_numpy(dtype=np.float64)
+    return rows[:n] if n else rows
+
+
+def time_calls(func, args_list):
+    """Wall time in microseconds of each ``func(*args)`` call"""
+    samples = np.empty(len(args_list))
+    clock = time.perf_counter
+    for i, args in enumerate(args_list):
+        start = clock()
+        func(*args)
+        samples[i] = clock() - start
+    return samples * 1e6
+
+
+def summarize(samples):
+    """p50/p90/p99/mean of a latency sample in microseconds"""
+    return {
+        'p50_us': float(np.percentile(samples, 50)),
+        'p90_us': float(np.percentile(samples, 90)),
+        'p99_us': float(np.percentile(samples, 99)),
+        'mean_us': float(samples.mean())
+    }
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,308 @@
+"""
+Community statistics from precomputed cohort aggregates.
+
+``build`` scores every row of the training dataset with the model and
+groups the rows into cohorts: age group, BMI range, exercise habit, and
+"people like you" (sex × age group × BMI range). For every cohort it
+keeps the row count, the heart-disease prevalence, the mean model risk
+and a quantile sketch of the model risk (``QUANTILES`` evenly spaced
+quantiles, stored as uint16 like the lookup table). The sketches live in a
+memory-mapped ``.npy`` shared by every worker (a few tens of KB); counts
+and labels live in a JSON manifest.
+
+At request time a cohort is found by direct indexing (one cell per
+combination of dimension codes) and the user's percentile is
+interpolated from the cohort's sketch, so answering never touches the
+raw data. Cohorts with fewer than ``MIN_COHORT_ROWS`` rows answer with the
+whole population instead.
+
+The dataset codes Age as a BRFSS category (1 = 18-24 ... 13 = 80+) while
+the form sends years, so ages of 18 and over are mapped to their category
+before grouping and before scoring the user's row; that way the user is
+ranked by the same model inputs as the cohort. This is a separate score
+from the probability the app displays: with Age in years the model gives
+every adult the same age effect, so ranking that probability against
+cohorts scored by category would be systematically off.
+
+    python community_stats.py build [--data datasets/heart_health.csv] [--quantiles 101]
+    python community_stats.py show [--age 52 --bmi 31 --sex 1 --physactivity 0]
+"""
+
+import argparse
+import bisect
+import json
+import os
+import time
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from health_metrics import BMI_BINS, BMI_CATEGORIES
+
+FORMAT_VERSION = 1
+QUANTILES = 101
+MIN_COHORT_ROWS = 30
+RISK_SCALE = np.iinfo(np.uint16).max
+
+# BRFSS age categories: lower bound in years of categories 2..13
+AGE_CATEGORY_EDGES = [25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80]
+AGE_LABELS = ['18-24', '25-29', '30-34', '35-39', '40-44', '45-49', '50-54',
+              '55-59', '60-64', '65-69', '70-74', '75-79', '80+']
+
+# Cohort dimensions: name -> labels of the codes
+DIMENSIONS = {
+    'age': AGE_LABELS,
+    'bmi': [str(label) for label in BMI_CATEGORIES],
+    'sex': ['Female', 'Male'],
+    'physactivity': ['Inactive', 'Active']
+}
+
+# The cards the dashboard shows, in order: (name, label, dimensions)
+GROUPINGS = [
+    ('age', 'Your Age Group Average Risk', ('age',)),
+    ('bmi', 'Similar BMI Range', ('bmi',)),
+    ('peers', 'People Like You', ('sex', 'age', 'bmi')),
+    ('activity', 'Exercise Habits Comparison', ('physactivity',))
+]
+POPULATION = ('everyone', 'All Respondents', ())
+
+
+def stats_paths(model_path):
+    """(sketch array, manifest) paths of the statistics built for ``model_path``"""
+    base = os.path.splitext(model_path)[0]
+    return base + '.community.npy', base + '.community.json'
+
+
+def age_category(age):
+    """BRFSS age category (1-13) for ages in years; values below 18 already are categories"""
+    age = np.asarray(age, dtype=np.float64)
+    years = np.digitize(age, AGE_CATEGORY_EDGES) + 1
+    return np.where(age >= 18, years, np.clip(np.rint(age), 1, 13)).astype(np.int64)
+
+
+def cohort_features(rows):
+    """Feature rows with Age as a BRFSS category, the way the dataset codes it"""
+    rows = np.array(rows, dtype=np.float64, ndmin=2)
+    age = FEATURE_COLUMNS.index('Age')
+    rows[:, age] = age_category(rows[:, age])
+    return rows
+
+
+def dimension_codes(columns):
+    """{dimension: codes} from a mapping of feature column to values (Age in years or categories)"""
+    return {
+        'age': age_category(columns['Age']) - 1,
+        'bmi': np.digitize(columns['BMI'], BMI_BINS),
+        'sex': (np.asarray(columns['Sex']) != 0).astype(np.int64),
+        'physactivity': (np.asarray(columns['PhysActivity']) != 0).astype(np.int64)
+    }
+
+
+def _plan(groupings):
+    """Cell offset and shape of every grouping in the flat cohort table"""
+    plan, offset = [], 0
+    for name, label, dimensions in groupings:
+        shape = [len(DIMENSIONS[d]) for d in dimensions]
+        plan.append({'name': name, 'label': label, 'dimensions': list(dimensions),
+                     'shape': shape, 'offset': offset})
+        offset += int(np.prod(shape, dtype=np.int64))
+    return plan, offset
+
+
+def _cells(grouping, codes):
+    """Flat cell index per row for one grouping"""
+    if not grouping['dimensions']:
+        return np.full(len(next(iter(codes.values()))), grouping['offset'], dtype=np.int64)
+    coords = [codes[d] for d in grouping['dimensions']]
+    return grouping['offset'] + np.ravel_multi_index(coords, grouping['shape'])
+
+
+def build_stats(risk, target, columns, array_path, manifest_path, source_sha256='',
+                quantiles=QUANTILES):
+    """Aggregate per-row model risk and outcomes into cohorts and write them.
+
+    ``columns`` maps the feature columns the cohorts are defined on (Age,
+    BMI, Sex, PhysActivity) to one value per row.
+    """
+    risk = np.asarray(risk, dtype=np.float64)
+    target = np.asarray(target) != 0
+    codes = dimension_codes(columns)
+    plan, cells = _plan(GROUPINGS + [POPULATION])
+
+    counts = np.zeros(cells, dtype=np.int64)
+    cases = np.zeros(cells, dtype=np.int64)
+    risk_sums = np.zeros(cells, dtype=np.float64)
+    sketch = np.lib.format.open_memmap(array_path, mode='w+', dtype=np.uint16,
+                                       shape=(cells, quantiles))
+    probabilities = np.linspace(0, 1, quantiles)
+    for grouping in plan:
+        cell = _cells(grouping, codes)
+        counts += np.bincount(cell, minlength=cells)
+        cases += np.bincount(cell, weights=target, minlength=cells).astype(np.int64)
+        risk_sums += np.bincount(cell, weights=risk, minlength=cells)
+        # Sorting by (cell, risk) once puts every cohort's scores in one ordered slice
+        order = np.lexsort((risk, cell))
+        bounds = np.searchsorted(cell[order], np.arange(cells + 1))
+        for c in range(grouping['offset'], grouping['offset'] + int(np.prod(grouping['shape']))):
+            scores = risk[order[bounds[c]:bounds[c + 1]]]
+            if len(scores):
+                sketch[c] = _quantize(np.quantile(scores, probabilities))
+    sketch.flush()
+    del sketch
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'source_sha256': source_sha256,
+        'rows': int(len(risk)),
+        'quantiles': quantiles,
+        'risk_scale': RISK_SCALE,
+        'groupings': plan,
+        'counts': counts.tolist(),
+        'cases': cases.tolist(),
+        'mean_risk': np.divide(risk_sums, counts, out=np.zeros(cells), where=counts > 0).tolist()
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class CommunityStats:
+    """Answer cohort questions from prebuilt aggregates"""
+
+    def __init__(self, sketch, manifest):
+        if manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported community stats version {manifest['format_version']}")
+        self.sketch = sketch
+        self.manifest = manifest
+        self.source_sha256 = manifest['source_sha256']
+        self.groupings = {grouping['name']: grouping for grouping in manifest['groupings']}
+        self.counts = manifest['counts']
+        self.cases = manifest['cases']
+        self.mean_risk = manifest['mean_risk']
+        self._levels = np.linspace(0, 100, manifest['quantiles']).tolist()
+
+    @classmethod
+    def load(cls, array_path, manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        return cls(np.load(array_path, mmap_mode='r'), manifest)
+
+    def cohort(self, name, codes):
+        """(cell, cohort label) for a user's dimension codes, or the population if too small"""
+        grouping = self.groupings[name]
+        cell = grouping['offset']
+        if grouping['dimensions']:
+            cell += int(np.ravel_multi_index([codes[d] for d in grouping['dimensions']],
+                                             grouping['shape']))
+        if self.counts[cell] < MIN_COHORT_ROWS:
+            return self.groupings[POPULATION[0]]['offset'], POPULATION[1]
+        return cell, ', '.join(DIMENSIONS[d][codes[d]] for d in grouping['dimensions']) or POPULATION[1]
+
+    def percentile(self, cell, risk):
+        """Share of the cohort (0-100) with a lower model risk than ``risk``"""
+        sketch = self.sketch[cell].tolist()
+        scaled = risk * RISK_SCALE
+        # Interpolate between the two sketch quantiles around the score
+        i = bisect.bisect_left(sketch, scaled)
+        if i == 0:
+            return 0.0
+        if i == len(sketch):
+            return 100.0
+        lo, hi = sketch[i - 1], sketch[i]
+        return self._levels[i - 1] + (self._levels[i] - self._levels[i - 1]) * (scaled - lo) / (hi - lo)
+
+    def describe(self, row, risk):
+        """Dashboard cards comparing a user's feature row and model risk with each cohort"""
+        codes = {d: int(code) for d, code in dimension_codes(dict(zip(FEATURE_COLUMNS, row))).items()}
+        stats = []
+        for name, label, _ in GROUPINGS:
+            cell, cohort = self.cohort(name, codes)
+            percentile = self.percentile(cell, risk)
+            stats.append({
+                'label': label,
+                'value': f"{self.mean_risk[cell] * 100:.0f}%",
+                'percentile': f"{ordinal(round(percentile))} percentile",
+                # Less risk than most of the cohort is the better side
+                'better': percentile < 50,
+                'cohort': cohort,
+                'cohort_size': self.counts[cell],
+                'risk_percentile': round(percentile, 1),
+                'prevalence': self.cases[cell] / self.counts[cell]
+            })
+        return stats
+
+
+def ordinal(n):
+    suffix = 'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f"{n}{suffix}"
+
+
+def _quantize(risk):
+    return np.rint(np.asarray(risk) * RISK_SCALE).astype(np.uint16)
+
+
+def build_command(args):
+    from dataset import TARGET_COLUMN, load_dataset
+    from model_loader import file_sha256, load_model
+
+    started = time.perf_counter()
+    dataset = load_dataset(args.data)
+    predictor = load_model(args.model, engine='fast')
+    columns = [dataset.columns[name] for name in FEATURE_COLUMNS]
+    risk = np.empty(dataset.rows)
+    for start in range(0, dataset.rows, args.chunk_rows):
+        stop = min(start + args.chunk_rows, dataset.rows)
+        # float64 like the training frame (see dataset.py)
+        chunk = np.column_stack([column[start:stop] for column in columns]).astype(np.float64)
+        risk[start:stop] = predictor.predict_proba(chunk)
+        print(f"\r⏳ Scored {stop:,}/{dataset.rows:,} rows", end='', flush=True)
+
+    array_path, manifest_path = stats_paths(args.model)
+    manifest = build_stats(risk, dataset.columns[TARGET_COLUMN], dataset.columns, array_path, manifest_path,
+                           source_sha256=file_sha256(args.model), quantiles=args.quantiles)
+    print(f"\n✅ Community statistics over {manifest['rows']:,} respondents "
+          f"({len(manifest['counts'])} cohorts, {os.path.getsize(array_path) / 1024:.0f} KB) "
+          f"written to {array_path} in {time.perf_counter() - started:.1f}s")
+    small = sum(count < MIN_COHORT_ROWS for count in manifest['counts'])
+    if small:
+        print(f"   {small} cohorts have fewer than {MIN_COHORT_ROWS} rows and answer with everyone")
+
+
+def show_command(args):
+    from features import extract_features
+    from model_loader import load_model
+
+    stats = CommunityStats.load(*stats_paths(args.model))
+    row = cohort_features(extract_features(vars(args)))[0]
+    risk = load_model(args.model).predict_proba_one(row)
+    print(f"Model risk {risk * 100:.1f}%")
+    for stat in stats.describe(row, risk):
+        print(f"   {stat['label']:<28} {stat['cohort']:<28} n={stat['cohort_size']:<7,} "
+              f"avg risk {stat['value']:>4}  prevalence {stat['prevalence'] * 100:4.1f}%  "
+              f"you: {stat['percentile']}")
+
+
+def main():
+    from model_loader import default_model_path
+
+    parser = argparse.ArgumentParser(description="Build or query the community statistics")
+    parser.add_argument('--model', default=default_model_path())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='score the dataset and aggregate it into cohorts')
+    build.add_argument('--data', default='datasets/heart_health.csv')
+    build.add_argument('--quantiles', type=int, default=QUANTILES)
+    build.add_argument('--chunk-rows', type=int, default=1 << 16)
+    build.set_defaults(func=build_command)
+
+    show = commands.add_parser('show', help='print the cards for one assessment')
+    for field in ('age', 'bmi', 'sex', 'physactivity', 'highbp', 'highchol', 'smoker', 'genhlth'):
+        show.add_argument(f'--{field}', type=float)
+    show.set_defaults(func=show_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
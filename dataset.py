@@ -0,0 +1,168 @@
+"""
+Columnar binary cache for the BRFSS dataset.
+
+Parsing heart_health.csv with pandas' defaults yields ~22 float64/int64
+columns for a file whose values almost all fit in a byte. ``load_dataset``
+converts the CSV once into one ``.npy`` file per column next to it
+(``datasets/heart_health.columns/``): uint8 for flags and ordinal scales,
+float32 for BMI. Later loads memory-map those files, so columns come back
+as read-only zero-copy NumPy views and a DataFrame over them costs no
+parsing and almost no memory.
+
+Integer dtypes are only used when they hold a column exactly; a column
+that does not fit (say a fractional MentHlth) is widened instead. BMI is
+rounded to float32, the precision XGBoost scores with anyway. The cache
+is rebuilt when the CSV's SHA-256 changes.
+
+Anything that feeds the sklearn pipeline should ask for ``dtype=np.float64``
+(the dtype ``pd.read_csv`` produced): given float32 input, StandardScaler
+scales in float32, and values a rounding step away from a tree's split
+threshold change the prediction.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from model_loader import file_sha256
+
+DATASET_PATH = os.path.join('datasets', 'heart_health.csv')
+TARGET_COLUMN = 'HeartDiseaseorAttack'
+FORMAT_VERSION = 1
+
+# Compact dtype per column; anything not listed starts as uint8 and is
+# widened until it holds the column exactly
+COLUMN_DTYPES = {'BMI': np.float32}
+DEFAULT_DTYPE = np.uint8
+WIDENING = (np.uint8, np.int16, np.int32, np.float32, np.float64)
+
+
+class Dataset:
+    """Memory-mapped columns of a cached CSV"""
+
+    def __init__(self, columns, source_sha256):
+        self.columns = columns
+        self.source_sha256 = source_sha256
+
+    @property
+    def rows(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def frame(self, columns=None, dtype=None):
+        """DataFrame over the cached arrays: zero-copy views, or copies cast to ``dtype``"""
+        import pandas as pd
+        names = columns or list(self.columns)
+        return pd.DataFrame({name: self._view(name, dtype) for name in names}, copy=False)
+
+    def split(self, target=TARGET_COLUMN, dtype=None):
+        """(features DataFrame, target Series), like ``df.drop(target, axis=1), df[target]``"""
+        import pandas as pd
+        features = [name for name in self.columns if name != target]
+        return (self.frame(features, dtype),
+                pd.Series(self._view(target, dtype), name=target, copy=False))
+
+    def _view(self, name, dtype=None):
+        # Plain ndarray over the mapped buffer so pandas treats it like any other column
+        column = self.columns[name].view(np.ndarray)
+        return column if dtype is None else column.astype(dtype)
+
+
+def cache_dir_for(csv_path):
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+
+def load_dataset(csv_path=DATASET_PATH, cache_dir=None, rebuild=False):
+    """Load ``csv_path`` through its columnar cache, building it if missing or stale"""
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    manifest = None if rebuild else _read_manifest(cache_dir)
+    if manifest is None or not _is_fresh(manifest, csv_path):
+        manifest = build_cache(csv_path, cache_dir)
+
+    columns = {
+        entry['name']: np.load(os.path.join(cache_dir, entry['file']), mmap_mode='r')
+        for entry in manifest['columns']
+    }
+    return Dataset(columns, manifest['source_sha256'])
+
+
+def build_cache(csv_path, cache_dir, chunk_rows=1 << 16):
+    """Convert the CSV into per-column .npy files; returns the manifest"""
+    import pandas as pd
+
+    source_sha256 = file_sha256(csv_path)
+    chunks = {}
+    dtypes = {}
+    for frame in pd.read_csv(csv_path, chunksize=chunk_rows):
+        for name in frame.columns:
+            values = frame[name].to_numpy()
+            dtype = dtypes.get(name, COLUMN_DTYPES.get(name, DEFAULT_DTYPE))
+            while not _fits(values, dtype, exact=name not in COLUMN_DTYPES):
+                if dtype is np.float64:
+                    raise ValueError(f"Column {name!r} in {csv_path} is not numeric")
+                dtype = WIDENING[WIDENING.index(dtype) + 1]
+            if dtype != dtypes.get(name, dtype):
+                chunks[name] = [chunk.astype(dtype) for chunk in chunks[name]]
+            dtypes[name] = dtype
+            chunks.setdefault(name, []).append(values.astype(dtype))
+
+    # Write into a scratch directory and swap it in, so readers never see half a cache
+    tmp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    entries = []
+    for i, (name, parts) in enumerate(chunks.items()):
+        filename = f"{i:02d}.npy"
+        np.save(os.path.join(tmp_dir, filename), np.concatenate(parts))
+        entries.append({'name': name, 'file': filename, 'dtype': np.dtype(dtypes[name]).name})
+    st = os.stat(csv_path)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'source_sha256': source_sha256,
+        'source_size': st.st_size,
+        'source_mtime_ns': st.st_mtime_ns,
+        'rows': sum(len(part) for part in next(iter(chunks.values()), [])),
+        'columns': entries
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    print(f"✅ Cached {csv_path} as {len(entries)} columns in {cache_dir}")
+    return manifest
+
+
+def _fits(values, dtype, exact=True):
+    """True if ``values`` survive a round trip through ``dtype`` (to its precision unless ``exact``)"""
+    if values.dtype.kind not in 'biuf':
+        return False
+    with np.errstate(invalid='ignore', over='ignore'):
+        converted = values.astype(dtype)
+    if np.dtype(dtype).kind == 'f':
+        if not exact:
+            return bool(np.array_equal(np.isfinite(converted), np.isfinite(values)))
+        return np.array_equal(converted.astype(values.dtype), values, equal_nan=True)
+    return bool(np.all(np.isfinite(values))) and np.array_equal(converted, values)
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format_version') == FORMAT_VERSION else None
+
+
+def _is_fresh(manifest, csv_path):
+    st = os.stat(csv_path)
+    if (st.st_size, st.st_mtime_ns) == (manifest['source_size'], manifest['source_mtime_ns']):
+        return True
+    # Touched but maybe not changed: only the content hash decides
+    return st.st_size == manifest['source_size'] and file_sha256(csv_path) == manifest['source_sha256']
+
@@ -4,6 +4,7 @@ Run this to evaluate your heart disease prediction model
 """
 
 from model_evaluation import HeartDiseaseModelEvaluator
+from model_loader import default_model_path
 
 def quick_evaluation():
     """Quick model evaluation"""
@@ -12,7 +13,7 @@ def quick_evaluation():
     
     # Initialize evaluator
     evaluator = HeartDiseaseModelEvaluator(
-        model_path='best_heart_model.pkl',
+        model_path=default_model_path(),
         data_path='datasets/heart_health.csv'
     )
     
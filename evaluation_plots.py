@@ -0,0 +1,78 @@
+"""
+Plotting backend for model_evaluation.py.
+
+Holds the matplotlib/seaborn code of the evaluation dashboard so that
+importing the evaluator (or running the metrics-only evaluate_model.py)
+never loads a plotting stack. ``HeartDiseaseModelEvaluator.plot_evaluation_charts``
+imports this module on first use.
+"""
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+from sklearn.metrics import confusion_matrix, roc_curve
+
+
+def plot_evaluation_dashboard(y_test, y_pred, y_prob, metrics, model, feature_names):
+    """Draw the 2x2 evaluation dashboard and show it; returns the figure"""
+    # Create subplots
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('Heart Disease Model Evaluation Dashboard', fontsize=16, fontweight='bold')
+
+    # 1. Confusion Matrix
+    cm = confusion_matrix(y_test, y_pred)
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[0,0])
+    axes[0,0].set_title('Confusion Matrix')
+    axes[0,0].set_xlabel('Predicted')
+    axes[0,0].set_ylabel('Actual')
+
+    # 2. Metrics Bar Chart
+    metric_names = ['Accuracy', 'Precision', 'Recall', 'F1-Score']
+    metric_values = [metrics['accuracy'], metrics['precision'], metrics['recall'], metrics['f1_score']]
+
+    bars = axes[0,1].bar(metric_names, metric_values, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728'])
+    axes[0,1].set_title('Performance Metrics')
+    axes[0,1].set_ylabel('Score')
+    axes[0,1].set_ylim(0, 1)
+
+    # Add value labels on bars
+    for bar, value in zip(bars, metric_values):
+        height = bar.get_height()
+        axes[0,1].text(bar.get_x() + bar.get_width()/2., height + 0.01,
+                     f'{value:.3f}', ha='center', va='bottom')
+
+    # 3. ROC Curve (if available)
+    if y_prob is not None:
+        fpr, tpr, _ = roc_curve(y_test, y_prob)
+        axes[1,0].plot(fpr, tpr, color='darkorange', lw=2,
+                      label=f'ROC curve (AUC = {metrics["roc_auc"]:.3f})')
+        axes[1,0].plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--')
+        axes[1,0].set_xlim([0.0, 1.0])
+        axes[1,0].set_ylim([0.0, 1.05])
+        axes[1,0].set_xlabel('False Positive Rate')
+        axes[1,0].set_ylabel('True Positive Rate')
+        axes[1,0].set_title('ROC Curve')
+        axes[1,0].legend(loc="lower right")
+    else:
+        axes[1,0].text(0.5, 0.5, 'ROC Curve\nNot Available',
+                      ha='center', va='center', fontsize=12)
+        axes[1,0].set_title('ROC Curve')
+
+    # 4. Feature Importance (if available)
+    if hasattr(model, 'feature_importances_'):
+        feature_importance = pd.DataFrame({
+            'feature': feature_names,
+            'importance': model.feature_importances_
+        }).sort_values('importance', ascending=True).tail(10)
+
+        axes[1,1].barh(feature_importance['feature'], feature_importance['importance'])
+        axes[1,1].set_title('Top 10 Feature Importance')
+        axes[1,1].set_xlabel('Importance')
+    else:
+        axes[1,1].text(0.5, 0.5, 'Feature Importance\nNot Available',
+                      ha='center', va='center', fontsize=12)
+        axes[1,1].set_title('Feature Importance')
+
+    plt.tight_layout()
+    plt.show()
+    return fig
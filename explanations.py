@@ -0,0 +1,355 @@
+"""
+Per-prediction explanations from the model's own trees.
+
+XGBoost's TreeSHAP (``pred_contribs``) splits a prediction's log-odds
+into one contribution per model input plus a base value (the average
+log-odds over the training data): they always add up to the booster's
+margin for the row. Contributions are computed on the scaled row the
+booster scores and reported under the input's own column, so they come
+from the model rather than hand-written thresholds. A positive
+contribution pushed the risk up.
+
+The explanation is of the row the serving engine actually scored. The
+``trees`` engine scores the raw row with the same trees, agreeing with
+the booster's margin to about 1e-6. The ``table`` engine answers from the
+grid cell of the row, with BMI, MentHlth and PhysHlth replaced by their
+bin's value; that row is explained, and the replaced values are listed
+under ``binned``. The margin then matches the served probability up to
+the table's uint16 rounding.
+
+Exact TreeSHAP walks every path of every tree, which costs one to two
+and a half milliseconds per call even for one row, so the serving side
+never does it twice for the same input:
+
+* ``ModelExplanations`` keeps an LRU of explanations per model version,
+  keyed on the prediction cache's packed canonical row, so an
+  explanation always belongs to the exact row that was scored.
+* ``prefetch(row)`` queues a row for a background thread that explains
+  everything queued with one ``pred_contribs`` call. The form POST
+  queues its row, so by the time the dashboard asks /api/assessment for
+  the explanation it is usually cached; a request that arrives while
+  its row is being computed waits for it instead of computing it again.
+* ``explain_many(rows)`` answers a whole batch with one call for the
+  rows not cached, keyed with the cache's vectorized ``canonical_matrix``
+  and ``keys``. It runs inline, so /api/predict/batch only accepts
+  ``?explain=1`` for batches of up to CARDIOCHECK_MAX_EXPLAIN_BATCH rows.
+
+The trees engine never loads xgboost for scoring, so the explainer is
+built on first use from the model file, after checking that the file
+still holds the version being explained. That first use imports xgboost,
+scikit-learn and pandas into the process (about 130 MB); it is never
+done by app.warm_up, so a gunicorn master stays NumPy-only.
+
+Whole cohorts are explained offline with ``Explainer.explain_matrix``,
+which score_file.py uses to add a contribution column per feature.
+Exact TreeSHAP runs at roughly a thousand rows per second per core;
+``approx`` switches to Saabas attributions (one root-to-leaf path per
+tree, still adding up to the margin), which is about a hundred times
+faster for screening large files:
+
+    python score_file.py patients.csv scores.csv --explain [approx] [--workers 4]
+
+Environment overrides:
+    CARDIOCHECK_EXPLAIN              1/0, explain predictions (default 1)
+    CARDIOCHECK_EXPLAIN_CACHE_SIZE   cached explanations per model (default 4096)
+    CARDIOCHECK_EXPLAIN_PREFETCH     1/0, explain form rows in the background (default 1)
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+from features import FEATURE_COLUMNS, FEATURE_SCHEMA
+
+EXPLAIN_ROWS = metrics.BATCH_ROWS.labels('explain')
+EXPLAIN_SECONDS = metrics.INFERENCE_SECONDS.labels('TreeSHAP', 'explain')
+EXPLANATION_HITS = metrics.EXPLANATION_LOOKUPS.labels('hit')
+EXPLANATION_MISSES = metrics.EXPLANATION_LOOKUPS.labels('miss')
+
+# Rows per pred_contribs call in bulk mode; bounds the DMatrix and output size
+DEFAULT_CHUNK_ROWS = 20000
+# Rows the prefetch thread explains in one call at most
+MAX_PREFETCH_BATCH = 256
+# How long a request waits for a row the prefetch thread is already explaining
+PREFETCH_WAIT_SECONDS = 0.5
+
+_FIELDS = [feature.field for feature in FEATURE_SCHEMA]
+
+
+class Explainer:
+    """TreeSHAP contributions of a FastPredictor's booster, per input column"""
+
+    def __init__(self, predictor, approximate=False):
+        """``approximate`` uses Saabas attributions (one path per tree) instead of exact TreeSHAP"""
+        self.predictor = predictor
+        self.approximate = approximate
+        self.n_features = len(FEATURE_COLUMNS)
+
+    @classmethod
+    def load(cls, model_path, approximate=False):
+        """Explainer for a model bundle or pipeline pickle"""
+        from model_bundle import ModelBundle, is_bundle
+
+        if is_bundle(model_path):
+            return cls(ModelBundle.open(model_path).predictor(), approximate)
+        from inference import FastPredictor
+        from model_loader import read_pipeline
+        return cls(FastPredictor.from_pipeline(read_pipeline(model_path)), approximate)
+
+    def contributions(self, rows):
+        """(contributions, base) for raw feature rows.
+
+        ``contributions`` has one column per FEATURE_COLUMNS entry, in
+        log-odds; each row plus its ``base`` value adds up to the model's
+        margin for that row.
+        """
+        import xgboost as xgb
+
+        predictor = self.predictor
+        matrix = predictor.transform(np.asarray(rows, dtype=np.float64).reshape(-1, self.n_features))
+        contribs = predictor.booster.predict(
+            xgb.DMatrix(matrix, missing=predictor.missing),
+            pred_contribs=True,
+            approx_contribs=self.approximate,
+            iteration_range=predictor.iteration_range,
+            validate_features=False
+        )
+        # The booster sees the columns in the preprocessor's order
+        out = np.zeros((len(matrix), self.n_features))
+        out[:, predictor.order] = contribs[:, :-1]
+        return out, contribs[:, -1].astype(np.float64)
+
+    def explain_matrix(self, rows, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Vectorized contributions for a whole cohort, computed ``chunk_rows`` at a time"""
+        rows = np.asarray(rows, dtype=np.float64)
+        out = np.empty((len(rows), self.n_features))
+        base = np.empty(len(rows))
+        for start in range(0, len(rows), chunk_rows):
+            stop = start + chunk_rows
+            out[start:stop], base[start:stop] = self.contributions(rows[start:stop])
+        return out, base
+
+
+def describe(row, contributions, base, scored=None):
+    """JSON explanation of one row, largest effect first.
+
+    ``scored`` is the row the engine scored when it differs from ``row``
+    (binned inputs of the lookup table); those inputs are listed under
+    ``binned`` with the value that was scored.
+    """
+    factors = [{'feature': column, 'field': field, 'value': float(value),
+                'contribution': float(contribution)}
+               for column, field, value, contribution
+               in zip(FEATURE_COLUMNS, _FIELDS, row, contributions)]
+    factors.sort(key=lambda factor: -abs(factor['contribution']))
+    binned = {}
+    if scored is not None:
+        binned = {column: float(value) for column, value, original
+                  in zip(FEATURE_COLUMNS, scored, row) if value != original}
+    return {
+        'base_value': float(base),
+        'margin': float(base + np.sum(contributions)),
+        'binned': binned,
+        'contributions': factors
+    }
+
+
+class ModelExplanations:
+    """Cached, prefetched explanations for one model version"""
+
+    def __init__(self, model_path, sha256, cache, predictor=None, maxsize=4096,
+                 enabled=True, prefetch=True):
+        """``cache`` is the version's PredictionCache, whose canonical rows and keys are reused"""
+        self.model_path = model_path
+        self.sha256 = sha256
+        self.cache = cache
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.prefetch_enabled = prefetch
+        self.error = None
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self._predictor = predictor
+        self._explainer = None
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._start_lock = threading.Lock()
+        self._worker_pid = None
+
+    @classmethod
+    def from_env(cls, model_path, sha256, cache, predictor=None):
+        """Explanations configured by CARDIOCHECK_EXPLAIN* environment variables"""
+        return cls(
+            model_path, sha256, cache, predictor=predictor,
+            maxsize=int(os.environ.get('CARDIOCHECK_EXPLAIN_CACHE_SIZE', 4096)),
+            enabled=os.environ.get('CARDIOCHECK_EXPLAIN', '1') == '1',
+            prefetch=os.environ.get('CARDIOCHECK_EXPLAIN_PREFETCH', '1') == '1'
+        )
+
+    def explainer(self):
+        """The Explainer, built on first use, or None if this version cannot be explained"""
+        if self._explainer is None and self.error is None and self.enabled:
+            with self._load_lock:
+                if self._explainer is None and self.error is None:
+                    self._explainer = self._load()
+        return self._explainer
+
+    def _load(self):
+        predictor = self._predictor
+        try:
+            if getattr(predictor, 'booster', None) is not None and hasattr(predictor, 'transform'):
+                return Explainer(predictor)
+            from model_loader import file_sha256
+            # Other engines do not keep the booster; it must come from the same file
+            if file_sha256(self.model_path) != self.sha256:
+                raise ValueError('the model file changed since this version was loaded')
+            return Explainer.load(self.model_path)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Explanations unavailable for {self.model_path}: {self.error}")
+            return None
+
+    def explain(self, values):
+        """Explanation of one feature row, or None if explanations are unavailable"""
+        return self.explain_many([values])[0]
+
+    def explain_many(self, rows):
+        """Explanations of many rows; all uncached rows are explained with one call.
+
+        The explanations are shared with the cache, so callers must not modify them.
+        """
+        if not self.enabled:
+            return [None] * len(rows)
+
+        canonical = self.cache.canonical_matrix(rows)
+        keys = self.cache.keys(canonical)
+        results = self._lookup_many(keys)
+        missing = [i for i, entry in enumerate(results) if entry is None]
+        if missing:
+            with self._lock:
+                waiting = [self._pending.get(keys[i]) for i in missing]
+            for i, event in zip(missing, waiting):
+                if event is not None and event.wait(PREFETCH_WAIT_SECONDS):
+                    results[i] = self._lookup(keys[i], count=False)
+            missing = [i for i in missing if results[i] is None]
+        if missing and self.explainer() is not None:
+            computed = self._compute(canonical[missing])
+            for i, entry in zip(missing, computed):
+                results[i] = entry
+                self._insert(keys[i], entry)
+        return results
+
+    def prefetch(self, values):
+        """Queue a row to be explained in the background; returns at once"""
+        if not (self.enabled and self.prefetch_enabled) or self.error is not None:
+            return
+        row = self.cache.canonical_row(values)
+        key = self.cache.key(row)
+        with self._lock:
+            if key in self._entries or key in self._pending:
+                return
+            self._pending[key] = threading.Event()
+        self._ensure_worker()
+        self._queue.put((key, row))
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+            pending = len(self._pending)
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'loaded': self._explainer is not None,
+            'error': self.error,
+            'size': size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'prefetched': self.prefetched,
+            'pending': pending,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def _compute(self, rows):
+        started = time.perf_counter()
+        scored_rows = getattr(self._predictor, 'scored_rows', None)
+        # Explain what the engine scored: the lookup table scores binned rows
+        scored = scored_rows(rows) if scored_rows is not None else rows
+        contributions, base = self._explainer.contributions(scored)
+        EXPLAIN_SECONDS.observe(time.perf_counter() - started)
+        EXPLAIN_ROWS.observe(len(rows))
+        return [describe(*args) for args in zip(rows, contributions, base, scored)]
+
+    def _lookup(self, key, count=True):
+        if count:
+            return self._lookup_many([key])[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return entry
+
+    def _lookup_many(self, keys):
+        with self._lock:
+            entries = self._entries
+            results = [entries.get(key) for key in keys]
+            hits = 0
+            for key, entry in zip(keys, results):
+                if entry is not None:
+                    entries.move_to_end(key)
+                    hits += 1
+            self.hits += hits
+            self.misses += len(keys) - hits
+        EXPLANATION_HITS.inc(hits)
+        EXPLANATION_MISSES.inc(len(keys) - hits)
+        return results
+
+    def _insert(self, key, entry):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _ensure_worker(self):
+        # Threads do not survive gunicorn's fork, so each process starts its own
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid():
+                threading.Thread(target=self._run, name='explanation-prefetch', daemon=True).start()
+                self._worker_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_PREFETCH_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if self.explainer() is not None:
+                    for (key, _), entry in zip(batch, self._compute([row for _, row in batch])):
+                        self._insert(key, entry)
+                    self.prefetched += len(batch)
+            except Exception as e:
+                print(f"Explanation prefetch failed: {type(e).__name__}: {e}")
+            finally:
+                with self._lock:
+                    events = [self._pending.pop(key, None) for key, _ in batch]
+                for event in events:
+                    if event is not None:
+                        event.set()
+
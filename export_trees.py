@@ -0,0 +1,129 @@
+"""
+Export the trained pipeline into array-backed trees for NumPy-only serving.
+
+Reads the model (best_heart_model.bundle written by pickle_generator.py,
+or a legacy pipeline pickle) and saves the
+scaler layout plus every booster tree as flat node arrays in
+best_heart_model.npz, which tree_evaluator.CompiledTreePredictor loads
+without xgboost, sklearn or pandas.
+
+    python export_trees.py [--model best_heart_model.bundle] [--output best_heart_model.npz]
+
+Re-run it after every retrain; the app ignores an export whose recorded
+source hash no longer matches the model file.
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from inference import FastPredictor
+from model_loader import compiled_path_for, default_model_path, file_sha256, read_pipeline
+from tree_evaluator import FORMAT_VERSION, CompiledTreePredictor
+
+
+def export_pipeline(pipeline, source_sha256=''):
+    """Flatten a fitted preprocessor + XGBoost pipeline into numpy arrays"""
+    fast = FastPredictor.from_pipeline(pipeline)
+    model = json.loads(fast.booster.save_raw(raw_format='json'))['learner']
+
+    objective = model['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Unsupported objective {objective!r}")
+    booster = model['gradient_booster']
+    if booster['name'] != 'gbtree':
+        raise ValueError(f"Unsupported booster {booster['name']!r}")
+
+    trees = booster['model']['trees']
+    begin, end = fast.iteration_range
+    if end:
+        indptr = booster['model'].get('iteration_indptr')
+        if indptr is None:
+            # XGBoost < 2.0 has no iteration_indptr: every round adds the same number of trees
+            per_round = (int(booster['model']['gbtree_model_param'].get('num_parallel_tree', 1))
+                         * (max(booster['model']['tree_info'], default=0) + 1))
+            indptr = range(0, len(trees) + per_round, per_round)
+        trees = trees[indptr[begin]:indptr[end]]
+
+    feature, threshold, left, right, default_left, value = [], [], [], [], [], []
+    roots, max_depth = [], 0
+    for tree in trees:
+        if any(tree['split_type']):
+            raise ValueError("Categorical splits are not supported")
+        offset = len(feature)
+        roots.append(offset)
+        children_l = np.asarray(tree['left_children'], dtype=np.int64)
+        children_r = np.asarray(tree['right_children'], dtype=np.int64)
+        is_leaf = children_l == -1
+        node_ids = np.arange(len(children_l))
+
+        # Leaves loop back to themselves so a fixed-depth walk stays put
+        left.extend(np.where(is_leaf, node_ids, children_l) + offset)
+        right.extend(np.where(is_leaf, node_ids, children_r) + offset)
+        feature.extend(np.where(is_leaf, 0, tree['split_indices']))
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        threshold.extend(np.where(is_leaf, np.float32(np.inf), conditions))
+        value.extend(np.where(is_leaf, conditions, np.float32(0)))
+        default_left.extend(np.asarray(tree['default_left'], dtype=bool))
+        max_depth = max(max_depth, _tree_depth(children_l, children_r))
+
+    base_score = float(model['learner_model_param']['base_score'].strip('[]'))
+    return {
+        'format_version': np.int32(FORMAT_VERSION),
+        'objective': np.str_(objective),
+        'source_sha256': np.str_(source_sha256),
+        'order': fast.order.astype(np.int32),
+        'mean': fast.mean,
+        'scale': fast.scale,
+        'missing': np.float64(fast.missing),
+        'feature': np.asarray(feature, dtype=np.int32),
+        'threshold': np.asarray(threshold, dtype=np.float32),
+        'left': np.asarray(left, dtype=np.int32),
+        'right': np.asarray(right, dtype=np.int32),
+        'default_left': np.asarray(default_left, dtype=bool),
+        'value': np.asarray(value, dtype=np.float32),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int32(max_depth),
+        # binary:logistic stores base_score as a probability
+        'base_margin': np.float64(np.log(base_score / (1.0 - base_score)))
+    }
+
+
+def _tree_depth(children_l, children_r):
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [c for n in frontier for c in (children_l[n], children_r[n]) if c != -1]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the model to NumPy tree arrays")
+    parser.add_argument('--model', default=default_model_path())
+    parser.add_argument('--output', help='defaults to the model path with a .npz suffix')
+    args = parser.parse_args()
+
+    pipeline = read_pipeline(args.model)
+
+    output = args.output or compiled_path_for(args.model)
+    arrays = export_pipeline(pipeline, source_sha256=file_sha256(args.model))
+    np.savez(output, **arrays)
+
+    # Check the export against the booster on random rows in the form's ranges
+    compiled = CompiledTreePredictor.load(output)
+    fast = FastPredictor.from_pipeline(pipeline)
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, 14, size=(10000, len(FEATURE_COLUMNS))).astype(np.float64)
+    rows[:, FEATURE_COLUMNS.index('BMI')] = rng.uniform(12, 60, len(rows))
+    max_diff = np.abs(compiled.predict_proba(rows) - fast.predict_proba(rows)).max()
+
+    print(f"✅ Exported {len(arrays['roots'])} trees "
+          f"({len(arrays['feature'])} nodes, depth {int(arrays['max_depth'])}) to {output}")
+    print(f"📊 Max probability difference vs booster: {max_diff:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""
+Feature schema shared by the web app, the batch scoring paths and training.
+
+``FEATURE_SCHEMA`` declares, in the model pipeline's column order, each of
+the 21 BRFSS columns: the lowercase field name form and JSON payloads use,
+its kind, the accepted range, the default a missing field falls back to
+(the same defaults the assessment form has always used) and whether the
+training pipeline standardizes it. Everything else here is derived from
+it: the column lists, the form defaults and the encoders.
+
+The encoders turn inputs into model rows in one pass and report every
+invalid field at once as a ``FeatureError``:
+
+- ``extract_features``/``parse_assessment``: one form or JSON mapping.
+  The loop over the schema is generated as straight-line Python when
+  this module is imported (the way namedtuple and dataclasses generate
+  their methods), so a row costs one lookup and one ``float`` per field.
+- ``encode_records``: a list of mappings (the batch API), and
+  ``extract_feature_matrix``: columns of raw values (file scoring). Both
+  convert and range-check a whole column with NumPy and only look at
+  individual values for rows that fail.
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+BINARY = 'binary'           # 0 or 1
+ORDINAL = 'ordinal'         # a whole number in [low, high]
+CONTINUOUS = 'continuous'   # any number in [low, high]
+
+Feature = namedtuple('Feature', ['column', 'field', 'kind', 'low', 'high', 'default', 'scaled'],
+                     defaults=(False,))
+
+# Model columns in pipeline order. Stroke is not collected by the UI, so it
+# has no field and is always sent as 0 for compatibility. Age is accepted
+# both in years (the form) and as the dataset's 1-13 age category.
+FEATURE_SCHEMA = [
+    Feature('HighBP', 'highbp', BINARY, 0, 1, 0),
+    Feature('HighChol', 'highchol', BINARY, 0, 1, 0),
+    Feature('CholCheck', 'cholcheck', BINARY, 0, 1, 1),                 # Default to Yes
+    Feature('BMI', 'bmi', CONTINUOUS, 10, 100, 25, scaled=True),
+    Feature('Smoker', 'smoker', BINARY, 0, 1, 0),
+    Feature('Stroke', None, BINARY, 0, 1, 0),
+    Feature('Diabetes', 'diabetes', ORDINAL, 0, 2, 0),
+    Feature('PhysActivity', 'physactivity', BINARY, 0, 1, 1),           # Default to Yes
+    Feature('Fruits', 'fruits', BINARY, 0, 1, 1),                       # Default to Yes
+    Feature('Veggies', 'veggies', BINARY, 0, 1, 1),                     # Default to Yes
+    Feature('HvyAlcoholConsump', 'hvyalcoholconsump', BINARY, 0, 1, 0),
+    Feature('AnyHealthcare', 'anyhealthcare', BINARY, 0, 1, 1),         # Default to Yes
+    Feature('NoDocbcCost', 'nodocbccost', BINARY, 0, 1, 0),
+    Feature('GenHlth', 'genhlth', ORDINAL, 1, 5, 3),                    # Default to Good
+    Feature('MentHlth', 'menthlth', ORDINAL, 0, 30, 0, scaled=True),
+    Feature('PhysHlth', 'physhlth', ORDINAL, 0, 30, 0, scaled=True),
+    Feature('DiffWalk', 'diffwalk', BINARY, 0, 1, 0),
+    Feature('Sex', 'sex', BINARY, 0, 1, 0),
+    Feature('Age', 'age', CONTINUOUS, 1, 120, 30, scaled=True),
+    Feature('Education', 'education', ORDINAL, 1, 6, 4, scaled=True),   # Default to High school
+    Feature('Income', 'income', ORDINAL, 1, 8, 5, scaled=True)          # Default to middle income
+]
+
+# Dashboard-only inputs that are not model features (the form does not
+# collect them yet, so the defaults are what the dashboard shows)
+BODY_SCHEMA = [
+    Feature(None, 'height_feet', CONTINUOUS, 1, 9, 5),
+    Feature(None, 'height_inches', CONTINUOUS, 0, 12, 8),
+    Feature(None, 'weight', CONTINUOUS, 1, 1000, 150)
+]
+
+FEATURE_COLUMNS = [feature.column for feature in FEATURE_SCHEMA]
+# Columns the training pipeline standardizes; the rest pass through
+SCALED_COLUMNS = [feature.column for feature in FEATURE_SCHEMA if feature.scaled]
+# (input field, default) for every model column, and for the dashboard inputs
+FORM_FIELDS = [(feature.field, feature.default) for feature in FEATURE_SCHEMA]
+BODY_FIELDS = [(feature.field, feature.default) for feature in BODY_SCHEMA]
+
+# A validated assessment: the fields the dashboard reads, typed, plus the model row
+Assessment = namedtuple('Assessment', [
+    'age', 'sex', 'bmi', 'highbp', 'highchol', 'smoker', 'diabetes',
+    'physactivity', 'genhlth', 'height_feet', 'height_inches', 'weight', 'features'
+])
+
+RISK_LABELS = {
+    1: '⚠️ High Risk of Heart Disease',
+    0: '✅ Low Risk of Heart Disease'
+}
+
+
+class FeatureError(ValueError):
+    """Invalid input fields; ``errors`` holds one ``{'field', 'value', 'message'}`` per field.
+
+    The message is the fields' messages joined, e.g. "age: expected a
+    number, got 'old'".
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(error['message'] for error in errors))
+
+
+def check_value(feature, raw):
+    """``raw`` as a float if it is valid for ``feature``, else a message saying why not"""
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return None, f"{feature.field}: expected a number, got {raw!r}"
+    if not math.isfinite(value):
+        return None, f"{feature.field}: expected a finite number, got {raw!r}"
+    if not feature.low <= value <= feature.high:
+        return None, f"{feature.field}: expected {feature.low} to {feature.high}, got {raw!r}"
+    if feature.kind != CONTINUOUS and value != int(value):
+        return None, f"{feature.field}: expected a whole number, got {raw!r}"
+    return value, None
+
+
+def _invalid(errors, feature, raw):
+    """Append the error for a value the generated check rejected"""
+    _, message = check_value(feature, raw)
+    error = {'field': feature.field, 'value': raw, 'message': message}
+    return [error] if errors is None else errors + [error]
+
+
+def compile_encoder(schema, name='encode'):
+    """Generate ``name(source) -> list of floats`` for a schema.
+
+    Missing, None and empty fields take the default; anything else must
+    pass ``check_value``, or a FeatureError listing every failing field is
+    raised.
+    """
+    lines = [f"def {name}(source):", "    get = source.get", "    errors = None"]
+    for i, feature in enumerate(schema):
+        default = float(feature.default)
+        if feature.field is None:
+            lines.append(f"    v{i} = {default!r}")
+            continue
+        # Cheapest test that rejects what check_value rejects; NaN fails all of them
+        if feature.kind == BINARY and (feature.low, feature.high) == (0, 1):
+            rejected = f"v{i} != 0.0 and v{i} != 1.0"
+        else:
+            rejected = f"not {float(feature.low)!r} <= v{i} <= {float(feature.high)!r}"
+            if feature.kind != CONTINUOUS:
+                rejected += f" or not v{i}.is_integer()"
+        lines += [
+            "    try:",
+            f"        v{i} = float(get({feature.field!r}, {default!r}))",
+            "    except (TypeError, ValueError):",
+            f"        v{i} = _fallback(get({feature.field!r}), {default!r})",
+            f"    if {rejected}:",
+            f"        errors = _invalid(errors, _schema[{i}], get({feature.field!r}))"
+        ]
+    lines += [
+        "    if errors is not None:",
+        "        raise FeatureError(errors)",
+        f"    return [{', '.join(f'v{i}' for i in range(len(schema)))}]"
+    ]
+    namespace = {'FeatureError': FeatureError, '_invalid': _invalid, '_fallback': _fallback,
+                 '_schema': list(schema)}
+    exec('\n'.join(lines), namespace)
+    return namespace[name]
+
+
+def _fallback(raw, default):
+    # None and '' mean "not answered"; anything else that float() refused is invalid
+    return default if raw is None or raw == '' else math.nan
+
+
+_encode_features = compile_encoder(FEATURE_SCHEMA, 'encode_features')
+_encode_assessment = compile_encoder(FEATURE_SCHEMA + BODY_SCHEMA, 'encode_assessment')
+_COLUMN_INDEX = {column: i for i, column in enumerate(FEATURE_COLUMNS)}
+
+
+def extract_features(source):
+    """Build the model feature row from a form or JSON mapping.
+
+    Raises FeatureError (a ValueError) naming every offending field.
+    """
+    return _encode_features(source)
+
+
+def parse_assessment(source):
+    """Validate a form or JSON mapping once into an Assessment record.
+
+    Raises FeatureError like ``extract_features``.
+    """
+    values = _encode_assessment(source)
+    row = values[:len(FEATURE_SCHEMA)]
+    height_feet, height_inches, weight = values[len(FEATURE_SCHEMA):]
+    column = _COLUMN_INDEX
+    return Assessment(
+        age=int(row[column['Age']]),
+        sex=int(row[column['Sex']]),
+        bmi=row[column['BMI']],
+        highbp=int(row[column['HighBP']]),
+        highchol=int(row[column['HighChol']]),
+        smoker=int(row[column['Smoker']]),
+        diabetes=int(row[column['Diabetes']]),
+        physactivity=int(row[column['PhysActivity']]),
+        genhlth=int(row[column['GenHlth']]),
+        height_feet=int(height_feet),
+        height_inches=int(height_inches),
+        weight=int(weight),
+        features=row
+    )
+
+
+def encode_records(records):
+    """Vectorized ``extract_features`` over a list of mappings (e.g. a JSON batch).
+
+    Returns the float64 feature matrix and a dict mapping row index to a
+    FeatureError for rows that are invalid or not mappings (those rows are NaN).
+    """
+    n_rows = len(records)
+    mappings = [record if isinstance(record, dict) else {} for record in records]
+    columns = {feature.field: [record.get(feature.field) for record in mappings]
+               for feature in FEATURE_SCHEMA if feature.field is not None}
+    matrix, row_errors = _encode_columns(columns, n_rows, defaults_for_nan=False)
+    errors = {i: FeatureError(problems) for i, problems in row_errors.items()}
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            matrix[i] = np.nan
+            errors[i] = FeatureError([{'field': None, 'value': None,
+                                       'message': 'expected a JSON object'}])
+    return matrix, errors
+
+
+def extract_feature_matrix(columns, n_rows):
+    """Vectorized ``extract_features`` over a chunk of rows.
+
+    ``columns`` maps input field names to sequences of ``n_rows`` raw
+    values; absent fields and empty values take the form defaults, and so
+    does NaN, which is how columnar readers represent an empty cell.
+    Returns the float64 feature matrix and a dict mapping row index to
+    the error message for rows with an invalid value (those rows are NaN).
+    """
+    matrix, row_errors = _encode_columns(columns, n_rows, defaults_for_nan=True)
+    return matrix, {i: str(FeatureError(problems)) for i, problems in row_errors.items()}
+
+
+def _encode_columns(columns, n_rows, defaults_for_nan):
+    """Matrix and {row: [error, ...]} for columns of raw values"""
+    matrix = np.empty((n_rows, len(FEATURE_SCHEMA)))
+    errors = {}
+    for j, feature in enumerate(FEATURE_SCHEMA):
+        values = columns.get(feature.field) if feature.field is not None else None
+        if values is None:
+            matrix[:, j] = feature.default
+            continue
+        column = matrix[:, j]
+        try:
+            # numpy parses numeric strings itself and turns None into NaN
+            column[:] = np.asarray(values, dtype=np.float64)
+            rejected = ~((column >= feature.low) & (column <= feature.high))
+            if feature.kind != CONTINUOUS:
+                rejected |= column != np.trunc(column)
+            suspect = np.flatnonzero(rejected)
+        except (TypeError, ValueError):
+            suspect = range(n_rows)
+        for i in suspect:
+            raw = values[i]
+            if raw is None or raw == '' or (defaults_for_nan and isinstance(raw, float) and math.isnan(raw)):
+                column[i] = feature.default
+                continue
+            value, message = check_value(feature, raw)
+            if message is None:
+                column[i] = value
+            else:
+                errors.setdefault(int(i), []).append(
+                    {'field': feature.field, 'value': raw, 'message': message})
+    matrix[list(errors)] = np.nan
+    return matrix, errors
+
+
+def risk_label(pred):
+    """Human-readable label for a 0/1 model prediction"""
+    return RISK_LABELS[1] if pred == 1 else RISK_LABELS[0]
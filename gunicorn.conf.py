@@ -0,0 +1,103 @@
+"""
+Production gunicorn settings for CardioCheck.
+
+gunicorn picks this file up automatically from the working directory; the
+Procfile also passes it explicitly.
+
+With preload enabled (the default) the app, the model and everything
+derived from it are loaded once in the master. Workers are forked from it
+and share those pages copy-on-write; ``gc.freeze()`` keeps the garbage
+collector from touching (and so copying) them. Each worker runs a warm-up
+prediction before it accepts traffic, so the first real request does not
+pay for lazy initialization.
+
+Workers record metrics into memory-mapped files in a directory created
+here for the life of the server, so ``/metrics`` on any worker reports
+the totals of all of them (see metrics.py). When a worker exits, its
+files are folded into the directory's totals and removed.
+
+Environment overrides:
+    CARDIOCHECK_PRELOAD   1/0, load the app in the master (default 1; forces
+                          OMP_NUM_THREADS=1, see below)
+    CARDIOCHECK_WORKERS   worker processes (default: cores + 1, or WEB_CONCURRENCY)
+    CARDIOCHECK_THREADS   threads per worker (default 2)
+    PORT                  listen port (default 5000)
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def default_worker_layout(cores):
+    """(workers, threads) for a machine with ``cores`` CPUs.
+
+    Roughly the classic 2 * cores + 1 concurrency, but spread over half the
+    processes since the model is shared and inference releases the GIL.
+    """
+    return cores + 1, 2
+
+
+_workers, _threads = default_worker_layout(multiprocessing.cpu_count())
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+preload_app = os.environ.get('CARDIOCHECK_PRELOAD', '1') == '1'
+workers = _env_int('CARDIOCHECK_WORKERS', _env_int('WEB_CONCURRENCY', _workers))
+threads = _env_int('CARDIOCHECK_THREADS', _threads)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Every worker already runs in parallel; a full OpenMP pool per worker for
+# single-row predictions only adds contention. Must be set before xgboost loads.
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+if preload_app:
+    # Loading validates the model on canary rows in the master. An OpenMP
+    # pool started before fork is not usable in the children (their first
+    # parallel call can hang), so the master must stay single-threaded
+    # whatever the deployment exports.
+    os.environ['OMP_NUM_THREADS'] = '1'
+
+# Shared by every worker; must be set before the app (and metrics.py) loads
+_metrics_dir = None
+if not os.environ.get('CARDIOCHECK_METRICS_DIR'):
+    _metrics_dir = tempfile.mkdtemp(prefix='cardiocheck-metrics-')
+    os.environ['CARDIOCHECK_METRICS_DIR'] = _metrics_dir
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before any fork"""
+    if not preload_app:
+        return
+    import app
+    # OpenMP thread pools do not survive fork, so the master only warms
+    # what is fork-safe (templates, NumPy-only engines) and leaves the
+    # first booster call to each worker.
+    app.warm_up(predict=not app.uses_native_threads())
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded model shared with %d workers x %d threads", workers, threads)
+
+
+def post_worker_init(worker):
+    """Runs in each worker before it starts accepting requests"""
+    import app
+    app.warm_up()
+    worker.log.info("Worker %s warmed up", worker.pid)
+
+
+def child_exit(server, worker):
+    """Runs in the master after a worker has exited"""
+    import metrics
+    metrics.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    """Runs in the master on shutdown"""
+    if _metrics_dir is not None:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
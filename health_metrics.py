@@ -0,0 +1,77 @@
+"""
+Vectorized health-metric calculators.
+
+Column-array versions of the dashboard calculators in app.py, for scoring
+whole patient rosters at once. Each function takes NumPy arrays (or
+anything ``np.asarray`` accepts, including scalars) and returns a
+columnar dict with one array per output field. Category thresholds are
+applied with ``np.digitize``, which places values exactly the way the
+original ``<``/``>=`` chains do, NaN included.
+
+The scalar functions in app.py are thin wrappers over these through
+``scalar_row``.
+"""
+
+import numpy as np
+
+HEART_RATE_ZONE_BINS = [50, 60, 70, 85]
+HEART_RATE_ZONES = np.array(['Resting', 'Fat Burn', 'Aerobic', 'Anaerobic', 'Red Line'])
+
+BMI_BINS = [18.5, 25, 30]
+BMI_CATEGORIES = np.array(['Underweight', 'Normal', 'Overweight', 'Obese'])
+BMI_PERCENTAGES = np.array([30, 85, 50, 20])
+
+FITNESS_BINS = [50, 65, 80]
+FITNESS_LEVELS = np.array(['Poor', 'Fair', 'Good', 'Excellent'])
+
+
+def heart_rate_zones(age, current_hr):
+    """Heart rate zone and percentage of maximum for each row"""
+    age = np.asarray(age)
+    current_hr = np.asarray(current_hr)
+    max_hr = 220 - age
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage = (current_hr / max_hr) * 100
+    return {
+        'zone': HEART_RATE_ZONES[np.digitize(percentage, HEART_RATE_ZONE_BINS)],
+        'percentage': np.minimum(percentage, 100),
+        'current_hr': current_hr,
+        'max_hr': max_hr
+    }
+
+
+def bmi_categories(bmi):
+    """BMI category and health percentage for each row"""
+    bmi = np.asarray(bmi)
+    bins = np.digitize(bmi, BMI_BINS)
+    return {
+        'category': BMI_CATEGORIES[bins],
+        'percentage': BMI_PERCENTAGES[bins],
+        'value': bmi
+    }
+
+
+def cholesterol_levels(high_cholesterol):
+    """Cholesterol risk level for each row (any non-zero flag is high risk)"""
+    high = np.asarray(high_cholesterol) != 0
+    return {
+        'level': np.where(high, 'High Risk', 'Normal'),
+        'percentage': np.where(high, 25, 80)
+    }
+
+
+def fitness_levels(age, physical_activity):
+    """Cardiovascular fitness level and score for each row"""
+    base_fitness = np.where(np.asarray(physical_activity) != 0, 60, 30)
+    # fmax, like the builtin max(0, x), ignores a NaN age
+    age_factor = np.fmax(0, (50 - np.asarray(age)) / 50 * 20)  # Younger = higher fitness potential
+    total_fitness = np.minimum(95, base_fitness + age_factor)
+    return {
+        'level': FITNESS_LEVELS[np.digitize(total_fitness, FITNESS_BINS)],
+        'percentage': total_fitness
+    }
+
+
+def scalar_row(columns):
+    """Unwrap a single-row columnar result into a dict of Python values"""
+    return {key: np.asarray(value).item() for key, value in columns.items()}
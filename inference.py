@@ -0,0 +1,170 @@
+"""
+Inference engines for the heart disease pipeline.
+
+``FastPredictor`` reads the fitted ColumnTransformer once at load time
+(column order, StandardScaler means and scales) and then scores raw
+feature rows straight into a float32 buffer that is handed to the XGBoost
+booster. It skips the DataFrame construction and sklearn dispatch that
+dominate single-row latency, while performing exactly the same float64
+arithmetic as ``StandardScaler.transform`` so predictions are identical.
+
+``PipelinePredictor`` wraps the pipeline unchanged and is used when the
+fast path cannot be built for a model (e.g. an unsupported transformer).
+
+Both take rows in ``features.FEATURE_COLUMNS`` order and expose
+``predict_proba`` (probability of heart disease per row), ``predict``,
+``predict_one`` and ``predict_proba_one``.
+"""
+
+import threading
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+
+# XGBClassifier.predict labels a binary row positive above this probability
+DECISION_THRESHOLD = 0.5
+
+
+class PipelinePredictor:
+    """Score rows through the original sklearn pipeline"""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def predict_proba(self, rows):
+        import pandas as pd
+        df = pd.DataFrame(np.asarray(rows, dtype=np.float64), columns=FEATURE_COLUMNS)
+        return self.pipeline.predict_proba(df)[:, 1]
+
+    def predict(self, rows):
+        return (self.predict_proba(rows) > DECISION_THRESHOLD).astype(np.int64)
+
+    def predict_one(self, values):
+        return int(self.predict([values])[0])
+
+    def predict_proba_one(self, values):
+        return float(self.predict_proba([values])[0])
+
+
+class FastPredictor:
+    """Score rows with the fitted scaler parameters and the raw booster"""
+
+    def __init__(self, booster, order, mean, scale, iteration_range=(0, 0), missing=np.nan):
+        self.booster = booster
+        # Input column index for each model column, plus the per-column
+        # offset and divisor. Passthrough columns use 0 and 1, which leave
+        # the value bit-for-bit unchanged.
+        self.order = np.asarray(order, dtype=np.intp)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.iteration_range = iteration_range
+        self.missing = missing
+        self.n_features = len(self.order)
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Build a fast predictor from a fitted preprocessor + XGBoost pipeline"""
+        preprocessor = pipeline.named_steps['preprocessor']
+        classifier = pipeline.named_steps['classifier']
+        order, mean, scale = _column_transformer_layout(preprocessor)
+        return cls(
+            booster=classifier.get_booster(),
+            order=order,
+            mean=mean,
+            scale=scale,
+            iteration_range=_iteration_range(classifier),
+            missing=classifier.missing
+        )
+
+    def transform(self, rows):
+        """Scale raw rows into the float32 matrix the booster consumes"""
+        rows = np.asarray(rows, dtype=np.float64)
+        scaled = (rows[:, self.order] - self.mean) / self.scale
+        return scaled.astype(np.float32)
+
+    def predict_proba(self, rows):
+        return self._predict_matrix(self.transform(rows))
+
+    def predict(self, rows):
+        return (self.predict_proba(rows) > DECISION_THRESHOLD).astype(np.int64)
+
+    def predict_one(self, values):
+        return int(self.predict_proba_one(values) > DECISION_THRESHOLD)
+
+    def predict_proba_one(self, values):
+        """Score a single row using per-thread preallocated buffers"""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = (
+                np.empty(self.n_features, dtype=np.float64),
+                np.empty((1, self.n_features), dtype=np.float32)
+            )
+            self._local.buffers = buffers
+        work, row = buffers
+        np.take(np.asarray(values, dtype=np.float64), self.order, out=work)
+        np.subtract(work, self.mean, out=work)
+        np.divide(work, self.scale, out=work)
+        row[0] = work
+        return float(self._predict_matrix(row)[0])
+
+    def _predict_matrix(self, matrix):
+        return self.booster.inplace_predict(
+            matrix,
+            iteration_range=self.iteration_range,
+            predict_type='value',
+            missing=self.missing
+        )
+
+
+def load_predictor(pipeline):
+    """Return the fastest predictor that supports ``pipeline``"""
+    try:
+        return FastPredictor.from_pipeline(pipeline)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        print(f"Fast inference unavailable, using pipeline: {e}")
+        return PipelinePredictor(pipeline)
+
+
+def _column_transformer_layout(preprocessor):
+    """Flatten a fitted ColumnTransformer into (order, mean, scale) arrays"""
+    input_columns = list(getattr(preprocessor, 'feature_names_in_', FEATURE_COLUMNS))
+    if input_columns != FEATURE_COLUMNS:
+        raise ValueError(f"Unexpected input columns: {input_columns}")
+
+    order, mean, scale = [], [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or len(columns) == 0:
+            continue
+        indices = [c if isinstance(c, (int, np.integer)) else input_columns.index(c)
+                   for c in columns]
+        if _is_identity(transformer):
+            order.extend(indices)
+            mean.extend([0.0] * len(indices))
+            scale.extend([1.0] * len(indices))
+        elif type(transformer).__name__ == 'StandardScaler':
+            order.extend(indices)
+            mean.extend(transformer.mean_ if transformer.mean_ is not None
+                        else [0.0] * len(indices))
+            scale.extend(transformer.scale_ if transformer.scale_ is not None
+                         else [1.0] * len(indices))
+        else:
+            raise ValueError(f"Unsupported transformer {name!r}: {transformer!r}")
+    return order, mean, scale
+
+
+def _is_identity(transformer):
+    if transformer == 'passthrough':
+        return True
+    # ColumnTransformer stores remainder='passthrough' as an identity FunctionTransformer
+    return (type(transformer).__name__ == 'FunctionTransformer'
+            and transformer.func is None)
+
+
+def _iteration_range(classifier):
+    """Mirror XGBClassifier.predict, which stops at the best early-stopping round"""
+    try:
+        return (0, classifier.best_iteration + 1)
+    except AttributeError:
+        return (0, 0)
@@ -0,0 +1,340 @@
+"""
+Precomputed lookup table over the model's discrete input space.
+
+Tree ensembles only ever compare a feature against its split thresholds,
+so two values that fall between the same pair of thresholds are
+indistinguishable to the model. ``build`` uses the trained trees to find,
+for every discrete feature, the intervals its valid inputs fall into, bins
+the three continuous inputs (BMI, MentHlth, PhysHlth) into configurable
+ranges, and scores every cell of the resulting grid in vectorized chunks.
+Probabilities are stored as uint16 in a memory-mapped ``.npy`` indexed by a
+mixed-radix encoding of the per-feature cell indices, so serving is one
+array lookup per row. Discrete features are exact; the only approximation
+is the representative value used for each continuous bin.
+
+``drift`` reports how far the table's answers are from the live model.
+
+    python lookup_table.py build [--bmi-edges 18.5 25 30 35] [--chunk-rows 262144]
+    python lookup_table.py drift [--rows 100000] [--data datasets/heart_health.csv]
+"""
+
+import argparse
+import bisect
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from inference import DECISION_THRESHOLD
+
+FORMAT_VERSION = 1
+PROBABILITY_SCALE = np.iinfo(np.uint16).max
+
+# Values each discrete input can take from the assessment form and the
+# batch API. Inputs outside these are scored by the live model instead.
+DISCRETE_DOMAINS = {column: [0, 1] for column in FEATURE_COLUMNS}
+DISCRETE_DOMAINS.update({
+    'Stroke': [0],                      # Not collected by the UI
+    'Diabetes': [0, 1, 2],
+    'GenHlth': list(range(1, 6)),
+    'Age': list(range(18, 121)),        # Years, as sent by the form
+    'Education': list(range(1, 7)),
+    'Income': list(range(1, 9))
+})
+
+# Continuous inputs: bin edges and the value scored for each bin
+DEFAULT_BINS = {
+    'BMI': ([18.5, 25, 30, 35], [17.0, 22.0, 27.5, 32.5, 40.0]),
+    'MentHlth': ([1, 14], [0.0, 5.0, 20.0]),
+    'PhysHlth': ([1, 14], [0.0, 5.0, 20.0])
+}
+
+
+def table_paths(model_path):
+    """(array, manifest) paths of the lookup table built for ``model_path``"""
+    base = os.path.splitext(model_path)[0]
+    return base + '.lut.npy', base + '.lut.json'
+
+
+def plan_axes(tree_arrays, domains=None, bins=None):
+    """Describe one table axis per model column from the exported trees"""
+    domains = dict(DISCRETE_DOMAINS, **(domains or {}))
+    bins = dict(DEFAULT_BINS, **(bins or {}))
+    order = list(tree_arrays['order'])
+    is_split = tree_arrays['left'] != np.arange(len(tree_arrays['left']))
+
+    axes = []
+    for column_index, column in enumerate(FEATURE_COLUMNS):
+        if column in bins:
+            edges, levels = bins[column]
+            if len(levels) != len(edges) + 1:
+                raise ValueError(f"{column}: need one representative value per bin")
+            axes.append({'column': column, 'kind': 'binned',
+                         'edges': [float(e) for e in edges],
+                         'levels': [float(v) for v in levels]})
+            continue
+
+        # Split thresholds compare the scaled float32 value, as the booster does
+        position = order.index(column_index)
+        mean = float(tree_arrays['mean'][position])
+        scale = float(tree_arrays['scale'][position])
+        thresholds = np.unique(tree_arrays['threshold'][is_split & (tree_arrays['feature'] == position)])
+        values = np.asarray(domains[column], dtype=np.float64)
+        intervals = _intervals(values, thresholds, mean, scale)
+
+        interval_index = np.full(len(thresholds) + 1, -1, dtype=np.int64)
+        levels = []
+        for value, interval in zip(values, intervals):
+            if interval_index[interval] == -1:
+                interval_index[interval] = len(levels)
+                levels.append(float(value))
+        axes.append({'column': column, 'kind': 'discrete',
+                     'thresholds': thresholds.tolist(), 'mean': mean, 'scale': scale,
+                     'interval_index': interval_index.tolist(), 'levels': levels})
+    return axes
+
+
+def build_table(predictor, tree_arrays, array_path, manifest_path, source_sha256='',
+                domains=None, bins=None, chunk_rows=1 << 18, progress=None):
+    """Score every grid cell with ``predictor`` and write the memory-mapped table"""
+    axes = plan_axes(tree_arrays, domains, bins)
+    shape = tuple(len(axis['levels']) for axis in axes)
+    cells = int(np.prod(shape, dtype=np.int64))
+    levels = [np.asarray(axis['levels'], dtype=np.float64) for axis in axes]
+
+    table = np.lib.format.open_memmap(array_path, mode='w+', dtype=np.uint16, shape=(cells,))
+    for start in range(0, cells, chunk_rows):
+        stop = min(start + chunk_rows, cells)
+        coords = np.unravel_index(np.arange(start, stop, dtype=np.int64), shape)
+        rows = np.column_stack([level[coord] for level, coord in zip(levels, coords)])
+        table[start:stop] = _quantize(predictor.predict_proba(rows))
+        if progress:
+            progress(stop, cells)
+    table.flush()
+    del table
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'source_sha256': source_sha256,
+        'shape': list(shape),
+        'probability_scale': PROBABILITY_SCALE,
+        'axes': axes
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class LookupTablePredictor:
+    """Serve predictions from a prebuilt table, falling back to a live predictor"""
+
+    def __init__(self, table, manifest, fallback=None):
+        if manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lookup table version {manifest['format_version']}")
+        self.table = table
+        self.manifest = manifest
+        self.fallback = fallback
+        self.source_sha256 = manifest['source_sha256']
+        self.axes = manifest['axes']
+        self.strides = np.asarray(
+            [int(np.prod(manifest['shape'][i + 1:], dtype=np.int64)) for i in range(len(self.axes))],
+            dtype=np.int64
+        )
+        self._strides_list = self.strides.tolist()
+        for axis in self.axes:
+            if axis['kind'] == 'discrete':
+                axis['thresholds_array'] = np.asarray(axis['thresholds'], dtype=np.float32)
+                axis['interval_index_array'] = np.asarray(axis['interval_index'], dtype=np.int64)
+            else:
+                axis['edges_array'] = np.asarray(axis['edges'], dtype=np.float64)
+
+    @classmethod
+    def load(cls, array_path, manifest_path, fallback=None):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        return cls(np.load(array_path, mmap_mode='r'), manifest, fallback)
+
+    def cell_index(self, rows):
+        """Flat table index per row, or -1 where a value is outside the grid"""
+        rows = np.asarray(rows, dtype=np.float64)
+        index = np.zeros(len(rows), dtype=np.int64)
+        valid = np.isfinite(rows).all(axis=1)
+        for column, (axis, stride) in enumerate(zip(self.axes, self.strides)):
+            values = rows[:, column]
+            if axis['kind'] == 'binned':
+                coord = np.searchsorted(axis['edges_array'], values, side='right')
+            else:
+                intervals = _intervals(values, axis['thresholds_array'], axis['mean'], axis['scale'])
+                coord = axis['interval_index_array'][intervals]
+                valid &= coord >= 0
+            index += coord * stride
+        return np.where(valid, index, -1)
+
+    def predict_proba(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        index = self.cell_index(rows)
+        hit = index >= 0
+        probabilities = np.empty(len(rows), dtype=np.float64)
+        probabilities[hit] = self.table[index[hit]] / PROBABILITY_SCALE
+        if not hit.all():
+            probabilities[~hit] = self._fallback_proba(rows[~hit])
+        return probabilities
+
+    def _fallback_proba(self, rows):
+        if self.fallback is None:
+            raise ValueError("Input outside the lookup table grid and no fallback model")
+        return self.fallback.predict_proba(rows)
+
+    def predict(self, rows):
+        return (self.predict_proba(rows) > DECISION_THRESHOLD).astype(np.int64)
+
+    def scored_rows(self, rows):
+        """The rows the table's answers were scored from: each binned input
+        replaced by its bin's representative value. Rows outside the grid are
+        scored by the fallback and come back unchanged."""
+        rows = np.array(rows, dtype=np.float64, ndmin=2)
+        hit = self.cell_index(rows) >= 0
+        for column, axis in enumerate(self.axes):
+            if axis['kind'] == 'binned':
+                levels = np.asarray(axis['levels'])
+                binned = levels[np.searchsorted(axis['edges_array'], rows[hit, column], side='right')]
+                rows[hit, column] = binned
+        return rows
+
+    def predict_proba_one(self, values):
+        """Single-row lookup in plain Python, avoiding per-axis array overhead"""
+        index = 0
+        for value, axis, stride in zip(values, self.axes, self._strides_list):
+            value = float(value)
+            if not math.isfinite(value):
+                return float(self._fallback_proba([values])[0])
+            if axis['kind'] == 'binned':
+                coord = bisect.bisect_right(axis['edges'], value)
+            else:
+                scaled = float(np.float32((value - axis['mean']) / axis['scale']))
+                coord = axis['interval_index'][bisect.bisect_right(axis['thresholds'], scaled)]
+                if coord < 0:
+                    return float(self._fallback_proba([values])[0])
+            index += coord * stride
+        return int(self.table[index]) / PROBABILITY_SCALE
+
+    def predict_one(self, values):
+        return int(self.predict_proba_one(values) > DECISION_THRESHOLD)
+
+
+def _intervals(values, thresholds, mean, scale):
+    # x < threshold goes left, so a value equal to a threshold is in the next interval
+    scaled = ((np.asarray(values, dtype=np.float64) - mean) / scale).astype(np.float32)
+    return np.searchsorted(thresholds, scaled, side='right')
+
+
+def _quantize(probabilities):
+    return np.rint(np.asarray(probabilities) * PROBABILITY_SCALE).astype(np.uint16)
+
+
+def _bins_from_args(args):
+    bins = {}
+    for column, edges in (('BMI', args.bmi_edges), ('MentHlth', args.menthlth_edges),
+                          ('PhysHlth', args.physhlth_edges)):
+        if edges is None:
+            continue
+        # Score each bin at its midpoint; open-ended bins sit one unit outside
+        bounds = [edges[0] - 2] + list(edges) + [edges[-1] + 2]
+        bins[column] = (edges, [max(0.0, (lo + hi) / 2) for lo, hi in zip(bounds, bounds[1:])])
+    return bins
+
+
+def build_command(args):
+    from export_trees import export_pipeline
+    from inference import FastPredictor
+    from model_loader import file_sha256, read_pipeline
+
+    pipeline = read_pipeline(args.model)
+    array_path, manifest_path = table_paths(args.model)
+    started = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\r⏳ Scored {done:,}/{total:,} cells", end='', flush=True)
+
+    manifest = build_table(
+        FastPredictor.from_pipeline(pipeline), export_pipeline(pipeline),
+        array_path, manifest_path, source_sha256=file_sha256(args.model),
+        bins=_bins_from_args(args), chunk_rows=args.chunk_rows, progress=progress
+    )
+    elapsed = time.perf_counter() - started
+    cells = int(np.prod(manifest['shape']))
+    print(f"\n✅ Lookup table with {cells:,} cells "
+          f"({cells * 2 / 1e6:.1f} MB) written to {array_path} in {elapsed:.1f}s")
+    for axis in manifest['axes']:
+        print(f"   {axis['column']:<18} {len(axis['levels'])} levels ({axis['kind']})")
+
+
+def drift_command(args):
+    from model_loader import load_model
+
+    live = load_model(args.model, engine='fast')
+    table = LookupTablePredictor.load(*table_paths(args.model))
+    rows = _drift_rows(args)
+
+    index = table.cell_index(rows)
+    covered = index >= 0
+    expected = live.predict_proba(rows[covered])
+    actual = table.table[index[covered]] / PROBABILITY_SCALE
+    diff = np.abs(actual - expected)
+    flips = np.mean((actual > DECISION_THRESHOLD) != (expected > DECISION_THRESHOLD))
+
+    print(f"📊 Lookup table drift over {len(rows):,} rows")
+    print(f"   Coverage:        {covered.mean() * 100:.2f}% of rows answered by the table")
+    print(f"   Mean |Δp|:       {diff.mean():.5f}")
+    print(f"   p99 |Δp|:        {np.percentile(diff, 99):.5f}")
+    print(f"   Max |Δp|:        {diff.max():.5f}")
+    print(f"   Label flips:     {flips * 100:.3f}%")
+
+
+def _drift_rows(args):
+    if os.path.exists(args.data):
+        from dataset import load_dataset
+        frame = load_dataset(args.data).frame(FEATURE_COLUMNS)
+        return frame.iloc[:args.rows].to_numpy(dtype=np.float64)
+
+    print(f"Dataset not found at {args.data}; using random form inputs")
+    rng = np.random.default_rng(0)
+    columns = []
+    for column in FEATURE_COLUMNS:
+        if column == 'BMI':
+            columns.append(rng.uniform(14, 50, args.rows).round(1))
+        elif column in ('MentHlth', 'PhysHlth'):
+            columns.append(rng.integers(0, 31, args.rows))
+        else:
+            columns.append(rng.choice(DISCRETE_DOMAINS[column], args.rows))
+    return np.column_stack(columns).astype(np.float64)
+
+
+def main():
+    from model_loader import default_model_path
+
+    parser = argparse.ArgumentParser(description="Build or check the prediction lookup table")
+    parser.add_argument('--model', default=default_model_path())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='score the full grid and write the table')
+    build.add_argument('--bmi-edges', type=float, nargs='+')
+    build.add_argument('--menthlth-edges', type=float, nargs='+')
+    build.add_argument('--physhlth-edges', type=float, nargs='+')
+    build.add_argument('--chunk-rows', type=int, default=1 << 18)
+    build.set_defaults(func=build_command)
+
+    drift = commands.add_parser('drift', help='compare table answers with the live model')
+    drift.add_argument('--rows', type=int, default=100000)
+    drift.add_argument('--data', default='datasets/heart_health.csv')
+    drift.set_defaults(func=drift_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,515 @@
+"""
+Request-path instrumentation, exported in the Prometheus text format.
+
+Counters, histograms and gauges are plain float slots. Each thread
+records counters and histograms into a lane of its own, so an update
+takes no lock and threads never lose increments; a lane is handed to the
+next new thread when its thread exits, so a process has no more lanes
+than it ever had recording threads at once. Gauges are stored in lane 0,
+one slot per series, written by a plain assignment. Only the first use of
+a thread or of a new label combination takes the process's lock.
+
+With CARDIOCHECK_METRICS_DIR set (gunicorn.conf.py sets it for every
+worker), each lane is a small memory-mapped file in that directory,
+named after the process, and ``/metrics`` in any worker adds up the files
+of all of them. When a worker exits, ``mark_process_dead`` (called from
+gunicorn's ``child_exit`` hook) folds its counters and histograms into
+``exited.json`` and deletes its files, so totals never go backwards and
+the directory does not grow with restarts; gauges are reported per live
+process with a ``pid`` label. Without the directory, the lanes live in
+process memory and ``/metrics`` reports the answering process only.
+
+``RequestTimer`` splits a request into stages with ``lap(stage)``, one
+``perf_counter`` call and one histogram observation per stage.
+
+Environment overrides:
+    CARDIOCHECK_METRICS       1/0, record metrics (default 1)
+    CARDIOCHECK_METRICS_DIR   directory shared by the workers of one server
+"""
+
+import bisect
+import glob
+import json
+import mmap
+import os
+import re
+import resource
+import threading
+import time
+
+ENABLED = os.environ.get('CARDIOCHECK_METRICS', '1') == '1'
+METRICS_DIR = os.environ.get('CARDIOCHECK_METRICS_DIR') or None
+SHARD_SLOTS = 8192
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; request stages range from microseconds (parsing) to a render
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ROW_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 10000)
+
+# <pid>-<start ns>.layout.json and .<lane>.bin: the start time tells a reused pid from the exited process
+_LAYOUT_FILE = re.compile(r'((\d+)-\d+)\.layout\.json$')
+EXITED_FILE = 'exited.json'
+
+
+class _Lease:
+    """A thread's hold on a lane, returned to the free list when the thread exits"""
+
+    __slots__ = ('values', 'index', 'free')
+
+    def __init__(self, values, index, free):
+        self.values = values
+        self.index = index
+        self.free = free
+
+    def __del__(self):
+        # list.append is atomic; after a fork ``free`` is the parent's list and is dropped
+        self.free.append(self.index)
+
+
+class _Slots:
+    """Slot layout and per-thread lanes of this process"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.layout = {}
+        self.used = 0
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{time.time_ns()}'
+        self.lock = threading.Lock()
+        self.lanes = []
+        self._free = []
+        self._local = threading.local()
+
+    def offset(self, key, kind, width):
+        """First slot of ``key``, allocated on first use; None once SHARD_SLOTS are in use"""
+        entry = self.layout.get(key)
+        if entry is None:
+            with self.lock:
+                entry = self.layout.get(key)
+                if entry is None:
+                    if self.used + width > SHARD_SLOTS:
+                        return None
+                    entry = self.layout[key] = (self.used, kind, width)
+                    self.used += width
+                    self._write_layout()
+        return entry[0]
+
+    def lane(self):
+        """The calling thread's slots as a memoryview of doubles"""
+        try:
+            return self._local.lease.values
+        except AttributeError:
+            return self._lease().values
+
+    def gauges(self):
+        """Lane 0, which holds every gauge of the process"""
+        if not self.lanes:
+            self._lease()
+        return self.lanes[0]
+
+    def _lease(self):
+        with self.lock:
+            lease = getattr(self._local, 'lease', None)
+            if lease is not None:
+                return lease
+            try:
+                index = self._free.pop()
+            except IndexError:
+                index = len(self.lanes)
+                self.lanes.append(self._new_lane(index))
+            lease = self._local.lease = _Lease(self.lanes[index], index, self._free)
+        return lease
+
+    def _new_lane(self, index):
+        size = SHARD_SLOTS * 8
+        if self.directory is None:
+            return memoryview(bytearray(size)).cast('d')
+        path = os.path.join(self.directory, f'{self.name}.{index}.bin')
+        with open(path, 'wb+') as f:
+            f.truncate(size)
+            mapped = mmap.mmap(f.fileno(), size)
+        return memoryview(mapped).cast('d')
+
+    def _write_layout(self):
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, f'{self.name}.layout.json')
+        _write_json(path, [[name, list(labels), *entry] for (name, labels), entry in self.layout.items()])
+
+    def after_fork(self):
+        # Same layout (cached label children keep their offsets), fresh zeroed lanes
+        self._reset()
+        self._write_layout()
+
+
+_slots = _Slots(METRICS_DIR)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_slots.after_fork)
+
+_metrics = {}
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        _metrics[name] = self
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            # Cached under the raw values too, so an int status code skips the str() next time
+            key = tuple(str(v) for v in values)
+            child = self._children.get(key)
+            if child is None:
+                offset = _slots.offset((self.name, key), self.kind, self.width)
+                child = self._children[key] = self._child(offset) if offset is not None else _NOOP
+            self._children[values] = child
+        return child
+
+
+class Counter(_Metric):
+    kind = 'counter'
+    width = 1
+
+    def _child(self, offset):
+        return _CounterChild(offset)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+    width = 1
+
+    def _child(self, offset):
+        return _GaugeChild(offset)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One count per bucket plus +Inf, then the sum
+        self.width = len(self.buckets) + 2
+        super().__init__(name, help, labelnames)
+
+    def _child(self, offset):
+        return _HistogramChild(offset, self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class _CounterChild:
+    __slots__ = ('offset',)
+
+    def __init__(self, offset):
+        self.offset = offset
+
+    def inc(self, amount=1):
+        if ENABLED:
+            _slots.lane()[self.offset] += amount
+
+
+class _GaugeChild:
+    __slots__ = ('offset',)
+
+    def __init__(self, offset):
+        self.offset = offset
+
+    def set(self, value):
+        if ENABLED:
+            _slots.gauges()[self.offset] = value
+
+
+class _HistogramChild:
+    __slots__ = ('offset', 'buckets', 'sum_offset')
+
+    def __init__(self, offset, buckets):
+        self.offset = offset
+        self.buckets = buckets
+        self.sum_offset = offset + len(buckets) + 1
+
+    def observe(self, value):
+        if ENABLED:
+            lane = _slots.lane()
+            lane[self.offset + bisect.bisect_left(self.buckets, value)] += 1
+            lane[self.sum_offset] += value
+
+
+class _NoOp:
+    """Stands in for a series that did not fit in SHARD_SLOTS"""
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+_NOOP = _NoOp()
+
+
+# Metrics recorded by the app and its serving components
+REQUEST_SECONDS = Histogram('cardiocheck_request_seconds',
+                            'Request latency by route and status', ('route', 'status'))
+STAGE_SECONDS = Histogram('cardiocheck_stage_seconds',
+                          'Time spent in each stage of a request', ('route', 'stage'))
+INFERENCE_SECONDS = Histogram('cardiocheck_model_inference_seconds',
+                              'Model scoring time per call, cache misses only', ('engine', 'kind'))
+BATCH_ROWS = Histogram('cardiocheck_batch_rows', 'Rows scored per model call',
+                       ('source',), ROW_BUCKETS)
+CACHE_LOOKUPS = Counter('cardiocheck_prediction_cache_lookups_total',
+                        'Prediction cache lookups by result', ('result',))
+EXPLANATION_LOOKUPS = Counter('cardiocheck_explanation_cache_lookups_total',
+                              'Explanation cache lookups by result', ('result',))
+ASSESSMENTS = Counter('cardiocheck_assessments_total',
+                      'Assessments given to the store by outcome', ('outcome',))
+ASGI_REJECTED = Counter('cardiocheck_asgi_rejected_total',
+                        'Requests refused with 503 because the thread pool was full')
+RESIDENT_BYTES = Gauge('cardiocheck_process_resident_memory_bytes', 'Resident set size of the process')
+PEAK_RESIDENT_BYTES = Gauge('cardiocheck_process_peak_resident_memory_bytes',
+                            'Peak resident set size of the process')
+
+
+class RequestTimer:
+    """Times the stages of one request: ``lap(stage)`` closes the stage that just ran"""
+
+    __slots__ = ('route', 'started', 'last')
+
+    def __init__(self, route):
+        self.route = route or 'unmatched'
+        self.started = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        STAGE_SECONDS.labels(self.route, stage).observe(now - self.last)
+        self.last = now
+
+    def finish(self, status):
+        REQUEST_SECONDS.labels(self.route, status).observe(time.perf_counter() - self.started)
+
+
+_next_sample = 0.0
+
+
+def sample_process(interval=1.0):
+    """Refresh this process's memory gauges, at most once per ``interval`` seconds"""
+    global _next_sample
+    now = time.monotonic()
+    if now < _next_sample or not ENABLED:
+        return
+    _next_sample = now + interval
+    page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+    try:
+        with open('/proc/self/statm') as f:
+            RESIDENT_BYTES.set(int(f.read().split()[1]) * page_size)
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux
+    PEAK_RESIDENT_BYTES.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+def collect():
+    """{(name, labels): [values]} of this process, or of every process if shared"""
+    import numpy as np
+
+    totals = {}
+
+    def add(key, series):
+        if key in totals:
+            totals[key] = totals[key] + series
+        else:
+            totals[key] = series
+
+    def add_process(pid, layout, lanes):
+        live = pid == os.getpid() or _alive(pid)
+        values = np.sum(lanes, axis=0)
+        for name, labels, offset, kind, width in layout:
+            if name not in _metrics:
+                continue
+            if kind == 'gauge':
+                # Gauges are per process, and only while it runs
+                if not live:
+                    continue
+                labels = labels + (str(pid),)
+            add((name, labels), values[offset:offset + width])
+
+    if _slots.directory is None:
+        lanes = [np.frombuffer(lane, dtype=np.float64) for lane in list(_slots.lanes)]
+        if lanes:
+            add_process(os.getpid(), [(name, labels, *entry) for (name, labels), entry
+                                      in list(_slots.layout.items())], lanes)
+        return totals
+
+    # Shards are listed before the exited totals are read: a process folded in
+    # meanwhile is then in ``merged`` and skipped, never counted twice
+    shards = _shard_files(_slots.directory)
+    exited = _read_exited(_slots.directory)
+    for name, labels, values in exited['series']:
+        if name in _metrics:
+            add((name, tuple(labels)), np.asarray(values, dtype=np.float64))
+    merged = set(exited['merged'])
+    for shard_name, pid in shards:
+        if shard_name in merged:
+            continue
+        try:
+            layout = _read_layout(_slots.directory, shard_name)
+            lanes = _read_lanes(_slots.directory, shard_name)
+        except (OSError, ValueError):
+            continue
+        if lanes:
+            add_process(pid, layout, lanes)
+    return totals
+
+
+def mark_process_dead(pid, directory=None):
+    """Fold the counters and histograms of exited process ``pid`` into the
+    directory's exited totals and delete its files"""
+    import numpy as np
+
+    directory = directory or _slots.directory
+    if directory is None:
+        return
+    names = [name for name, shard_pid in _shard_files(directory) if shard_pid == pid]
+    if not names:
+        return
+    exited = _read_exited(directory)
+    series = {(name, tuple(labels)): np.asarray(values, dtype=np.float64)
+              for name, labels, values in exited['series']}
+    for name in names:
+        try:
+            layout = _read_layout(directory, name)
+            lanes = _read_lanes(directory, name)
+        except (OSError, ValueError):
+            continue
+        if not lanes:
+            continue
+        values = np.sum(lanes, axis=0)
+        for metric, labels, offset, kind, width in layout:
+            if kind == 'gauge':
+                continue
+            key = (metric, labels)
+            value = values[offset:offset + width]
+            series[key] = series[key] + value if key in series else value
+    # Readers skip the merged shards until the files are gone; the next call forgets them
+    _write_json(os.path.join(directory, EXITED_FILE), {
+        'series': [[name, list(labels), values.tolist()] for (name, labels), values in series.items()],
+        'merged': names
+    })
+    for name in names:
+        for path in _lane_files(directory, name) + [os.path.join(directory, name + '.layout.json')]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _shard_files(directory):
+    """[(shard name, pid)] of the processes in ``directory``, with or without lanes yet"""
+    shards = []
+    for path in glob.glob(os.path.join(directory, '*.layout.json')):
+        match = _LAYOUT_FILE.search(path)
+        if match:
+            shards.append((match.group(1), int(match.group(2))))
+    return shards
+
+
+def _lane_files(directory, name):
+    return glob.glob(os.path.join(directory, glob.escape(name) + '.*.bin'))
+
+
+def _read_lanes(directory, name):
+    """Every lane of shard ``name``, as float64 arrays"""
+    import numpy as np
+
+    return [np.fromfile(path, dtype=np.float64) for path in _lane_files(directory, name)]
+
+
+def _read_layout(directory, name):
+    with open(os.path.join(directory, name + '.layout.json')) as f:
+        return [(metric, tuple(labels), offset, kind, width)
+                for metric, labels, offset, kind, width in json.load(f)]
+
+
+def _read_exited(directory):
+    try:
+        with open(os.path.join(directory, EXITED_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'series': [], 'merged': []}
+
+
+def _write_json(path, value):
+    # Replaced atomically, so readers never see a partial file
+    with open(path + '.tmp', 'w') as f:
+        json.dump(value, f)
+    os.replace(path + '.tmp', path)
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    totals = collect()
+    lines = []
+    for name, metric in _metrics.items():
+        series = sorted((labels, values) for (n, labels), values in totals.items() if n == name)
+        if not series:
+            continue
+        labelnames = metric.labelnames + (('pid',) if metric.kind == 'gauge' else ())
+        lines.append(f'# HELP {name} {metric.help}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for labels, values in series:
+            pairs = list(zip(labelnames, labels))
+            if metric.kind == 'histogram':
+                cumulative = 0.0
+                for bound, count in zip(metric.buckets + (float('inf'),), values):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(pairs + [("le", le)])} {_number(cumulative)}')
+                lines.append(f'{name}_sum{_labels(pairs)} {_number(values[-1])}')
+                lines.append(f'{name}_count{_labels(pairs)} {_number(cumulative)}')
+            else:
+                lines.append(f'{name}{_labels(pairs)} {_number(values[0])}')
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
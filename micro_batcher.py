@@ -0,0 +1,173 @@
+"""
+Micro-batching of concurrent single-row predictions.
+
+Each form POST scores one row, and the per-call overhead of the model
+dwarfs the per-row cost. When several requests arrive at once, a
+``MicroBatcher`` queues their rows and a background thread scores them
+with a single ``predict_proba`` call, flushing as soon as ``max_batch_size``
+rows are waiting or the oldest row has waited ``max_wait_us``
+microseconds. Each caller blocks until its own result is ready, so
+callers see the same interface as a direct call.
+
+Batching trades up to ``max_wait_us`` of extra latency for throughput
+under load, so it is off unless CARDIOCHECK_BATCH_MAX_WAIT_US is set.
+The flusher thread is started lazily per process, since threads do not
+survive gunicorn's fork.
+"""
+
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+
+import metrics
+
+MICRO_BATCH_ROWS = metrics.BATCH_ROWS.labels('micro_batch')
+
+# Histogram bucket upper bounds
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS_US = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class BatchMetrics:
+    """Batch-size and queue-wait distributions of a MicroBatcher"""
+
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_size = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_counts = [0] * (len(QUEUE_WAIT_BUCKETS_US) + 1)
+        self.queue_wait_total_us = 0.0
+        self.queue_wait_max_us = 0.0
+        self.predict_total_us = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, batch_size, waits_us, predict_us):
+        MICRO_BATCH_ROWS.observe(batch_size)
+        with self._lock:
+            self.batches += 1
+            self.rows += batch_size
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.batch_size_counts[bisect_left(BATCH_SIZE_BUCKETS, batch_size)] += 1
+            for wait in waits_us:
+                self.queue_wait_counts[bisect_left(QUEUE_WAIT_BUCKETS_US, wait)] += 1
+                self.queue_wait_total_us += wait
+                self.queue_wait_max_us = max(self.queue_wait_max_us, wait)
+            self.predict_total_us += predict_us
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'batch_size_histogram': _histogram(BATCH_SIZE_BUCKETS, self.batch_size_counts),
+                'mean_queue_wait_us': self.queue_wait_total_us / self.rows if self.rows else 0.0,
+                'max_queue_wait_us': self.queue_wait_max_us,
+                'queue_wait_histogram_us': _histogram(QUEUE_WAIT_BUCKETS_US, self.queue_wait_counts),
+                'mean_predict_us': self.predict_total_us / self.batches if self.batches else 0.0
+            }
+
+
+class MicroBatcher:
+    """Coalesces concurrent ``submit(row)`` calls into batched ``predict_batch(rows)`` calls"""
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait_us=0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_us = max_wait_us
+        self.metrics = BatchMetrics()
+        self._queue = queue.SimpleQueue()
+        self._start_lock = threading.Lock()
+        self._flusher_pid = None
+
+    @classmethod
+    def from_env(cls, predict_batch):
+        """Build a batcher configured by CARDIOCHECK_BATCH_* environment variables"""
+        return cls(
+            predict_batch,
+            max_batch_size=int(os.environ.get('CARDIOCHECK_BATCH_MAX_SIZE', 32)),
+            max_wait_us=int(os.environ.get('CARDIOCHECK_BATCH_MAX_WAIT_US', 0))
+        )
+
+    @property
+    def enabled(self):
+        return self.max_batch_size > 1 and self.max_wait_us > 0
+
+    def submit(self, row):
+        """Probability for one row, scored together with any concurrent rows"""
+        if not self.enabled:
+            return float(self.predict_batch([row])[0])
+
+        self._ensure_flusher()
+        pending = _Pending(row)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        stats.update({'enabled': self.enabled, 'max_batch_size_limit': self.max_batch_size,
+                      'max_wait_us': self.max_wait_us})
+        return stats
+
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._flusher_pid != os.getpid():
+                threading.Thread(target=self._run, name='micro-batcher', daemon=True).start()
+                self._flusher_pid = os.getpid()
+
+    def _run(self):
+        max_wait = self.max_wait_us / 1e6
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0].enqueued + max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        # Past the deadline: take only what is already queued
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            probabilities = self.predict_batch([pending.row for pending in batch])
+            for pending, probability in zip(batch, probabilities):
+                pending.result = float(probability)
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finished = time.perf_counter()
+        self.metrics.record(len(batch), [(started - p.enqueued) * 1e6 for p in batch],
+                            (finished - started) * 1e6)
+        for pending in batch:
+            pending.done.set()
+
+
+class _Pending:
+    __slots__ = ('row', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _histogram(bounds, counts):
+    labels = [f'<={bound}' for bound in bounds] + [f'>{bounds[-1]}']
+    return dict(zip(labels, counts))
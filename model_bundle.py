@@ -0,0 +1,299 @@
+"""
+Versioned model bundle: the trained model without pickle.
+
+A ``.bundle`` file holds everything needed to score, in plain formats:
+
+* the XGBoost booster in its native UBJSON form, zlib-compressed
+* the scaler layout as raw arrays (``order``, ``mean``, ``scale``; see
+  inference.FastPredictor)
+* the same trees flattened into node arrays (see export_trees.py), so the
+  NumPy-only ``trees`` engine can serve straight from the bundle
+* the feature schema (input columns and which of them are scaled)
+* a JSON manifest with the format version, library versions, the
+  classifier's hyperparameters and free-form metadata
+
+Layout: the 8-byte magic ``CARDIOB\\x01``, the manifest length as a
+little-endian uint64, the UTF-8 JSON manifest, then each section at a
+64-byte aligned offset listed in the manifest. ``ModelBundle.open``
+memory-maps the file and reads only the manifest; arrays are zero-copy
+views of the mapping and the booster is inflated and parsed on first
+use. Nothing is unpickled, so a bundle from an untrusted source cannot
+run code. Serving from the tree arrays needs neither xgboost, sklearn
+nor pandas, let alone the exact versions that trained the model.
+
+    python model_bundle.py migrate best_heart_model.pkl    # writes best_heart_model.bundle
+    python model_bundle.py inspect best_heart_model.bundle
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b'CARDIOB\x01'
+FORMAT_VERSION = 1
+BUNDLE_EXTENSION = '.bundle'
+ALIGNMENT = 64
+TREE_SECTIONS = ('feature', 'threshold', 'left', 'right', 'default_left', 'value', 'roots')
+_HEADER = struct.Struct('<8sQ')
+
+
+def bundle_path_for(model_path):
+    """Where the bundle of ``model_path`` (e.g. a legacy pickle) is written"""
+    return os.path.splitext(model_path)[0] + BUNDLE_EXTENSION
+
+
+def is_bundle(path):
+    return os.path.splitext(path)[1] == BUNDLE_EXTENSION
+
+
+def write_bundle(path, pipeline, metadata=None, source_sha256=''):
+    """Save a fitted preprocessor + XGBoost pipeline as a bundle at ``path``"""
+    import sklearn
+    import xgboost
+    from export_trees import export_pipeline
+    from inference import FastPredictor
+
+    fast = FastPredictor.from_pipeline(pipeline)
+    preprocessor = pipeline.named_steps['preprocessor']
+    classifier = pipeline.named_steps['classifier']
+    scalers = [(transformer, columns) for _, transformer, columns in preprocessor.transformers_
+               if type(transformer).__name__ == 'StandardScaler']
+
+    sections = {
+        'booster': zlib.compress(fast.booster.save_raw('ubj'), 6),
+        'order': fast.order.astype(np.int32),
+        'mean': fast.mean,
+        'scale': fast.scale
+    }
+    trees = export_pipeline(pipeline)
+    sections.update((name, trees[name]) for name in TREE_SECTIONS)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'producer': {'xgboost': xgboost.__version__, 'sklearn': sklearn.__version__,
+                     'numpy': np.__version__},
+        'source_sha256': source_sha256,
+        'schema': {
+            'feature_columns': list(preprocessor.feature_names_in_),
+            'scaled_columns': [str(c) for _, columns in scalers for c in columns],
+            'samples_seen': int(max((np.max(t.n_samples_seen_) for t, _ in scalers), default=0))
+        },
+        'model': {
+            'objective': 'binary:logistic',
+            'booster_format': 'ubj',
+            'num_boosted_rounds': fast.booster.num_boosted_rounds(),
+            'iteration_range': list(fast.iteration_range),
+            'missing': None if math.isnan(fast.missing) else fast.missing,
+            'classifier_params': _json_params(classifier.get_params())
+        },
+        'trees': {
+            'format_version': int(trees['format_version']),
+            'max_depth': int(trees['max_depth']),
+            'base_margin': float(trees['base_margin'])
+        },
+        'metadata': metadata or {},
+        'sections': {}
+    }
+
+    offset = 0
+    for name, data in sections.items():
+        entry = {'offset': offset, 'length': len(data) if isinstance(data, bytes) else data.nbytes}
+        if isinstance(data, np.ndarray):
+            entry.update(dtype=data.dtype.str, shape=list(data.shape))
+        else:
+            entry['encoding'] = 'zlib'
+        manifest['sections'][name] = entry
+        offset = _aligned(offset + entry['length'])
+
+    encoded = json.dumps(manifest, indent=1).encode()
+    data_start = _aligned(_HEADER.size + len(encoded))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(encoded)))
+        f.write(encoded)
+        for name, data in sections.items():
+            f.seek(data_start + manifest['sections'][name]['offset'])
+            f.write(data if isinstance(data, bytes) else np.ascontiguousarray(data).tobytes())
+    # Readers (the app's model watcher) only ever see a complete file
+    os.replace(tmp_path, path)
+    return manifest
+
+
+class ModelBundle:
+    """Memory-mapped view of a bundle file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, length = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        self.manifest = json.loads(self._map[_HEADER.size:_HEADER.size + length])
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported bundle format {self.manifest.get('format_version')!r} "
+                             f"in {path}; expected {FORMAT_VERSION}")
+        self._data_start = _aligned(_HEADER.size + length)
+        self._booster = None
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    def section(self, name):
+        """Read-only memoryview of a raw section"""
+        entry = self.manifest['sections'][name]
+        start = self._data_start + entry['offset']
+        return memoryview(self._map)[start:start + entry['length']]
+
+    def array(self, name):
+        """Zero-copy NumPy view of an array section"""
+        entry = self.manifest['sections'][name]
+        return np.frombuffer(self.section(name), dtype=np.dtype(entry['dtype'])).reshape(entry['shape'])
+
+    @property
+    def booster(self):
+        """The XGBoost booster, parsed on first access"""
+        if self._booster is None:
+            import xgboost as xgb
+            self._booster = xgb.Booster(model_file=self.booster_bytes())
+        return self._booster
+
+    def booster_bytes(self):
+        """The booster's UBJSON model"""
+        return bytearray(zlib.decompress(self.section('booster')))
+
+    def predictor(self):
+        """FastPredictor scoring exactly like the pipeline the bundle was written from"""
+        from inference import FastPredictor
+
+        model = self.manifest['model']
+        missing = model['missing']
+        return FastPredictor(
+            booster=self.booster,
+            order=self.array('order'),
+            mean=self.array('mean'),
+            scale=self.array('scale'),
+            iteration_range=tuple(model['iteration_range']),
+            missing=np.nan if missing is None else missing
+        )
+
+    def compiled_predictor(self):
+        """NumPy-only CompiledTreePredictor over the bundle's tree arrays.
+
+        Rows near the decision threshold are re-scored by ``predictor()``,
+        so xgboost is only imported if such a row comes in.
+        """
+        from tree_evaluator import CompiledTreePredictor
+
+        trees = self.manifest['trees']
+        missing = self.manifest['model']['missing']
+        arrays = {name: self.array(name) for name in ('order', 'mean', 'scale') + TREE_SECTIONS}
+        arrays.update(trees, objective=self.manifest['model']['objective'],
+                      missing=np.nan if missing is None else missing, source_sha256='')
+        return CompiledTreePredictor(arrays, exact=self.predictor)
+
+    def to_pipeline(self):
+        """Rebuild the sklearn pipeline (for evaluation and refitting; needs sklearn)"""
+        import pandas as pd
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+        from xgboost import XGBClassifier
+
+        schema = self.manifest['schema']
+        columns = schema['feature_columns']
+        scaled = schema['scaled_columns']
+        preprocessor = ColumnTransformer(transformers=[
+            ('scaler', StandardScaler(), scaled)
+        ], remainder='passthrough')
+        # Fitting on a dummy frame sets up the column layout; the scaler then gets the saved stats
+        preprocessor.fit(pd.DataFrame(np.zeros((2, len(columns))), columns=columns))
+        order = self.array('order').tolist()
+        positions = [order.index(columns.index(name)) for name in scaled]
+        scaler = preprocessor.named_transformers_['scaler']
+        scaler.mean_ = self.array('mean')[positions].copy()
+        scaler.scale_ = self.array('scale')[positions].copy()
+        scaler.var_ = scaler.scale_ ** 2
+        scaler.n_samples_seen_ = schema['samples_seen']
+
+        model = self.manifest['model']
+        classifier = XGBClassifier(**model['classifier_params'])
+        classifier.load_model(self.booster_bytes())
+        if model['missing'] is not None:
+            classifier.set_params(missing=model['missing'])
+        return Pipeline(steps=[
+            ('preprocessor', preprocessor),
+            ('classifier', classifier)
+        ])
+
+    def close(self):
+        self._map.close()
+
+
+def _json_params(params):
+    """The JSON-representable hyperparameters (NaN ``missing`` is the default anyway)"""
+    kept = {}
+    for name, value in params.items():
+        if value is None or isinstance(value, float) and math.isnan(value):
+            continue
+        if isinstance(value, (bool, int, float, str)):
+            kept[name] = value
+    return kept
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def migrate(pickle_path, output=None):
+    """Convert a legacy pipeline pickle into a bundle; returns the bundle path"""
+    import pickle
+    from model_loader import file_sha256
+
+    output = output or bundle_path_for(pickle_path)
+    with open(pickle_path, 'rb') as f:
+        pipeline = pickle.load(f)
+    write_bundle(output, pipeline, metadata={'migrated_from': os.path.basename(pickle_path)},
+                 source_sha256=file_sha256(pickle_path))
+
+    # The bundle must score every canary row exactly like the pickle did
+    from features import extract_features
+    from inference import FastPredictor
+    from model_registry import CANARY_INPUTS, validate
+    rows = np.array([extract_features(inputs) for inputs in CANARY_INPUTS])
+    bundle = ModelBundle.open(output)
+    validate(bundle.predictor())
+    if not np.array_equal(bundle.predictor().predict_proba(rows),
+                          FastPredictor.from_pipeline(pipeline).predict_proba(rows)):
+        raise ValueError(f"{output} does not reproduce {pickle_path}")
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and inspect model bundles")
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = commands.add_parser('migrate', help='convert a pipeline pickle into a bundle')
+    migrate_parser.add_argument('model', nargs='?', default='best_heart_model.pkl')
+    migrate_parser.add_argument('--output')
+    inspect_parser = commands.add_parser('inspect', help='print the manifest of a bundle')
+    inspect_parser.add_argument('bundle', nargs='?', default='best_heart_model.bundle')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        output = migrate(args.model, args.output)
+        print(f"✅ Wrote {output} ({os.path.getsize(output):,} bytes, "
+              f"was {os.path.getsize(args.model):,} as a pickle)")
+    else:
+        print(json.dumps(ModelBundle.open(args.bundle).manifest, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,18 @@
-import pickle
-import pandas as pd
+"""
+Model evaluation for the heart disease pipeline.
+
+pandas, scikit-learn, xgboost and joblib are imported inside the methods
+that use them, and the plotting stack only by ``plot_evaluation_charts``
+(see evaluation_plots.py), so importing this module is cheap.
+"""
+
+import hashlib
+import json
+import math
+import os
 import numpy as np
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score,
-    confusion_matrix, classification_report, roc_auc_score, roc_curve
-)
-from sklearn.model_selection import cross_val_score, train_test_split
-import matplotlib.pyplot as plt
-import seaborn as sns
+from dataset import load_dataset
+from model_loader import default_model_path, read_pipeline
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -16,12 +21,20 @@ class HeartDiseaseModelEvaluator:
     Comprehensive model evaluation for heart disease prediction
     """
     
-    def __init__(self, model_path='best_heart_model.pkl', data_path='datasets/heart_health.csv'):
+    def __init__(self, model_path=None, data_path='datasets/heart_health.csv',
+                 n_jobs=-1, cache_dir='.evaluation_cache'):
         """
-        Initialize the evaluator with model and data paths
+        Initialize the evaluator with model and data paths.
+        
+        ``model_path`` defaults to the model bundle, falling back to the
+        legacy pickle. Cross-validation folds are fitted on ``n_jobs`` cores
+        (-1 for all) and their scores cached under ``cache_dir`` (None
+        disables the cache).
         """
-        self.model_path = model_path
+        self.model_path = model_path or default_model_path()
         self.data_path = data_path
+        self.n_jobs = n_jobs
+        self.cache_dir = cache_dir
         self.model = None
         self.data = None
         self.X = None
@@ -30,12 +43,13 @@ class HeartDiseaseModelEvaluator:
         self.X_test = None
         self.y_train = None
         self.y_test = None
+        self._evaluation = None
         
     def load_model(self):
         """Load the trained model"""
         try:
-            with open(self.model_path, 'rb') as file:
-                self.model = pickle.load(file)
+            self.model = read_pipeline(self.model_path)
+            self._evaluation = None
             print("✅ Model loaded successfully!")
             return True
         except FileNotFoundError:
@@ -48,7 +62,7 @@ class HeartDiseaseModelEvaluator:
     def load_data(self):
         """Load and prepare the dataset"""
         try:
-            self.data = pd.read_csv(self.data_path)
+            self.data = load_dataset(self.data_path).frame(dtype=np.float64)
             print("✅ Data loaded successfully!")
             print(f"📊 Dataset shape: {self.data.shape}")
             
@@ -88,9 +102,11 @@ class HeartDiseaseModelEvaluator:
             print("❌ Please load data first!")
             return False
         
+        from sklearn.model_selection import train_test_split
         self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
             self.X, self.y, test_size=test_size, random_state=random_state, stratify=self.y
         )
+        self._evaluation = None
         
         print(f"✅ Data split successfully!")
         print(f"📊 Training set: {self.X_train.shape}")
@@ -98,7 +114,14 @@ class HeartDiseaseModelEvaluator:
         return True
     
     def evaluate_model(self):
-        """Comprehensive model evaluation"""
+        """Comprehensive model evaluation.
+        
+        Test-set predictions are computed once and reused until the model
+        or the split changes.
+        """
+        if self._evaluation is not None:
+            return self._evaluation
+        
         if self.model is None:
             print("❌ Please load model first!")
             return None
@@ -107,6 +130,8 @@ class HeartDiseaseModelEvaluator:
             print("❌ Please split data first!")
             return None
         
+        from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+        
         # Make predictions
         y_pred = self.model.predict(self.X_test)
         y_prob = self.model.predict_proba(self.X_test)[:, 1] if hasattr(self.model, 'predict_proba') else None
@@ -120,7 +145,65 @@ class HeartDiseaseModelEvaluator:
             'roc_auc': roc_auc_score(self.y_test, y_prob) if y_prob is not None else None
         }
         
-        return metrics, y_pred, y_prob
+        self._evaluation = (metrics, y_pred, y_prob)
+        return self._evaluation
+    
+    def cross_validate(self, cv=5, scoring='accuracy'):
+        """Stratified k-fold scores of the model on the full dataset.
+        
+        Matches ``cross_val_score(model, X, y, cv=cv, scoring=scoring)``.
+        Folds are fitted in parallel; each fold's score is cached on disk
+        under a key made of the model's parameters (every fold refits a
+        clone, so its fitted state does not matter), the data, the fold
+        setup and library versions, so unchanged inputs are never refitted.
+        """
+        if self.model is None or self.X is None or self.y is None:
+            print("❌ Please load model and data first!")
+            return None
+        
+        from joblib import Parallel, delayed
+        from sklearn.base import clone
+        from sklearn.model_selection import StratifiedKFold
+        
+        cache_path = self._cv_cache_path(cv, scoring)
+        cached = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cached = json.load(f)['folds']
+        
+        splits = list(StratifiedKFold(n_splits=cv).split(self.X, self.y))
+        pending = [i for i in range(cv) if str(i) not in cached]
+        if pending:
+            print(f"🔄 Fitting {len(pending)} of {cv} folds (n_jobs={self.n_jobs})...")
+            estimator = _single_threaded(self.model) if self.n_jobs != 1 else self.model
+            results = Parallel(n_jobs=self.n_jobs, return_as='generator')(
+                delayed(_fit_and_score_fold)(clone(estimator), self.X, self.y, *splits[i], scoring)
+                for i in pending
+            )
+            for i, score in zip(pending, results):
+                cached[str(i)] = float(score)
+                if cache_path:
+                    # Saved after every fold so an interrupted run resumes where it stopped
+                    _write_json(cache_path, {'folds': cached})
+        else:
+            print(f"⚡ Cross-validation scores loaded from {cache_path}")
+        
+        return np.array([cached[str(i)] for i in range(cv)])
+    
+    def _cv_cache_path(self, cv, scoring):
+        if not self.cache_dir:
+            return None
+        import sklearn
+        import xgboost
+        key = {
+            'model': _params_key(self.model),
+            'data': _frame_sha256(self.X, self.y),
+            'cv': cv,
+            'scoring': scoring,
+            'versions': [sklearn.__version__, xgboost.__version__]
+        }
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"cv-{digest[:24]}.json")
     
     def print_evaluation_report(self):
         """Print comprehensive evaluation report"""
@@ -128,10 +211,10 @@ class HeartDiseaseModelEvaluator:
         print("🔬 HEART DISEASE MODEL EVALUATION REPORT")
         print("="*60)
         
-        metrics, y_pred, y_prob = self.evaluate_model()
-        
-        if metrics is None:
-            return
+        evaluation = self.evaluate_model()
+        if evaluation is None:
+            return None
+        metrics, y_pred, y_prob = evaluation
         
         # Print metrics
         print(f"\n📈 PERFORMANCE METRICS:")
@@ -142,6 +225,8 @@ class HeartDiseaseModelEvaluator:
         if metrics['roc_auc']:
             print(f"   ROC-AUC:   {metrics['roc_auc']:.4f} ({metrics['roc_auc']*100:.2f}%)")
         
+        from sklearn.metrics import classification_report, confusion_matrix
+        
         # Confusion Matrix
         cm = confusion_matrix(self.y_test, y_pred)
         print(f"\n📊 CONFUSION MATRIX:")
@@ -156,7 +241,7 @@ class HeartDiseaseModelEvaluator:
         
         # Cross-validation scores
         if self.X is not None and self.y is not None:
-            cv_scores = cross_val_score(self.model, self.X, self.y, cv=5, scoring='accuracy')
+            cv_scores = self.cross_validate(cv=5, scoring='accuracy')
             print(f"\n🔄 CROSS-VALIDATION RESULTS:")
             print(f"   CV Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
             print(f"   CV Scores: {cv_scores}")
@@ -209,76 +294,24 @@ class HeartDiseaseModelEvaluator:
             print("⚠️ Could be better balanced")
     
     def plot_evaluation_charts(self):
-        """Create visualization charts for model evaluation"""
+        """Create visualization charts for model evaluation.
+        
+        The plotting backend (evaluation_plots.py, matplotlib and seaborn)
+        is imported here, on first use, rather than with this module.
+        """
         try:
-            metrics, y_pred, y_prob = self.evaluate_model()
-            
-            if metrics is None:
+            evaluation = self.evaluate_model()
+            if evaluation is None:
                 return
+            metrics, y_pred, y_prob = evaluation
             
-            # Create subplots
-            fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-            fig.suptitle('Heart Disease Model Evaluation Dashboard', fontsize=16, fontweight='bold')
-            
-            # 1. Confusion Matrix
-            cm = confusion_matrix(self.y_test, y_pred)
-            sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[0,0])
-            axes[0,0].set_title('Confusion Matrix')
-            axes[0,0].set_xlabel('Predicted')
-            axes[0,0].set_ylabel('Actual')
-            
-            # 2. Metrics Bar Chart
-            metric_names = ['Accuracy', 'Precision', 'Recall', 'F1-Score']
-            metric_values = [metrics['accuracy'], metrics['precision'], metrics['recall'], metrics['f1_score']]
-            
-            bars = axes[0,1].bar(metric_names, metric_values, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728'])
-            axes[0,1].set_title('Performance Metrics')
-            axes[0,1].set_ylabel('Score')
-            axes[0,1].set_ylim(0, 1)
-            
-            # Add value labels on bars
-            for bar, value in zip(bars, metric_values):
-                height = bar.get_height()
-                axes[0,1].text(bar.get_x() + bar.get_width()/2., height + 0.01,
-                             f'{value:.3f}', ha='center', va='bottom')
-            
-            # 3. ROC Curve (if available)
-            if y_prob is not None:
-                fpr, tpr, _ = roc_curve(self.y_test, y_prob)
-                axes[1,0].plot(fpr, tpr, color='darkorange', lw=2, 
-                              label=f'ROC curve (AUC = {metrics["roc_auc"]:.3f})')
-                axes[1,0].plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--')
-                axes[1,0].set_xlim([0.0, 1.0])
-                axes[1,0].set_ylim([0.0, 1.05])
-                axes[1,0].set_xlabel('False Positive Rate')
-                axes[1,0].set_ylabel('True Positive Rate')
-                axes[1,0].set_title('ROC Curve')
-                axes[1,0].legend(loc="lower right")
-            else:
-                axes[1,0].text(0.5, 0.5, 'ROC Curve\nNot Available', 
-                              ha='center', va='center', fontsize=12)
-                axes[1,0].set_title('ROC Curve')
-            
-            # 4. Feature Importance (if available)
-            if hasattr(self.model, 'feature_importances_'):
-                feature_importance = pd.DataFrame({
-                    'feature': self.X.columns,
-                    'importance': self.model.feature_importances_
-                }).sort_values('importance', ascending=True).tail(10)
-                
-                axes[1,1].barh(feature_importance['feature'], feature_importance['importance'])
-                axes[1,1].set_title('Top 10 Feature Importance')
-                axes[1,1].set_xlabel('Importance')
-            else:
-                axes[1,1].text(0.5, 0.5, 'Feature Importance\nNot Available', 
-                              ha='center', va='center', fontsize=12)
-                axes[1,1].set_title('Feature Importance')
-            
-            plt.tight_layout()
-            plt.show()
+            from evaluation_plots import plot_evaluation_dashboard
+            plot_evaluation_dashboard(self.y_test, y_pred, y_prob, metrics, self.model, self.X.columns)
             
             print("✅ Evaluation charts generated successfully!")
             
+        except ImportError as e:
+            print(f"⚠️ Charts need matplotlib and seaborn: {e}")
         except Exception as e:
             print(f"❌ Error generating charts: {e}")
     
@@ -309,6 +342,55 @@ class HeartDiseaseModelEvaluator:
         print("\n✅ Model evaluation completed successfully!")
         return metrics
 
+def _fit_and_score_fold(estimator, X, y, train_index, test_index, scoring):
+    """Fit a fresh estimator on one fold's training rows and score its test rows"""
+    from sklearn.metrics import get_scorer
+    estimator.fit(X.iloc[train_index], y.iloc[train_index])
+    return get_scorer(scoring)(estimator, X.iloc[test_index], y.iloc[test_index])
+
+def _single_threaded(model):
+    """Copy of ``model`` with its own thread pools off, so parallel folds do not oversubscribe"""
+    from sklearn.base import clone
+    threads = {name: 1 for name in model.get_params() if name.split('__')[-1] in ('n_jobs', 'nthread')}
+    return clone(model).set_params(**threads)
+
+def _params_key(model):
+    """Stable description of an estimator's parameters, for cache keys"""
+    return {name: _param_value(value) for name, value in sorted(model.get_params(deep=True).items())}
+
+def _param_value(value):
+    if hasattr(value, 'get_params'):
+        # Nested estimators' own parameters are already listed by get_params(deep=True)
+        return f"{type(value).__module__}.{type(value).__qualname__}"
+    if isinstance(value, (list, tuple)):
+        return [_param_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _param_value(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return repr(value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if callable(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', repr(value))}"
+    return repr(value)
+
+def _frame_sha256(X, y):
+    import pandas as pd
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in X.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _write_json(path, payload):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
 def main():
     """Main function to run the evaluator"""
     evaluator = HeartDiseaseModelEvaluator()
@@ -0,0 +1,126 @@
+"""
+Model loading for the web app.
+
+Picks the serving engine for a model file, either a versioned bundle
+(``.bundle``, see model_bundle.py) or a legacy pipeline pickle:
+
+* ``trees``    - NumPy-only evaluator over ``<model>.npz`` from export_trees.py,
+                 or over the tree arrays inside a bundle
+* ``fast``     - score through FastPredictor (bundles never unpickle)
+* ``pipeline`` - score through the sklearn pipeline unchanged
+* ``table``    - answer from the precomputed grid built by lookup_table.py,
+                 scoring inputs outside the grid with the ``auto`` engine
+* ``auto``     - ``trees`` when an export of the current pickle exists,
+                 otherwise ``fast`` (the default); always ``trees`` for a
+                 bundle, which embeds its tree arrays
+
+The compiled engine only imports xgboost, sklearn or pandas to re-score a
+row within ``tree_evaluator.EXACT_TOLERANCE`` of the decision threshold,
+where its last-digit difference from the booster could flip the label; that
+keeps worker memory and boot time down while labels match the ``fast``
+engine exactly. The bundle is the authoritative model: a pickle's ``.npz``
+export is only read when no bundle is being served.
+"""
+
+import hashlib
+import os
+import pickle
+
+from model_bundle import BUNDLE_EXTENSION, ModelBundle, is_bundle
+
+ENGINES = ('auto', 'trees', 'fast', 'pipeline', 'table')
+MODEL_NAME = 'best_heart_model'
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file, used to tie an export to the pickle it came from"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_model_path(directory=''):
+    """The model bundle in ``directory`` if there is one, else the legacy pickle"""
+    bundle = os.path.join(directory, MODEL_NAME + BUNDLE_EXTENSION)
+    return bundle if os.path.exists(bundle) else os.path.join(directory, MODEL_NAME + '.pkl')
+
+
+def read_pipeline(model_path):
+    """The fitted sklearn pipeline of a bundle or pickle"""
+    if is_bundle(model_path):
+        return ModelBundle.open(model_path).to_pipeline()
+    with open(model_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def compiled_path_for(model_path):
+    """Location export_trees.py writes the array export of ``model_path`` to"""
+    return os.path.splitext(model_path)[0] + '.npz'
+
+
+def load_model(model_path, engine='auto'):
+    """Load ``model_path`` and return a predictor for the requested engine"""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown model engine {engine!r}; expected one of {ENGINES}")
+
+    if engine == 'table':
+        return _load_table(model_path, fallback=load_model(model_path, engine='auto'))
+
+    if is_bundle(model_path) and engine != 'pipeline':
+        # Bundles carry their own tree arrays, so they never go stale
+        bundle = ModelBundle.open(model_path)
+        return bundle.compiled_predictor() if engine in ('auto', 'trees') else bundle.predictor()
+
+    if engine in ('auto', 'trees'):
+        compiled = _load_compiled(model_path, required=engine == 'trees')
+        if compiled is not None:
+            return compiled
+
+    from inference import PipelinePredictor, load_predictor
+    pipeline = read_pipeline(model_path)
+    if engine == 'pipeline':
+        return PipelinePredictor(pipeline)
+    return load_predictor(pipeline)
+
+
+def _load_compiled(model_path, required):
+    from tree_evaluator import CompiledTreePredictor
+
+    compiled_path = compiled_path_for(model_path)
+    if not os.path.exists(compiled_path):
+        if required:
+            raise FileNotFoundError(f"No tree export at {compiled_path}; run export_trees.py")
+        return None
+
+    predictor = CompiledTreePredictor.load(compiled_path)
+    if os.path.exists(model_path):
+        if predictor.source_sha256 == file_sha256(model_path):
+            # Rows near the threshold are checked against the pickle the export came from
+            predictor.exact = lambda: _exact_predictor(model_path)
+        elif not required:
+            # A stale export would silently serve the previous model
+            print(f"Ignoring stale tree export {compiled_path}; re-run export_trees.py")
+            return None
+    return predictor
+
+
+def _exact_predictor(model_path):
+    from inference import FastPredictor
+    return FastPredictor.from_pipeline(read_pipeline(model_path))
+
+
+def _load_table(model_path, fallback):
+    from lookup_table import LookupTablePredictor, table_paths
+
+    array_path, manifest_path = table_paths(model_path)
+    if not os.path.exists(manifest_path):
+        print(f"No lookup table at {array_path}; run lookup_table.py build")
+        return fallback
+
+    predictor = LookupTablePredictor.load(array_path, manifest_path, fallback=fallback)
+    if predictor.source_sha256 != file_sha256(model_path):
+        print(f"Ignoring stale lookup table {array_path}; re-run lookup_table.py build")
+        return fallback
+    return predictor
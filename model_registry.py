@@ -0,0 +1,280 @@
+"""
+Model registry with hot reload and rollback.
+
+The registry owns the model the app serves. A new model is loaded,
+validated and warmed with canary predictions in the background, then
+swapped in by replacing a single reference. Requests take
+``registry.current`` once and use that ``ModelVersion`` throughout, so
+in-flight requests finish on the version they started with. The last
+``keep`` versions stay loaded for instant rollback.
+
+The first model is loaded by ``load_initial`` (gunicorn's preload and
+every worker's warm-up call it through app.warm_up) or, failing that, on
+the first access to ``current``, so importing the app stays cheap.
+
+Reloads are triggered by a watcher thread that notices the model files
+changing on disk, or by the admin endpoints in app.py. Every gunicorn
+worker has its own registry; admin actions are also written to a small
+control file next to the model that the other workers' watchers pick up.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+from explanations import ModelExplanations
+from features import extract_features
+from micro_batcher import MicroBatcher
+from model_loader import compiled_path_for, file_sha256, load_model
+from prediction_cache import PredictionCache
+
+# Canary inputs scored before a new model may serve traffic
+CANARY_INPUTS = [
+    {},
+    {'age': 67, 'sex': 1, 'highbp': 1, 'highchol': 1, 'bmi': 34.2, 'smoker': 1,
+     'diabetes': 1, 'genhlth': 5, 'physhlth': 20, 'diffwalk': 1, 'physactivity': 0},
+    {'age': 24, 'sex': 0, 'bmi': 21.3, 'genhlth': 1, 'education': 6, 'income': 8}
+]
+
+
+class ModelVersion:
+    """A loaded model plus its own cache, batcher and explanations. Never mutated after load."""
+
+    def __init__(self, number, predictor, sha256, path, engine):
+        self.number = number
+        self.predictor = predictor
+        self.sha256 = sha256
+        self.path = path
+        self.engine = engine
+        self.loaded_at = time.time()
+        self.cache = PredictionCache.from_env(namespace=f"{sha256}:{type(predictor).__name__}")
+        self.batcher = MicroBatcher.from_env(predictor.predict_proba)
+        self.explanations = ModelExplanations.from_env(path, sha256, self.cache, predictor)
+        engine_name = type(predictor).__name__
+        self._single_seconds = metrics.INFERENCE_SECONDS.labels(engine_name, 'single')
+        self._batch_seconds = metrics.INFERENCE_SECONDS.labels(engine_name, 'batch')
+
+    def predict_probabilities(self, rows):
+        """Probability of heart disease for each feature row, served from cache when possible"""
+        return self.cache.get_or_compute_many(rows, self._score_batch)
+
+    def predict_proba_one(self, values):
+        """Probability for one row; concurrent cache misses are scored as one batch"""
+        return self.cache.get_or_compute(values, self._score_one)
+
+    def _score_one(self, row):
+        started = time.perf_counter()
+        if self.batcher.enabled:
+            probability = self.batcher.submit(row)
+        else:
+            probability = self.predictor.predict_proba_one(row)
+        self._single_seconds.observe(time.perf_counter() - started)
+        return probability
+
+    def _score_batch(self, rows):
+        started = time.perf_counter()
+        probabilities = self.predictor.predict_proba(rows)
+        self._batch_seconds.observe(time.perf_counter() - started)
+        return probabilities
+
+    def describe(self):
+        return {
+            'version': self.number,
+            'sha256': self.sha256,
+            'engine': type(self.predictor).__name__,
+            'loaded_at': self.loaded_at
+        }
+
+
+class ModelRegistry:
+    """Holds the serving model version and swaps in new ones atomically"""
+
+    def __init__(self, model_path, engine='auto', keep=3, watch_interval=0.0):
+        self.model_path = model_path
+        self.engine = engine
+        self.watch_interval = watch_interval
+        self.control_path = model_path + '.control.json'
+        self.last_error = None
+        self._current = None
+        self._history = deque(maxlen=keep)
+        self._next_number = 1
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._watch_pid = None
+        self._seen_files = None
+        self._seen_control = None
+
+    @property
+    def current(self):
+        """The serving ModelVersion (loaded on first access), or None if no model could be loaded"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.load_initial()
+        return self._current
+
+    def load_initial(self):
+        """Load the model synchronously at startup; errors leave ``current`` as None"""
+        self._seen_files = self._files_signature()
+        self._seen_control = self._control_signature()
+        version = self.reload()
+        self._initialized = True
+        return version
+
+    def reload(self):
+        """Load, validate and warm the model on disk, then swap it in.
+
+        Returns the new ModelVersion, or None if loading or validation
+        failed, in which case the previous version keeps serving.
+        """
+        with self._load_lock:
+            try:
+                sha256 = file_sha256(self.model_path)
+                current = self._current
+                if current is not None and current.sha256 == sha256:
+                    return current
+                if any(v.sha256 == sha256 for v in self._history):
+                    # Already loaded and validated earlier, e.g. after a rollback
+                    return self.rollback(sha256)
+                predictor = load_model(self.model_path, engine=self.engine)
+                validate(predictor)
+                version = ModelVersion(self._next_number, predictor, sha256,
+                                       self.model_path, self.engine)
+                self._next_number += 1
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Error loading model from {self.model_path}: {self.last_error}")
+                return None
+            self.last_error = None
+            self._swap(version)
+            print(f"Model version {version.number} ({sha256[:12]}) now serving")
+            return version
+
+    def reload_async(self):
+        """Start a reload in a background thread and return immediately"""
+        thread = threading.Thread(target=self.reload, name='model-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def rollback(self, sha256=None):
+        """Swap back to a previously loaded version (the one before current by default)"""
+        with self._swap_lock:
+            history = list(self._history)
+            if sha256 is None:
+                candidates = history[:-1]
+            else:
+                candidates = [v for v in history if v.sha256 == sha256 and v is not self._current]
+            if not candidates:
+                return None
+            version = candidates[-1]
+            # Move the target to the end so history stays in serving order
+            self._history.remove(version)
+            self._history.append(version)
+            self._current = version
+        print(f"Rolled back to model version {version.number} ({version.sha256[:12]})")
+        return version
+
+    def broadcast(self, action, sha256=None):
+        """Ask the other workers' watchers to apply ``action`` too"""
+        payload = {'action': action, 'sha256': sha256, 'pid': os.getpid(), 'time': time.time()}
+        tmp_path = f"{self.control_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.control_path)
+        self._seen_control = self._control_signature()
+
+    def status(self):
+        current = self._current
+        return {
+            'model_path': self.model_path,
+            'engine': self.engine,
+            'current': current.describe() if current else None,
+            'history': [v.describe() for v in self._history],
+            'cache': current.cache.stats() if current else None,
+            'batching': current.batcher.stats() if current else None,
+            'explanations': current.explanations.stats() if current else None,
+            'last_error': self.last_error,
+            'watching': self._watch_pid == os.getpid()
+        }
+
+    def ensure_watching(self):
+        """Start the file watcher in this process if enabled and not yet running.
+
+        Threads do not survive fork, so each gunicorn worker starts its own.
+        """
+        if self.watch_interval <= 0 or self._watch_pid == os.getpid():
+            return
+        self._watch_pid = os.getpid()
+        threading.Thread(target=self._watch, name='model-watcher', daemon=True).start()
+
+    def _swap(self, version):
+        with self._swap_lock:
+            self._history.append(version)
+            self._current = version
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                self._apply_control()
+                files = self._files_signature()
+                if files == self._seen_files:
+                    pending = None
+                    continue
+                # Wait for the files to stop changing so a half-written model is never loaded
+                if files != pending:
+                    pending = files
+                    continue
+                self._seen_files = files
+                pending = None
+                self.reload()
+            except Exception as e:
+                print(f"Model watcher error: {e}")
+
+    def _apply_control(self):
+        signature = self._control_signature()
+        if signature == self._seen_control:
+            return
+        self._seen_control = signature
+        with open(self.control_path) as f:
+            control = json.load(f)
+        if control.get('pid') == os.getpid():
+            return
+        if control.get('action') == 'rollback':
+            self.rollback(control.get('sha256'))
+        elif control.get('action') == 'reload':
+            self.reload()
+
+    def _files_signature(self):
+        return tuple(_stat_signature(path) for path in
+                     (self.model_path, compiled_path_for(self.model_path)))
+
+    def _control_signature(self):
+        return _stat_signature(self.control_path)
+
+
+def validate(predictor):
+    """Score the canary inputs and reject models that return nonsense"""
+    rows = [extract_features(inputs) for inputs in CANARY_INPUTS]
+    batch = [float(p) for p in predictor.predict_proba(rows)]
+    single = [predictor.predict_proba_one(row) for row in rows]
+    for probability in batch + single:
+        if not (math.isfinite(probability) and 0.0 <= probability <= 1.0):
+            raise ValueError(f"Canary prediction out of range: {probability}")
+    if any(abs(a - b) > 1e-6 for a, b in zip(batch, single)):
+        raise ValueError("Canary batch and single-row predictions disagree")
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
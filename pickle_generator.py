@@ -1,43 +1,266 @@
-import pandas as pd
-import numpy as np
+"""
+Train the heart disease model and save it as best_heart_model.bundle (the
+format the app loads, see model_bundle.py) plus the legacy pipeline pickle.
+
+    python pickle_generator.py                  # fit in memory (the original recipe)
+    python pickle_generator.py --incremental    # stream the data in chunks
+    python pickle_generator.py --incremental --data datasets/new_screening.csv \
+        --continue-from best_heart_model.bundle --rounds 20
+
+The incremental mode never holds more than one chunk of the training rows
+in memory. The StandardScaler is fitted with ``partial_fit`` over the
+chunks, and the chunks are streamed through an XGBoost ``DataIter`` into
+an external-memory ``ExtMemQuantileDMatrix`` (XGBoost 3.0 and later) or,
+on older XGBoost, a ``QuantileDMatrix``, which keeps only the quantized
+matrix (about a byte per value) in memory. With
+``--continue-from`` the scaler of the existing model is kept (its trees
+were grown on that scaling) and boosting continues from its booster.
+
+The in-memory fit leaves ``tree_method`` to XGBoost, as the original
+recipe did; ``--tree-method hist`` opts in to the histogram method. The
+incremental mode always needs a quantile method and defaults to ``hist``.
+
+Both modes hold out the same stratified 20% test split and report the
+training time and peak RSS, optionally appending them to a JSONL file.
+"""
+
+import argparse
+import json
+import os
 import pickle
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier
+import xgboost as xgb
 from xgboost import XGBClassifier
+from dataset import load_dataset
+from features import FEATURE_COLUMNS, SCALED_COLUMNS
+from model_bundle import bundle_path_for, write_bundle
+from model_loader import read_pipeline
+
+TARGET_COLUMN = 'HeartDiseaseorAttack'
+
+
+def build_pipeline(nthread=None, tree_method=None):
+    """Unfitted preprocessor + XGBoost pipeline; the feature schema says which columns are scaled"""
+    preprocessor = ColumnTransformer(transformers=[
+        ('scaler', StandardScaler(), SCALED_COLUMNS)
+    ], remainder='passthrough')
+
+    # Best model (XGBoost)
+    model = XGBClassifier(eval_metric='logloss', n_jobs=nthread, tree_method=tree_method)
+
+    return Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('classifier', model)
+    ])
+
+
+def split_indices(y):
+    """Row indices of the stratified 80/20 train/test split (needs only the target column)"""
+    rows = np.arange(len(y))
+    train, test = train_test_split(rows, stratify=np.asarray(y), test_size=0.2, random_state=42)
+    # Sorted so chunks read the memory-mapped columns front to back
+    return np.sort(train), np.sort(test)
+
+
+def feature_columns(dataset):
+    """The model's columns in the feature schema's order; the dataset must have all of them"""
+    missing = [name for name in FEATURE_COLUMNS if name not in dataset.columns]
+    if missing:
+        raise ValueError(f"Dataset is missing feature columns: {', '.join(missing)}")
+    return FEATURE_COLUMNS
+
+
+def train_in_memory(dataset, nthread=None, tree_method=None):
+    # Split features and target
+    X, y = dataset.split(TARGET_COLUMN, dtype=np.float64)
+    X = X[feature_columns(dataset)]
+    train, _ = split_indices(y)
+
+    pipeline = build_pipeline(nthread, tree_method)
+    pipeline.fit(X.iloc[train], y.iloc[train])
+    return pipeline, len(train)
+
+
+def feature_chunk(dataset, columns, rows):
+    """float64 DataFrame of ``rows``, the dtype the pipeline is always fitted and scored on"""
+    return dataset.frame(columns).iloc[rows].astype(np.float64)
+
+
+class ChunkIter(xgb.DataIter):
+    """Feeds transformed training chunks to XGBoost one at a time"""
+
+    def __init__(self, dataset, rows, preprocessor, chunk_rows, cache_prefix):
+        super().__init__(cache_prefix=cache_prefix)
+        self.dataset = dataset
+        self.features = feature_columns(dataset)
+        self.preprocessor = preprocessor
+        self.chunks = [rows[i:i + chunk_rows] for i in range(0, len(rows), chunk_rows)]
+        self._it = 0
+
+    def next(self, input_data):
+        if self._it == len(self.chunks):
+            return False
+        rows = self.chunks[self._it]
+        X = feature_chunk(self.dataset, self.features, rows)
+        input_data(data=self.preprocessor.transform(X).astype(np.float32),
+                   label=self.dataset.columns[TARGET_COLUMN][rows])
+        self._it += 1
+        return True
+
+    def reset(self):
+        self._it = 0
+
+
+def fit_preprocessor_incrementally(dataset, rows, chunk_rows):
+    """ColumnTransformer whose scaler saw every training row, one chunk at a time"""
+    scaler = StandardScaler()
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        scaler.partial_fit(feature_chunk(dataset, SCALED_COLUMNS, chunk))
+
+    # Fit the layout (column names, remainder) on one chunk, then use the streamed scaler
+    preprocessor = build_pipeline().named_steps['preprocessor']
+    preprocessor.fit(feature_chunk(dataset, feature_columns(dataset), rows[:chunk_rows]))
+    name, _, columns = preprocessor.transformers_[0]
+    preprocessor.transformers_[0] = (name, scaler, columns)
+    return preprocessor
+
+
+def streamed_matrix(dataset, rows, preprocessor, chunk_rows, cache_dir, nthread=None):
+    """Training DMatrix fed one chunk at a time by a ChunkIter"""
+    ext_mem = getattr(xgb, 'ExtMemQuantileDMatrix', None)
+    if ext_mem is not None:
+        chunks = ChunkIter(dataset, rows, preprocessor, chunk_rows,
+                           cache_prefix=os.path.join(cache_dir, 'train'))
+        return ext_mem(chunks, nthread=nthread)
+    # XGBoost < 3.0: still streamed, but the quantized pages stay in memory
+    chunks = ChunkIter(dataset, rows, preprocessor, chunk_rows, cache_prefix=None)
+    return xgb.QuantileDMatrix(chunks, nthread=nthread)
+
+
+def train_incremental(dataset, chunk_rows=65536, continue_from=None, rounds=None,
+                      nthread=None, tree_method=None):
+    # External memory is built from quantized pages: hist unless approx is asked for
+    tree_method = tree_method or 'hist'
+    y = dataset.columns[TARGET_COLUMN]
+    train, _ = split_indices(y)
+
+    if continue_from:
+        pipeline = read_pipeline(continue_from)
+        preprocessor = pipeline.named_steps['preprocessor']
+        classifier = pipeline.named_steps['classifier']
+        base = classifier.get_booster()
+        rounds = rounds or 10
+    else:
+        pipeline = build_pipeline(nthread, tree_method)
+        preprocessor = fit_preprocessor_incrementally(dataset, train, chunk_rows)
+        classifier = pipeline.named_steps['classifier']
+        base = None
+        rounds = rounds or classifier.get_params()['n_estimators'] or 100
+
+    params = classifier.get_xgb_params()
+    params.update(objective='binary:logistic', tree_method=tree_method)
+    if nthread is not None:
+        params['nthread'] = nthread
+
+    cache_dir = tempfile.mkdtemp(prefix='xgb-extmem-')
+    dtrain = None
+    try:
+        dtrain = streamed_matrix(dataset, train, preprocessor, chunk_rows, cache_dir, nthread)
+        booster = xgb.train(params, dtrain, num_boost_round=rounds, xgb_model=base)
+    finally:
+        # The DMatrix removes its own cache pages when freed; the directory goes after it
+        del dtrain
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    pipeline = wrap_booster(booster, preprocessor, {**classifier.get_params(), 'n_jobs': nthread,
+                                                    'tree_method': tree_method})
+    return pipeline, len(train)
+
+
+def wrap_booster(booster, preprocessor, classifier_params):
+    """The sklearn pipeline the app loads, around a fitted preprocessor and a raw booster"""
+    model = XGBClassifier(**classifier_params)
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    model.set_params(n_estimators=booster.num_boosted_rounds())
+    return Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('classifier', model)
+    ])
+
 
-# Load dataset
-df = pd.read_csv('datasets/heart_health.csv')
+def peak_rss_mib():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
 
-# Split features and target
-X = df.drop('HeartDiseaseorAttack', axis=1)
-y = df['HeartDiseaseorAttack']
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y, test_size=0.2, random_state=42)
+def main():
+    parser = argparse.ArgumentParser(description="Train and save the heart disease model")
+    parser.add_argument('--data', default=os.path.join('datasets', 'heart_health.csv'))
+    parser.add_argument('--output', default='best_heart_model.pkl',
+                        help='pipeline pickle; the bundle is written next to it')
+    parser.add_argument('--incremental', action='store_true',
+                        help='stream the training rows in chunks through external memory')
+    parser.add_argument('--chunk-rows', type=int, default=65536)
+    parser.add_argument('--continue-from', metavar='MODEL',
+                        help='keep boosting an existing model on --data (implies --incremental)')
+    parser.add_argument('--rounds', type=int,
+                        help='boosting rounds (default: 100, or 10 when continuing)')
+    parser.add_argument('--nthread', type=int,
+                        default=int(os.environ.get('CARDIOCHECK_TRAIN_THREADS', 0)) or None,
+                        help='training threads (default: all cores)')
+    parser.add_argument('--tree-method', default=os.environ.get('CARDIOCHECK_TREE_METHOD') or None,
+                        choices=('hist', 'approx', 'exact'),
+                        help="default: XGBoost's own in memory, hist with --incremental")
+    parser.add_argument('--report', metavar='JSONL',
+                        help='append the training time and peak RSS to this file')
+    args = parser.parse_args()
+    incremental = args.incremental or bool(args.continue_from)
+    if incremental and args.tree_method == 'exact':
+        parser.error('external-memory training needs --tree-method hist or approx')
 
-# Preprocessing: Scaling continuous features
-columns_to_scale = ['BMI', 'MentHlth', 'PhysHlth', 'Age', 'Education', 'Income']
-preprocessor = ColumnTransformer(transformers=[
-    ('scaler', StandardScaler(), columns_to_scale)
-], remainder='passthrough')
+    # Load dataset (through its compact columnar cache, built on first use)
+    dataset = load_dataset(args.data)
 
-# Best model (XGBoost)
-model = XGBClassifier(use_label_encoder=False, eval_metric='logloss')
+    started = time.perf_counter()
+    if incremental:
+        pipeline, rows = train_incremental(dataset, args.chunk_rows, args.continue_from,
+                                           args.rounds, args.nthread, args.tree_method)
+    else:
+        pipeline, rows = train_in_memory(dataset, args.nthread, args.tree_method)
+    seconds = time.perf_counter() - started
 
-# Full pipeline
-pipeline = Pipeline(steps=[
-    ('preprocessor', preprocessor),
-    ('classifier', model)
-])
+    report = {
+        'mode': 'continue' if args.continue_from else 'incremental' if incremental else 'in-memory',
+        'data': args.data,
+        'rows': rows,
+        'rounds': pipeline.named_steps['classifier'].get_booster().num_boosted_rounds(),
+        'seconds': round(seconds, 3),
+        'peak_rss_mib': round(peak_rss_mib(), 1)
+    }
+    if args.report:
+        with open(args.report, 'a') as f:
+            f.write(json.dumps(report) + '\n')
+    print(f"⏱️ Trained on {rows:,} rows in {seconds:.1f}s, peak RSS {report['peak_rss_mib']:.0f} MiB")
 
-# Train
-pipeline.fit(X_train, y_train)
+    # Save the model: the pickle for older tooling, then the bundle the app watches
+    with open(args.output, 'wb') as f:
+        pickle.dump(pipeline, f)
+    bundle = bundle_path_for(args.output)
+    write_bundle(bundle, pipeline, metadata={'training': report})
+    print(f"✅ Model saved as {bundle} and {args.output}")
 
-# Save the model
-with open('best_heart_model.pkl', 'wb') as f:
-    pickle.dump(pipeline, f)
 
-print("✅ Model saved as best_heart_model.pkl")
+if __name__ == '__main__':
+    main()
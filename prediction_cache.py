@@ -0,0 +1,295 @@
+"""
+Memoizing cache in front of the model.
+
+Apart from BMI, every model input is a flag or a small ordinal scale, so
+repeat assessments are common. Rows are canonicalized (BMI rounded to
+``bmi_precision`` decimals, -0.0 folded into 0.0) and packed into a float32
+byte string that keys a bounded LRU of predicted probabilities. The model
+always scores the canonical row, so a cached answer is exactly what the
+model would return for that key. This applies to batches, and to a
+disabled cache, too: a BMI of 31.46 is always scored as 31.5, so turning
+the cache off never changes an answer.
+
+Batches are canonicalized and packed as one matrix and looked up under a
+single lock. Batches larger than ``max_batch_lookup`` rows skip the cache
+altogether (rarely repeated, and the lookups would cost more than they
+save) and are scored canonicalized in one call.
+
+Each cache is tagged with a ``namespace`` naming the model it belongs to
+(the model registry gives every loaded version its own cache), and can
+also watch model files and clear itself when they change on disk. An
+optional SQLite store lets gunicorn workers on the same host share
+results; its rows carry the same tag so entries from another model are
+never served.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+from features import FEATURE_COLUMNS
+
+BMI_INDEX = FEATURE_COLUMNS.index('BMI')
+CACHE_HITS = metrics.CACHE_LOOKUPS.labels('hit')
+CACHE_MISSES = metrics.CACHE_LOOKUPS.labels('miss')
+CACHE_STORE_HITS = metrics.CACHE_LOOKUPS.labels('store_hit')
+
+
+class PredictionCache:
+    """Bounded LRU of model probabilities keyed on quantized feature rows"""
+
+    def __init__(self, maxsize=4096, bmi_precision=1, watch_paths=(), store=None,
+                 check_interval=1.0, namespace='', max_batch_lookup=1024):
+        self.maxsize = maxsize
+        self.bmi_precision = bmi_precision
+        self.max_batch_lookup = max_batch_lookup
+        self.watch_paths = [p for p in watch_paths if p]
+        self.namespace = namespace
+        self.store = store
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store_hits = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = self._model_signature()
+        self._next_check = time.monotonic() + check_interval
+        if self.store is not None:
+            self.store.prune(self._signature)
+
+    @classmethod
+    def from_env(cls, watch_paths=(), namespace=''):
+        """Build a cache configured by CARDIOCHECK_CACHE_* environment variables"""
+        db_path = os.environ.get('CARDIOCHECK_CACHE_DB')
+        return cls(
+            maxsize=int(os.environ.get('CARDIOCHECK_CACHE_SIZE', 4096)),
+            bmi_precision=int(os.environ.get('CARDIOCHECK_CACHE_BMI_PRECISION', 1)),
+            watch_paths=watch_paths,
+            store=SQLiteCacheStore(db_path) if db_path else None,
+            namespace=namespace,
+            max_batch_lookup=int(os.environ.get('CARDIOCHECK_CACHE_MAX_BATCH', 1024))
+        )
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def canonical_row(self, values):
+        """The row the model actually scores: BMI rounded, -0.0 folded to 0.0"""
+        row = [float(v) + 0.0 for v in values]
+        row[BMI_INDEX] = round(row[BMI_INDEX], self.bmi_precision) + 0.0
+        return row
+
+    def canonical_matrix(self, rows):
+        """``canonical_row`` of every row of a matrix, as a new float64 array"""
+        matrix = np.array(rows, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+        matrix[:, BMI_INDEX] = np.round(matrix[:, BMI_INDEX], self.bmi_precision)
+        matrix += 0.0
+        return matrix
+
+    def key(self, row):
+        """Packed encoding of a canonical row"""
+        return np.asarray(row, dtype=np.float32).tobytes()
+
+    def keys(self, matrix):
+        """``key`` of every row of a canonical matrix"""
+        packed = np.ascontiguousarray(matrix, dtype=np.float32).tobytes()
+        width = len(FEATURE_COLUMNS) * 4
+        return [packed[start:start + width] for start in range(0, len(packed), width)]
+
+    def get_or_compute(self, values, compute):
+        """Probability for one row, calling ``compute(row)`` on a miss"""
+        row = self.canonical_row(values)
+        if not self.enabled:
+            return float(compute(row))
+
+        key = self.key(row)
+        probability = self._lookup(key)
+        if probability is None:
+            probability = float(compute(row))
+            self._insert(key, probability)
+        return probability
+
+    def get_or_compute_many(self, rows, compute_batch):
+        """Probabilities for many rows, scoring all misses with one ``compute_batch`` call"""
+        canonical = self.canonical_matrix(rows)
+        if not self.enabled or len(canonical) > self.max_batch_lookup:
+            return np.asarray(compute_batch(canonical), dtype=np.float64).tolist()
+
+        keys = self.keys(canonical)
+        results = self._lookup_many(keys)
+        missing = [i for i, probability in enumerate(results) if probability is None]
+        if missing:
+            computed = compute_batch(canonical[missing])
+            for i, probability in zip(missing, computed):
+                results[i] = float(probability)
+            self._insert_many([(keys[i], results[i]) for i in missing])
+        return results
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'store_hits': self.store_hits,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, key):
+        self._check_model_files()
+        with self._lock:
+            probability = self._entries.get(key)
+            if probability is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_HITS.inc()
+                return probability
+            self.misses += 1
+            CACHE_MISSES.inc()
+        if self.store is not None:
+            probability = self.store.get(key, self._signature)
+            if probability is not None:
+                with self._lock:
+                    self.store_hits += 1
+                CACHE_STORE_HITS.inc()
+                self._insert(key, probability, persist=False)
+        return probability
+
+    def _lookup_many(self, keys):
+        """``_lookup`` of many keys under one lock"""
+        self._check_model_files()
+        with self._lock:
+            entries = self._entries
+            results = [entries.get(key) for key in keys]
+            hits = 0
+            for key, probability in zip(keys, results):
+                if probability is not None:
+                    entries.move_to_end(key)
+                    hits += 1
+            self.hits += hits
+            self.misses += len(keys) - hits
+        CACHE_HITS.inc(hits)
+        CACHE_MISSES.inc(len(keys) - hits)
+        if self.store is not None:
+            store_hits = []
+            for i, key in enumerate(keys):
+                if results[i] is None:
+                    results[i] = self.store.get(key, self._signature)
+                    if results[i] is not None:
+                        store_hits.append((key, results[i]))
+            if store_hits:
+                with self._lock:
+                    self.store_hits += len(store_hits)
+                CACHE_STORE_HITS.inc(len(store_hits))
+                self._insert_many(store_hits, persist=False)
+        return results
+
+    def _insert_many(self, items, persist=True):
+        with self._lock:
+            for key, probability in items:
+                self._entries[key] = probability
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if persist and self.store is not None:
+            for key, probability in items:
+                self.store.put(key, self._signature, probability)
+
+    def _insert(self, key, probability, persist=True):
+        with self._lock:
+            self._entries[key] = probability
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if persist and self.store is not None:
+            self.store.put(key, self._signature, probability)
+
+    def _check_model_files(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = self._model_signature()
+        if signature != self._signature:
+            self._signature = signature
+            self.invalidations += 1
+            self.clear()
+            if self.store is not None:
+                self.store.prune(signature)
+
+    def _model_signature(self):
+        parts = [self.namespace]
+        for path in self.watch_paths:
+            try:
+                st = os.stat(path)
+                parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+            except OSError:
+                parts.append(f"{path}:missing")
+        return '|'.join(parts)
+
+
+class SQLiteCacheStore:
+    """Cross-worker backing store for PredictionCache on the local disk"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS predictions ('
+            ' key BLOB NOT NULL, model TEXT NOT NULL, probability REAL NOT NULL,'
+            ' PRIMARY KEY (key, model)) WITHOUT ROWID'
+        )
+        conn.commit()
+
+    def get(self, key, model):
+        row = self._connection().execute(
+            'SELECT probability FROM predictions WHERE key = ? AND model = ?', (key, model)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, model, probability):
+        conn = self._connection()
+        try:
+            conn.execute('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)',
+                         (key, model, probability))
+            conn.commit()
+        except sqlite3.OperationalError:
+            # Another worker holds the write lock; the entry is only an optimization
+            conn.rollback()
+
+    def prune(self, model):
+        """Drop entries written for any other model version"""
+        conn = self._connection()
+        try:
+            conn.execute('DELETE FROM predictions WHERE model != ?', (model,))
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=0.05)
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,299 @@
+"""
+Bulk offline scoring of patient files.
+
+    python score_file.py patients.csv scores.csv [--chunk-rows 50000] [--workers 4]
+                         [--explain [approx]]
+
+Reads CSV, NDJSON/JSONL or Parquet input in fixed-size chunks. Each row is
+mapped to model features the same way as the assessment form in app.py,
+using the lowercase form field names (or the BRFSS column names of the
+training data). Every chunk is scored with one vectorized model call and
+its results are appended to the CSV or NDJSON output straight away, so
+memory is bounded by the chunk size times the chunks in flight. With
+``--workers N`` chunks are scored by a pool of N processes while the main
+process keeps reading and writing in order.
+
+Rows with invalid values get an ``error`` and no probability; they never
+stop the run. Parquet input needs pyarrow.
+
+With ``--explain`` every row also gets the model's TreeSHAP contribution
+of each feature (see explanations.py): a ``contrib_<Column>`` column per
+feature plus ``contrib_base`` in CSV, or ``contributions`` and
+``base_value`` in NDJSON. Each chunk is explained with one vectorized
+call; ``--explain approx`` trades exact SHAP values for speed.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, FEATURE_SCHEMA, FORM_FIELDS, extract_feature_matrix
+from explanations import Explainer
+from inference import DECISION_THRESHOLD
+from model_loader import ENGINES, default_model_path, load_model
+
+INPUT_FORMATS = ('csv', 'ndjson', 'parquet')
+OUTPUT_FORMATS = ('csv', 'ndjson')
+
+# BRFSS training-data column -> form field (Stroke has no form field)
+BRFSS_FIELDS = {feature.column: feature.field for feature in FEATURE_SCHEMA if feature.field}
+
+_predictor = None
+_explainer = None
+
+
+def detect_format(path, choices):
+    """File format from the extension: .csv, .ndjson/.jsonl/.json or .parquet/.pq"""
+    extension = os.path.splitext(path)[1].lower()
+    fmt = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson',
+           '.parquet': 'parquet', '.pq': 'parquet'}.get(extension)
+    if fmt not in choices:
+        raise ValueError(f"Cannot tell the format of {path!r}; pass one of {choices}")
+    return fmt
+
+
+def read_chunks(path, fmt, chunk_rows, id_column):
+    """Yield ``(columns, n_rows, row_errors)`` chunks of the input file"""
+    wanted = {field for field, _ in FORM_FIELDS if field} | set(BRFSS_FIELDS) | {id_column}
+    if fmt == 'csv':
+        return _csv_chunks(path, chunk_rows)
+    if fmt == 'ndjson':
+        return _ndjson_chunks(path, chunk_rows, wanted)
+    return _parquet_chunks(path, chunk_rows, wanted)
+
+
+def _csv_chunks(path, chunk_rows):
+    import pandas as pd
+
+    # Only empty cells count as missing; text such as 'nan' or 'NA' is reported as invalid
+    reader = pd.read_csv(path, chunksize=chunk_rows, keep_default_na=False, na_values=[''],
+                         low_memory=False)
+    for frame in reader:
+        yield {name: frame[name].to_numpy() for name in frame.columns}, len(frame), {}
+
+
+def _ndjson_chunks(path, chunk_rows, wanted):
+    def chunk(records, errors):
+        present = set().union(*records) & wanted
+        columns = {key: [record.get(key) for record in records] for key in present}
+        return columns, len(records), errors
+
+    with open(path) as f:
+        records, errors = [], {}
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('expected a JSON object')
+            except ValueError as e:
+                errors[len(records)] = f"line {line_no}: {e}"
+                record = {}
+            records.append(record)
+            if len(records) == chunk_rows:
+                yield chunk(records, errors)
+                records, errors = [], {}
+        if records:
+            yield chunk(records, errors)
+
+
+def _parquet_chunks(path, chunk_rows, wanted):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet input needs pyarrow: pip install pyarrow")
+    parquet = pq.ParquetFile(path)
+    columns = [name for name in parquet.schema_arrow.names if name in wanted]
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield batch.to_pydict(), batch.num_rows, {}
+
+
+def score_chunk(columns, n_rows, row_errors, id_column, predictor=None, explainer=None):
+    """Score one chunk; returns (ids, probabilities with NaN for failed rows, errors, contributions).
+
+    ``contributions`` is None unless there is an explainer, else
+    ``(per-feature contributions, base values)`` with NaN for failed rows.
+    """
+    predictor = predictor or _predictor
+    explainer = explainer or _explainer
+    # Form field names win over BRFSS names if a file has both
+    fields = {BRFSS_FIELDS[name]: values for name, values in columns.items() if name in BRFSS_FIELDS}
+    fields.update((name, values) for name, values in columns.items() if name not in BRFSS_FIELDS)
+    matrix, errors = extract_feature_matrix(fields, n_rows)
+    for i, message in row_errors.items():
+        errors.setdefault(i, message)
+
+    probabilities = np.full(n_rows, np.nan)
+    valid = np.ones(n_rows, dtype=bool)
+    valid[list(errors)] = False
+    if valid.any():
+        probabilities[valid] = predictor.predict_proba(matrix[valid])
+    contributions = None
+    if explainer is not None:
+        contributions = (np.full((n_rows, len(FEATURE_COLUMNS)), np.nan), np.full(n_rows, np.nan))
+        if valid.any():
+            contributions[0][valid], contributions[1][valid] = explainer.explain_matrix(matrix[valid])
+    ids = columns.get(id_column)
+    if isinstance(ids, np.ndarray):
+        ids = ids.tolist()
+    return ids, probabilities, errors, contributions
+
+
+def _init_worker(model_path, engine, explain):
+    global _predictor, _explainer
+    _predictor = load_model(model_path, engine=engine)
+    _explainer = Explainer.load(model_path, explain == 'approx') if explain else None
+
+
+class ResultWriter:
+    """Appends scored chunks to a CSV or NDJSON output"""
+
+    def __init__(self, path, fmt, explain=False):
+        self.fmt = fmt
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='')
+        self._csv = csv.writer(self.file) if fmt == 'csv' else None
+        if self._csv is not None:
+            header = ['row', 'id', 'probability', 'prediction', 'error']
+            if explain:
+                header += [f'contrib_{column}' for column in FEATURE_COLUMNS] + ['contrib_base']
+            self._csv.writerow(header)
+
+    def write(self, start, ids, probabilities, errors, contributions=None):
+        n_rows = len(probabilities)
+        predictions = (probabilities > DECISION_THRESHOLD).astype(int).tolist()
+        probabilities = probabilities.tolist()
+        ids = ids if ids is not None else [None] * n_rows
+        if contributions is not None:
+            contributions = np.column_stack(contributions).tolist()
+        if self._csv is not None:
+            rows = [[start + i, '' if ids[i] is None else ids[i], probabilities[i], predictions[i], '']
+                    for i in range(n_rows)]
+            if contributions is not None:
+                for row, values in zip(rows, contributions):
+                    row.extend(values)
+            for i, error in errors.items():
+                rows[i][2:] = ['', '', error] + [''] * (len(rows[i]) - 5)
+            self._csv.writerows(rows)
+            return
+
+        lines = []
+        for i in range(n_rows):
+            result = {'row': start + i}
+            if ids[i] is not None:
+                result['id'] = ids[i]
+            if i in errors:
+                result['error'] = errors[i]
+            else:
+                result['probability'] = probabilities[i]
+                result['prediction'] = predictions[i]
+                if contributions is not None:
+                    result['contributions'] = dict(zip(FEATURE_COLUMNS, contributions[i]))
+                    result['base_value'] = contributions[i][-1]
+            lines.append(json.dumps(result))
+        self.file.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+def score_file(input_path, output_path, model_path=None, engine='fast',
+               input_format=None, output_format=None, chunk_rows=50000, workers=0,
+               id_column='id', progress=None, explain=None):
+    """Score ``input_path`` into ``output_path``; returns (rows, errors, seconds).
+
+    ``explain`` ('exact' or 'approx') adds each row's per-feature contributions.
+    """
+    model_path = model_path or default_model_path()
+    input_format = input_format or detect_format(input_path, INPUT_FORMATS)
+    output_format = output_format or ('csv' if output_path == '-' else
+                                      detect_format(output_path, OUTPUT_FORMATS))
+    chunks = read_chunks(input_path, input_format, chunk_rows, id_column)
+    writer = ResultWriter(output_path, output_format, explain)
+    started = time.perf_counter()
+    rows = errors = 0
+
+    def write(start, result):
+        nonlocal rows, errors
+        ids, probabilities, chunk_errors, contributions = result
+        writer.write(start, ids, probabilities, chunk_errors, contributions)
+        rows += len(probabilities)
+        errors += len(chunk_errors)
+        if progress:
+            progress(rows, time.perf_counter() - started)
+
+    try:
+        if workers <= 0:
+            predictor = load_model(model_path, engine=engine)
+            explainer = Explainer.load(model_path, explain == 'approx') if explain else None
+            start = 0
+            for columns, n_rows, row_errors in chunks:
+                write(start, score_chunk(columns, n_rows, row_errors, id_column, predictor, explainer))
+                start += n_rows
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(model_path, engine, explain)) as pool:
+                # A bounded window of chunks in flight keeps memory flat and output ordered
+                in_flight = deque()
+                start = 0
+                for columns, n_rows, row_errors in chunks:
+                    in_flight.append((start, pool.submit(score_chunk, columns, n_rows,
+                                                         row_errors, id_column)))
+                    start += n_rows
+                    if len(in_flight) >= 2 * workers:
+                        done_start, future = in_flight.popleft()
+                        write(done_start, future.result())
+                while in_flight:
+                    done_start, future = in_flight.popleft()
+                    write(done_start, future.result())
+    finally:
+        writer.close()
+    return rows, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV, NDJSON or Parquet file of patients")
+    parser.add_argument('input')
+    parser.add_argument('output', help="CSV or NDJSON results file, or - for CSV on stdout")
+    parser.add_argument('--model', default=default_model_path())
+    # xgboost's own predictor is the fastest engine for large batches
+    parser.add_argument('--engine', choices=ENGINES, default='fast')
+    parser.add_argument('--input-format', choices=INPUT_FORMATS)
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS)
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='scoring processes (0 scores in the main process)')
+    parser.add_argument('--id-column', default='id', help='input column copied to the output')
+    parser.add_argument('--explain', nargs='?', const='exact', choices=('exact', 'approx'),
+                        help="add each feature's TreeSHAP contribution to every row")
+    args = parser.parse_args()
+
+    last_report = [0.0]
+
+    def progress(rows, elapsed):
+        if elapsed - last_report[0] >= 5:
+            last_report[0] = elapsed
+            print(f"⏳ {rows:,} rows, {rows / elapsed:,.0f} rows/s", file=sys.stderr)
+
+    rows, errors, elapsed = score_file(
+        args.input, args.output, model_path=args.model, engine=args.engine,
+        input_format=args.input_format, output_format=args.output_format,
+        chunk_rows=args.chunk_rows, workers=args.workers, id_column=args.id_column,
+        progress=progress, explain=args.explain)
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"✅ Scored {rows:,} rows ({errors:,} errors) in {elapsed:.1f}s, {rate:,.0f} rows/s",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
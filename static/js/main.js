@@ -630,7 +630,40 @@ function showResultsSection() {
     document.getElementById('results-section').style.display = 'block';
 }
 
+// One request per dashboard view: /api/assessment returns metrics, risk
+// factors, timeline and community stats together
+let assessmentRequest = null;
+// The last response and its ETag; the answers are POSTed so they stay out of
+// URLs, and browsers do not cache POST responses, so it is revalidated here
+let lastAssessment = null;
+
+function fetchAssessment() {
+    if (!assessmentRequest) {
+        const formData = new FormData(document.getElementById('assessment-form'));
+        const body = JSON.stringify(Object.fromEntries(formData.entries()));
+        const headers = { 'Content-Type': 'application/json' };
+        if (lastAssessment && lastAssessment.body === body) {
+            headers['If-None-Match'] = lastAssessment.etag;
+        }
+        assessmentRequest = fetch('/api/assessment', { method: 'POST', headers, body, cache: 'no-store' })
+            .then(response => {
+                if (response.status === 304 && lastAssessment) {
+                    return lastAssessment.data;
+                }
+                return response.json().then(data => {
+                    const etag = response.headers.get('ETag');
+                    lastAssessment = response.ok && etag ? { body, etag, data } : null;
+                    return data;
+                });
+            });
+    }
+    return assessmentRequest;
+}
+
 function initializeAnalyticsDashboard() {
+    // Answers may have changed since the dashboard was last shown
+    assessmentRequest = null;
+    
     // Show loading state first
     showLoadingStateForMetrics();
     
@@ -672,18 +705,12 @@ function updateHealthMetrics() {
         data[key] = value;
     }
     
-    // Call API to get health metrics
-    fetch('/api/health-metrics', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(data)
-    })
-    .then(response => response.json())
-    .then(result => {
-        if (result.error) {
-            console.error('Error calculating metrics:', result.error);
+    // Health metrics come from the shared assessment response
+    fetchAssessment()
+    .then(assessment => {
+        const result = assessment.metrics;
+        if (assessment.error) {
+            console.error('Error calculating metrics:', assessment.error);
             // Fallback to calculate from form data
             updateHealthMetricsFromForm(data);
             return;
@@ -874,29 +901,16 @@ function createRiskMatrix() {
     // Show loading state
     riskMatrix.innerHTML = '<div class="loading-spinner"><i class="fas fa-spinner fa-spin"></i> Calculating risk factors...</div>';
     
-    const formData = new FormData(document.getElementById('assessment-form'));
-    const data = {};
-    for (let [key, value] of formData.entries()) {
-        data[key] = value;
-    }
-    
-    // Call API to get risk factors
-    fetch('/api/risk-factors', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(data)
-    })
-    .then(response => response.json())
-    .then(result => {
-        if (result.error) {
-            console.error('Error calculating risk factors:', result.error);
+    // Risk factors come from the shared assessment response
+    fetchAssessment()
+    .then(assessment => {
+        if (assessment.error) {
+            console.error('Error calculating risk factors:', assessment.error);
             createRiskMatrixDemo();
             return;
         }
         
-        const riskFactors = result.risk_factors;
+        const riskFactors = assessment.risk_factors;
         const iconMap = {
             'Age': 'fas fa-calendar-alt',
             'Blood Pressure': 'fas fa-thermometer-half',
@@ -917,6 +931,7 @@ function createRiskMatrix() {
                 <p class="risk-factor-value">Value: ${factor.value}</p>
             </div>
         `).join('');
+        renderModelFactors(assessment.explanation);
         
         console.log('Risk matrix created successfully');
     })
@@ -926,6 +941,38 @@ function createRiskMatrix() {
     });
 }
 
+// The features that moved this prediction the most, from the model's own
+// per-feature contributions (log-odds; positive raises the risk)
+function renderModelFactors(explanation, count = 5) {
+    const container = document.getElementById('model-factors');
+    if (!container) {
+        return;
+    }
+    if (!explanation) {
+        container.innerHTML = '';
+        return;
+    }
+
+    const factors = explanation.contributions.slice(0, count);
+    const largest = Math.max(...factors.map(factor => Math.abs(factor.contribution)), 1e-9);
+    container.innerHTML = `
+        <h5 class="mb-3"><i class="fas fa-scale-balanced me-2"></i>What drove this prediction</h5>
+        ${factors.map(factor => {
+            const raises = factor.contribution > 0;
+            const width = Math.round(100 * Math.abs(factor.contribution) / largest);
+            return `
+                <div class="d-flex align-items-center mb-2">
+                    <span class="me-3" style="min-width: 9rem">${factor.feature}</span>
+                    <div class="progress flex-grow-1" style="height: 0.6rem">
+                        <div class="progress-bar ${raises ? 'bg-danger' : 'bg-success'}" style="width: ${width}%"></div>
+                    </div>
+                    <small class="ms-3 text-muted" style="min-width: 6rem">${raises ? 'raises' : 'lowers'} risk</small>
+                </div>
+            `;
+        }).join('')}
+    `;
+}
+
 function createRiskMatrixDemo() {
     // Fallback demo risk matrix
     const riskMatrix = document.getElementById('risk-matrix');
@@ -1037,11 +1084,13 @@ function createHealthJourneyChart() {
     const ctx = document.getElementById('health-journey-chart');
     if (!ctx) return;
     
-    // Fetch timeline data from API
-    fetch('/api/health-timeline')
-    .then(response => response.json())
-    .then(data => {
-        createTimelineChart(ctx, data);
+    // Timeline data comes from the shared assessment response
+    fetchAssessment()
+    .then(assessment => {
+        if (assessment.error) {
+            throw new Error(assessment.error);
+        }
+        createTimelineChart(ctx, assessment.timeline);
     })
     .catch(error => {
         console.error('Error fetching timeline data:', error);
@@ -1207,11 +1256,17 @@ function generateAIRecommendations() {
 function updateCommunityStats() {
     const communityContainer = document.getElementById('community-stats');
     
-    // Fetch community stats from API
-    fetch('/api/community-stats')
-    .then(response => response.json())
-    .then(data => {
-        const stats = data.community_stats;
+    // Community stats come from the shared assessment response
+    fetchAssessment()
+    .then(assessment => {
+        if (assessment.error) {
+            throw new Error(assessment.error);
+        }
+        const stats = assessment.community_stats;
+        if (!stats.length) {
+            communityContainer.innerHTML = '<p class="text-muted">Community statistics are not available yet.</p>';
+            return;
+        }
         communityContainer.innerHTML = stats.map(stat => `
             <div class="community-stat">
                 <div>
@@ -0,0 +1,128 @@
+"""
+Tests for the ASGI serving mode
+"""
+
+import asyncio
+import json
+import re
+import threading
+
+from asgi import CardioCheckASGI, wsgi_environ
+import app as webapp
+import metrics
+
+
+def call(application, method, path, body=b'', headers=()):
+    """Drive one HTTP request through an ASGI app and return (status, headers, body)"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+             'headers': [(b'content-type', b'application/json')] + list(headers),
+             'server': ('testserver', 80), 'client': ('127.0.0.1', 1234)}
+    asyncio.run(application(scope, receive, send))
+    start, response_body = sent[0], b''.join(m.get('body', b'') for m in sent[1:])
+    return start['status'], dict(start['headers']), response_body
+
+
+def requests_seen(route, status):
+    match = re.search(rf'^cardiocheck_request_seconds_count{{route="{route}",status="{status}"}} (\S+)$',
+                      metrics.render(), re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_native_endpoints_match_flask():
+    application = CardioCheckASGI(webapp.app)
+    client = webapp.app.test_client()
+    payload = {'age': 58, 'height_feet': 5, 'height_inches': 10, 'weight': 210,
+               'highbp': 1, 'smoker': 1, 'bmi': 30.1, 'genhlth': 4}
+
+    for path in ('/api/health-metrics', '/api/risk-factors'):
+        status, _, body = call(application, 'POST', path, json.dumps(payload).encode())
+        assert status == 200
+        assert json.loads(body) == client.post(path, json=payload).get_json()
+
+    status, _, body = call(application, 'POST', '/api/health-metrics', b'{"age": "old"}')
+    assert status == 400
+    assert 'error' in json.loads(body)
+
+
+def test_native_endpoints_record_metrics_and_skip_disconnected_clients():
+    application = CardioCheckASGI(webapp.app)
+    before = requests_seen('get_risk_factors', 200)
+    call(application, 'POST', '/api/risk-factors', b'{"age": 40}')
+    assert requests_seen('get_risk_factors', 200) == before + 1
+
+    sent = []
+    messages = [{'type': 'http.request', 'body': b'{"age"', 'more_body': True},
+                {'type': 'http.disconnect'}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/risk-factors', 'headers': []}
+    asyncio.run(application(scope, receive, send))
+    assert sent == []
+
+
+def test_other_routes_are_delegated_to_flask():
+    application = CardioCheckASGI(webapp.app)
+    form = b'age=67&sex=1&highbp=1&highchol=1&bmi=34&smoker=1&genhlth=5'
+    status, headers, body = call(application, 'POST', '/', form,
+                                 [(b'content-type', b'application/x-www-form-urlencoded')])
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/html')
+    assert b'Risk' in body
+
+    status, _, body = call(application, 'POST', '/api/predict/batch', b'[{"age": 50}, {"bmi": "x"}]')
+    assert status == 200
+    assert json.loads(body)['scored'] == 1
+
+    # These run the model or read the assessment store, so they run on the pool
+    for path in ('/api/community-stats', '/api/health-timeline'):
+        status, _, body = call(application, 'GET', path)
+        assert status == 200
+        assert json.loads(body) == webapp.app.test_client().get(path).get_json()
+
+
+def test_repeated_headers_are_joined_like_a_wsgi_server():
+    scope = {'type': 'http', 'method': 'GET', 'path': '/', 'headers': [
+        (b'cookie', b'a=1'), (b'cookie', b'b=2'), (b'accept', b'text/html'), (b'accept', b'*/*')]}
+    environ = wsgi_environ(scope, b'')
+    assert environ['HTTP_COOKIE'] == 'a=1; b=2'
+    assert environ['HTTP_ACCEPT'] == 'text/html,*/*'
+
+
+def test_full_pool_rejects_with_retry_after():
+    release = threading.Event()
+
+    def slow_app(environ, start_response):
+        release.wait(5)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'done']
+
+    application = CardioCheckASGI(slow_app, threads=1, queue=1)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        blocked = [loop.run_in_executor(None, call, application, 'GET', '/slow') for _ in range(2)]
+        while application.in_flight < 2:
+            await asyncio.sleep(0.01)
+        rejected = await loop.run_in_executor(None, call, application, 'GET', '/slow')
+        release.set()
+        return rejected, await asyncio.gather(*blocked)
+
+    rejected, completed = asyncio.run(scenario())
+    assert rejected[0] == 503
+    assert rejected[1][b'retry-after'] == b'1'
+    assert [status for status, _, _ in completed] == [200, 200]
+    assert application.rejected == 1
@@ -0,0 +1,112 @@
+"""
+Tests for the persistent assessment store behind the health timeline
+"""
+
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+import app as webapp
+from assessment_store import AssessmentStore
+from features import FEATURE_COLUMNS, extract_features
+
+DAY = 86400.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AssessmentStore(str(tmp_path / 'assessments.db'), batch_size=64, flush_interval=0.05)
+
+
+def test_records_are_written_in_batches(store):
+    rows = np.arange(500 * len(FEATURE_COLUMNS), dtype=np.float64).reshape(500, -1)
+    for i, row in enumerate(rows):
+        assert store.record('u1', row, i / 1000, 0, model='abc', ts=1000.0 + i)
+    store.record('u2', rows[0], 0.9, 1, ts=1000.0)
+    assert store.flush()
+
+    stats = store.stats()
+    assert stats['written'] == 501 and stats['pending'] == 0 and stats['dropped'] == 0
+    assert stats['batches'] < 50
+
+    entries = store.timeline('u1', start=1100.0, end=1102.0)
+    assert [ts for ts, *_ in entries] == [1100.0, 1101.0, 1102.0]
+    np.testing.assert_array_equal(entries[1][3], rows[101])
+    assert entries[1][1:3] == (0.101, 1)
+
+
+def test_assessments_at_the_same_time_keep_their_own_features(store):
+    for value in (1.0, 2.0):
+        store.record('u1', [value] * len(FEATURE_COLUMNS), value / 10, 0, ts=5000.0)
+    assert store.flush()
+    entries = store.timeline('u1')
+    assert [entry[3][0] for entry in entries] == [1.0, 2.0]
+    assert [entry[1] for entry in entries] == [0.1, 0.2]
+
+
+def test_flush_gives_up_on_a_full_queue(tmp_path, monkeypatch):
+    store = AssessmentStore(str(tmp_path / 'data' / 'assessments.db'), max_queue=1)
+    monkeypatch.setattr(store, '_ensure_writer', lambda: None)
+    store._writer_pid = os.getpid()
+    assert store.record('u1', [0.0], 0.5, 0)
+    assert not store.flush(timeout=0.05)
+
+
+def test_long_histories_are_downsampled(store):
+    start = 1_600_000_000.0
+    days = 3 * 365
+    probabilities = np.linspace(0.1, 0.9, days)
+    for i, probability in enumerate(probabilities):
+        store.record('u1', [float(i)] * len(FEATURE_COLUMNS), probability, 0, ts=start + i * DAY)
+    store.flush()
+
+    entries = store.timeline('u1', max_points=12)
+    assert len(entries) == 12
+    assert sum(n for _, _, n, _ in entries) == days
+    # Each bucket averages its assessments and reports the latest one's time and features
+    first_n = entries[0][2]
+    assert entries[0][1] == pytest.approx(probabilities[:first_n].mean())
+    assert entries[0][0] == start + (first_n - 1) * DAY
+    assert entries[0][3][0] == first_n - 1
+    assert entries[-1][0] == start + (days - 1) * DAY
+
+    plan = sqlite3.connect(store.path).execute(
+        'EXPLAIN QUERY PLAN SELECT MAX(ts) FROM assessments WHERE user = ? AND ts >= ?', ('u1', 0)
+    ).fetchall()
+    assert 'assessments_user_ts' in str(plan)
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+    store = AssessmentStore(str(tmp_path / 'assessments.db'), max_queue=2)
+    monkeypatch.setattr(store, '_ensure_writer', lambda: None)
+    assert store.record('u1', [0.0], 0.5, 0)
+    assert store.record('u1', [0.0], 0.5, 0)
+    assert not store.record('u1', [0.0], 0.5, 0)
+    assert store.stats()['dropped'] == 1
+
+
+def test_form_predictions_build_the_timeline(store, monkeypatch):
+    monkeypatch.setattr(webapp, 'assessment_store', store)
+    client = webapp.app.test_client()
+    assert client.get('/api/health-timeline').get_json()['labels'] == []
+
+    form = {'age': 61, 'bmi': 33, 'highbp': 1, 'physactivity': 0}
+    response = client.post('/', data=form)
+    cookie = response.headers['Set-Cookie']
+    assert cookie.startswith(webapp.USER_COOKIE + '=') and 'HttpOnly' in cookie
+    client.post('/', data=dict(form, physactivity=1))
+    assert 'Set-Cookie' not in client.post('/', data=form).headers
+    store.flush()
+
+    timeline = client.get('/api/health-timeline').get_json()
+    assert timeline['assessments'] == [1, 1, 1]
+    expected = webapp.model_registry.current.predict_proba_one(extract_features(form))
+    assert timeline['risk_scores'][0] == round(expected * 100, 1)
+    assert timeline['fitness_scores'][0] < timeline['fitness_scores'][1]
+
+    assert client.get('/api/health-timeline?points=1').get_json()['assessments'] == [3]
+    assert client.get('/api/health-timeline?points=x').status_code == 400
+    assessment = client.get('/api/assessment', query_string=form).get_json()
+    assert assessment['timeline'] == timeline
@@ -0,0 +1,112 @@
+"""
+Tests for the cohort statistics behind /api/community-stats
+"""
+
+import numpy as np
+import pytest
+
+import app as webapp
+from community_stats import (MIN_COHORT_ROWS, POPULATION, CommunityStats, age_category,
+                             build_stats, cohort_features, ordinal, stats_paths)
+from features import FEATURE_COLUMNS, extract_features
+
+
+@pytest.fixture(scope='module')
+def population():
+    rng = np.random.default_rng(3)
+    n = 20000
+    columns = {
+        'Age': rng.integers(1, 14, n).astype(np.float64),
+        'BMI': rng.uniform(15, 45, n).round(1),
+        'Sex': rng.integers(0, 2, n).astype(np.float64),
+        'PhysActivity': rng.integers(0, 2, n).astype(np.float64)
+    }
+    risk = np.clip(columns['Age'] / 20 + rng.normal(0, 0.1, n), 0, 1)
+    target = rng.uniform(size=n) < risk
+    return columns, risk, target
+
+
+@pytest.fixture(scope='module')
+def stats(population, tmp_path_factory):
+    columns, risk, target = population
+    array_path, manifest_path = stats_paths(str(tmp_path_factory.mktemp('stats') / 'model.bundle'))
+    build_stats(risk, target, columns, array_path, manifest_path, source_sha256='abc')
+    return CommunityStats.load(array_path, manifest_path)
+
+
+def test_age_in_years_maps_to_brfss_categories():
+    assert age_category([18, 24, 25, 44, 45, 79, 80, 97]).tolist() == [1, 1, 2, 5, 6, 12, 13, 13]
+    # Values below 18 are already categories, as in the dataset
+    assert age_category([1, 7, 13]).tolist() == [1, 7, 13]
+    row = cohort_features(extract_features({'age': 52}))[0]
+    assert row[FEATURE_COLUMNS.index('Age')] == 7
+
+
+def test_cohorts_match_the_raw_data(population, stats):
+    columns, risk, target = population
+    row = extract_features({'age': 47, 'bmi': 31, 'sex': 1, 'physactivity': 0})
+    user_risk = 0.3
+    cards = {card['label']: card for card in stats.describe(row, user_risk)}
+
+    in_age = columns['Age'] == 6
+    age_card = cards['Your Age Group Average Risk']
+    assert age_card['cohort'] == '45-49'
+    assert age_card['cohort_size'] == in_age.sum()
+    assert age_card['prevalence'] == pytest.approx(target[in_age].mean())
+    assert age_card['value'] == f"{risk[in_age].mean() * 100:.0f}%"
+
+    peers = in_age & (columns['Sex'] == 1) & (columns['BMI'] >= 30)
+    peer_card = cards['People Like You']
+    assert peer_card['cohort'] == 'Male, 45-49, Obese'
+    assert peer_card['cohort_size'] == peers.sum()
+    # The sketch's interpolated percentile is within a point of the exact one
+    exact = (risk[peers] < user_risk).mean() * 100
+    assert peer_card['risk_percentile'] == pytest.approx(exact, abs=1)
+    assert peer_card['better'] == (exact < 50)
+
+    assert cards['Exercise Habits Comparison']['cohort'] == 'Inactive'
+    assert cards['Exercise Habits Comparison']['cohort_size'] == (columns['PhysActivity'] == 0).sum()
+
+
+def test_small_cohorts_answer_with_everyone(population, tmp_path):
+    columns, risk, target = population
+    n = MIN_COHORT_ROWS * 2
+    sparse = {name: values[:n] for name, values in columns.items()}
+    sparse['Age'] = np.full(n, 13.0)
+    sparse['Age'][0] = 1
+    paths = stats_paths(str(tmp_path / 'model.bundle'))
+    build_stats(risk[:n], target[:n], sparse, *paths)
+
+    young, old = (CommunityStats.load(*paths).describe(extract_features({'age': age}), 0.5)[0]
+                  for age in (20, 85))
+    assert (young['cohort'], young['cohort_size']) == (POPULATION[1], n)
+    assert (old['cohort'], old['cohort_size']) == ('80+', n - 1)
+
+
+def test_percentile_labels():
+    assert [ordinal(n) for n in (1, 2, 3, 4, 11, 12, 13, 21, 53, 100)] == [
+        '1st', '2nd', '3rd', '4th', '11th', '12th', '13th', '21st', '53rd', '100th']
+
+
+def test_endpoint_uses_the_statistics_of_the_serving_model(stats, monkeypatch):
+    model = webapp.model_registry.current
+    client = webapp.app.test_client()
+
+    monkeypatch.setitem(webapp._community_stats, model.sha256, None)
+    assert client.get('/api/community-stats').get_json() == {'community_stats': []}
+
+    monkeypatch.setitem(webapp._community_stats, model.sha256, stats)
+    response = client.get('/api/community-stats?age=58&bmi=31&sex=1')
+    cards = response.get_json()['community_stats']
+    assert [card['label'] for card in cards] == [
+        'Your Age Group Average Risk', 'Similar BMI Range', 'People Like You',
+        'Exercise Habits Comparison']
+    assert cards[0]['cohort'] == '55-59'
+
+    assessment = client.get('/api/assessment?age=58&bmi=31&sex=1').get_json()
+    assert assessment['community_stats'] == cards
+    # The user is ranked by the row coded like the cohorts (Age as a category)
+    row = cohort_features(extract_features({'age': 58, 'bmi': 31, 'sex': 1}))[0].tolist()
+    expected = stats.describe(row, model.predict_proba_one(row))
+    assert [card['risk_percentile'] for card in cards] == [card['risk_percentile'] for card in expected]
+    assert client.get('/api/community-stats?age=old').status_code == 400
@@ -0,0 +1,68 @@
+"""
+Tests for the columnar dataset cache
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset import load_dataset
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5000
+    frame = pd.DataFrame({
+        'HeartDiseaseorAttack': rng.integers(0, 2, n).astype(float),
+        'HighBP': rng.integers(0, 2, n).astype(float),
+        'BMI': rng.integers(12, 90, n).astype(float),
+        'MentHlth': rng.integers(0, 31, n).astype(float),
+        'Age': rng.integers(1, 14, n).astype(float)
+    })
+    path = tmp_path / 'heart_health.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_cache_is_compact_lossless_and_memory_mapped(csv_path):
+    expected = pd.read_csv(csv_path)
+    dataset = load_dataset(csv_path)
+
+    assert {name: column.dtype.name for name, column in dataset.columns.items()} == {
+        'HeartDiseaseorAttack': 'uint8', 'HighBP': 'uint8', 'BMI': 'float32',
+        'MentHlth': 'uint8', 'Age': 'uint8'}
+    assert all(isinstance(column, np.memmap) for column in dataset.columns.values())
+    pd.testing.assert_frame_equal(dataset.frame(), expected, check_dtype=False)
+
+    X, y = dataset.split('HeartDiseaseorAttack')
+    assert list(X.columns) == ['HighBP', 'BMI', 'MentHlth', 'Age']
+    assert np.shares_memory(X['Age'].to_numpy(), dataset.columns['Age'])
+    assert y.tolist() == expected['HeartDiseaseorAttack'].tolist()
+
+    # What the sklearn pipeline is trained and evaluated on: exactly pd.read_csv's frame
+    pd.testing.assert_frame_equal(dataset.frame(dtype=np.float64), expected)
+
+
+def test_cache_follows_source_hash(csv_path):
+    first = load_dataset(csv_path)
+    manifest = os.path.join(os.path.splitext(csv_path)[0] + '.columns', 'manifest.json')
+    built_at = os.stat(manifest).st_mtime_ns
+
+    # Touching the CSV without changing it keeps the cache
+    os.utime(csv_path)
+    assert load_dataset(csv_path).source_sha256 == first.source_sha256
+    assert os.stat(manifest).st_mtime_ns == built_at
+
+    # New content rebuilds it, widening columns that no longer fit a byte
+    frame = pd.read_csv(csv_path)
+    frame.loc[0, 'MentHlth'] = 2.5
+    frame.loc[1, 'Age'] = 400
+    frame.to_csv(csv_path, index=False)
+    second = load_dataset(csv_path)
+    assert second.source_sha256 != first.source_sha256
+    assert second.columns['MentHlth'].dtype == np.float32
+    assert second.columns['Age'].dtype == np.int16
+    pd.testing.assert_frame_equal(second.frame(), frame, check_dtype=False)
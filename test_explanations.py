@@ -0,0 +1,129 @@
+"""
+Tests for the TreeSHAP explanations and their cache
+"""
+
+import csv
+import os
+
+import numpy as np
+import pytest
+
+import app as webapp
+from explanations import Explainer, ModelExplanations
+from features import FEATURE_COLUMNS, extract_features
+from model_loader import load_model
+from prediction_cache import PredictionCache
+from score_file import score_file
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(ROOT, 'best_heart_model.pkl')
+BUNDLE_PATH = os.path.join(ROOT, 'best_heart_model.bundle')
+
+RECORDS = [
+    {},
+    {'age': 67, 'sex': 1, 'highbp': 1, 'highchol': 1, 'bmi': 34.2, 'smoker': 1, 'genhlth': 5},
+    {'age': 24, 'bmi': 21.3, 'genhlth': 1, 'education': 6, 'income': 8}
+]
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return load_model(MODEL_PATH, engine='fast')
+
+
+@pytest.mark.parametrize('path', [MODEL_PATH, BUNDLE_PATH])
+def test_contributions_add_up_to_the_prediction(path, predictor):
+    rows = np.array([extract_features(record) for record in RECORDS])
+    contributions, base = Explainer.load(path).contributions(rows)
+    assert contributions.shape == (len(RECORDS), len(FEATURE_COLUMNS))
+    probabilities = 1 / (1 + np.exp(-(contributions.sum(axis=1) + base)))
+    np.testing.assert_allclose(probabilities, predictor.predict_proba(rows), atol=1e-5)
+
+    # Bulk mode gives the same answer whatever the chunking
+    bulk, bulk_base = Explainer.load(path).explain_matrix(np.repeat(rows, 5, axis=0), chunk_rows=4)
+    np.testing.assert_allclose(bulk, np.repeat(contributions, 5, axis=0), atol=1e-6)
+    np.testing.assert_allclose(bulk_base, np.repeat(base, 5), atol=1e-6)
+
+
+def test_explanations_are_cached_and_prefetched(predictor):
+    explanations = ModelExplanations(MODEL_PATH, '', PredictionCache(), predictor=predictor)
+    calls = []
+    compute = explanations._compute
+    explanations._compute = lambda rows: calls.append(len(rows)) or compute(rows)
+
+    rows = [extract_features(record) for record in RECORDS]
+    first = explanations.explain_many(rows + rows[:1])
+    assert calls == [4]
+    factors = first[1]['contributions']
+    assert [abs(f['contribution']) for f in factors] == sorted(
+        (abs(f['contribution']) for f in factors), reverse=True)
+    assert {f['feature'] for f in factors} == set(FEATURE_COLUMNS)
+    # BMI 34.2 and 34.21 are the same canonical row
+    nudged = list(rows[1])
+    nudged[FEATURE_COLUMNS.index('BMI')] += 0.01
+    assert explanations.explain(nudged) is first[1]
+    assert calls == [4]
+
+    other = extract_features({'age': 50, 'diabetes': 2})
+    explanations.prefetch(other)
+    explained = explanations.explain(other)
+    assert explained['contributions'] and calls == [4, 1]
+    assert explanations.stats()['prefetched'] == 1
+
+
+def test_stale_model_file_is_not_explained(tmp_path):
+    path = tmp_path / 'model.pkl'
+    path.write_bytes(open(MODEL_PATH, 'rb').read())
+    explanations = ModelExplanations(str(path), 'not-the-file-hash', PredictionCache())
+    assert explanations.explain(extract_features({})) is None
+    assert 'changed' in explanations.stats()['error']
+    explanations.prefetch(extract_features({}))
+    assert explanations.stats()['pending'] == 0
+
+
+def test_endpoints_return_explanations():
+    client = webapp.app.test_client()
+    model = webapp.model_registry.current
+    assessment = client.get('/api/assessment?age=58&bmi=31.5&highbp=1').get_json()
+    explanation = assessment['explanation']
+    probability = 1 / (1 + np.exp(-explanation['margin']))
+    assert probability == pytest.approx(assessment['prediction']['probability'], abs=1e-5)
+    assert explanation['margin'] == pytest.approx(
+        explanation['base_value'] + sum(f['contribution'] for f in explanation['contributions']))
+
+    # A form POST explains its row in the background for the dashboard's request
+    client.post('/', data={'age': 33, 'bmi': 24.8, 'smoker': 1})
+    row = extract_features({'age': 33, 'bmi': 24.8, 'smoker': 1})
+    key = model.cache.key(model.cache.canonical_row(row))
+    pending = model.explanations._pending.get(key)
+    if pending is not None:
+        pending.wait(5)
+    assert model.explanations._lookup(key, count=False) is not None
+
+    results = client.post('/api/predict/batch?explain=1', json=[{'age': 40}, {'age': 'x'}]).get_json()
+    assert results['results'][0]['explanation']['contributions']
+    assert 'explanation' not in results['results'][1]
+    plain = client.post('/api/predict/batch', json=[{'age': 40}]).get_json()
+    assert 'explanation' not in plain['results'][0]
+    too_many = [{'age': 40}] * (webapp.MAX_EXPLAIN_BATCH_SIZE + 1)
+    assert client.post('/api/predict/batch?explain=1', json=too_many).status_code == 413
+    assert client.post('/api/predict/batch', json=too_many).status_code == 200
+
+
+def test_score_file_adds_contribution_columns(tmp_path):
+    source = tmp_path / 'patients.csv'
+    with open(source, 'w', newline='') as f:
+        f.write('id,age,bmi,highbp\np1,61,33.1,1\np2,old,25,0\np3,30,22,0\n')
+    output = tmp_path / 'scores.csv'
+    score_file(str(source), str(output), model_path=MODEL_PATH, chunk_rows=2, explain='exact')
+
+    with open(output, newline='') as f:
+        results = list(csv.DictReader(f))
+    assert results[1]['error'] and results[1]['contrib_Age'] == ''
+    rows = np.array([extract_features({'age': 61, 'bmi': 33.1, 'highbp': 1}),
+                     extract_features({'age': 30, 'bmi': 22, 'highbp': 0})])
+    contributions, base = Explainer.load(MODEL_PATH).contributions(rows)
+    for result, expected, expected_base in zip([results[0], results[2]], contributions, base):
+        written = [float(result[f'contrib_{column}']) for column in FEATURE_COLUMNS]
+        np.testing.assert_allclose(written, expected, atol=1e-9)
+        assert float(result['contrib_base']) == pytest.approx(expected_base)
@@ -0,0 +1,86 @@
+"""
+Tests for the feature schema and the encoders generated from it
+"""
+
+import numpy as np
+import pytest
+
+import app as webapp
+from features import (FEATURE_COLUMNS, FEATURE_SCHEMA, FeatureError, encode_records,
+                      extract_feature_matrix, extract_features, parse_assessment)
+from pickle_generator import build_pipeline, feature_columns
+
+RECORDS = [
+    {'age': 61, 'bmi': '33.1', 'highbp': 1, 'genhlth': 5, 'diabetes': 2},
+    {},
+    {'age': 'old', 'genhlth': 7, 'highbp': 0.5, 'bmi': 22},
+    {'age': 45, 'bmi': float('inf'), 'sex': ''},
+    ['not', 'a', 'mapping'],
+    {'age': 3, 'income': 8, 'education': 1, 'menthlth': 30}
+]
+
+
+def test_missing_fields_take_the_schema_defaults():
+    assert extract_features({}) == [float(feature.default) for feature in FEATURE_SCHEMA]
+    assert extract_features({'bmi': '', 'age': None}) == extract_features({})
+    record = parse_assessment({'age': '52', 'weight': '180.5'})
+    assert (record.age, record.weight, record.height_feet) == (52, 180, 5)
+    assert record.features[FEATURE_COLUMNS.index('Age')] == 52
+
+
+def test_every_invalid_field_is_reported_at_once():
+    with pytest.raises(FeatureError) as excinfo:
+        extract_features(RECORDS[2])
+    assert [(e['field'], e['value']) for e in excinfo.value.errors] == [
+        ('highbp', 0.5), ('genhlth', 7), ('age', 'old')]
+    assert str(excinfo.value) == (
+        "highbp: expected a whole number, got 0.5; genhlth: expected 1 to 5, got 7; "
+        "age: expected a number, got 'old'")
+    # Still a ValueError for callers that only catch that
+    with pytest.raises(ValueError, match='bmi: expected a finite number'):
+        parse_assessment(RECORDS[3])
+
+
+def test_batch_encoders_match_the_row_encoder():
+    matrix, errors = encode_records(RECORDS)
+    for i, record in enumerate(RECORDS):
+        try:
+            row = extract_features(record)
+        except (FeatureError, AttributeError) as e:
+            assert np.isnan(matrix[i]).all()
+            if isinstance(e, FeatureError):
+                assert errors[i].errors == e.errors
+            continue
+        assert i not in errors
+        assert matrix[i].tolist() == row
+    assert sorted(errors) == [2, 3, 4]
+
+    dicts = [record for record in RECORDS if isinstance(record, dict)]
+    columns = {feature.field: [record.get(feature.field) for record in dicts]
+               for feature in FEATURE_SCHEMA if feature.field}
+    columnar, messages = extract_feature_matrix(columns, len(dicts))
+    assert messages == {2: str(errors[2]), 3: str(errors[3])}
+    assert np.array_equal(columnar, matrix[[0, 1, 2, 3, 5]], equal_nan=True)
+
+
+def test_endpoints_return_structured_errors():
+    client = webapp.app.test_client()
+    response = client.post('/api/risk-factors', json={'age': 'old', 'genhlth': 9})
+    assert response.status_code == 400
+    assert [e['field'] for e in response.get_json()['fields']] == ['genhlth', 'age']
+
+    results = client.post('/api/predict/batch', json=RECORDS).get_json()['results']
+    assert [r.get('error') is None for r in results] == [True, True, False, False, False, True]
+    assert results[2]['fields'] == encode_records(RECORDS)[1][2].errors
+    assert results[0]['probability'] == webapp.model_registry.current.predict_proba_one(
+        extract_features(RECORDS[0]))
+
+
+def test_training_uses_the_schema_columns():
+    scaled = build_pipeline().named_steps['preprocessor'].transformers[0][2]
+    assert scaled == [f.column for f in FEATURE_SCHEMA if f.scaled]
+
+    class Dataset:
+        columns = {name: None for name in FEATURE_COLUMNS if name != 'Income'}
+    with pytest.raises(ValueError, match='Income'):
+        feature_columns(Dataset)
@@ -99,5 +99,77 @@ def test_api_endpoints():
         print("✅ Data Export Functionality")
         print("✅ Responsive Mobile Design")
 
+def test_batch_prediction_endpoint():
+    """Batch scoring returns one result per row and isolates bad rows"""
+    rows = [
+        {'id': 'a', 'age': 62, 'highbp': 1, 'highchol': 1, 'bmi': 33, 'genhlth': 5},
+        {'id': 'b', 'age': 'not-a-number'},
+        {'id': 'c', 'age': 28, 'bmi': 22, 'genhlth': 1}
+    ]
+    with app.test_client() as client:
+        response = client.post('/api/predict/batch', json=rows)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['count'] == 3
+        assert data['scored'] == 2
+        assert [r['id'] for r in data['results']] == ['a', 'b', 'c']
+        assert 'age' in data['results'][1]['error']
+        for result in (data['results'][0], data['results'][2]):
+            assert 0.0 <= result['probability'] <= 1.0
+            assert result['prediction'] == int(result['probability'] > 0.5)
+
+        ndjson = '\n'.join(json.dumps(row) for row in rows)
+        response = client.post('/api/predict/batch', data=ndjson,
+                               content_type='application/x-ndjson')
+        assert response.status_code == 200
+        assert response.get_json()['results'] == data['results']
+
+def test_assessment_endpoint_matches_separate_endpoints():
+    """One /api/assessment call returns what the four dashboard calls did, with an ETag"""
+    answers = {'age': 58, 'bmi': 31.5, 'highbp': 1, 'highchol': 1, 'smoker': 1,
+               'physactivity': 0, 'diabetes': 2, 'genhlth': 4}
+    with app.test_client() as client:
+        response = client.get('/api/assessment', query_string=answers)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['metrics'] == client.post('/api/health-metrics', json=answers).get_json()
+        assert data['risk_factors'] == client.post('/api/risk-factors', json=answers).get_json()['risk_factors']
+        assert data['timeline'] == client.get('/api/health-timeline').get_json()
+        assert data['community_stats'] == client.get('/api/community-stats', query_string=answers).get_json()['community_stats']
+        assert data['prediction']['prediction'] == int(data['prediction']['probability'] > 0.5)
+
+        etag = response.headers['ETag']
+        assert client.post('/api/assessment', json=answers).headers['ETag'] == etag
+        revalidated = client.get('/api/assessment', query_string=answers,
+                                 headers={'If-None-Match': etag})
+        assert revalidated.status_code == 304
+        changed = client.get('/api/assessment', query_string=dict(answers, smoker=0),
+                             headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        # The dashboard POSTs and revalidates its own copy
+        assert client.post('/api/assessment', json=answers,
+                           headers={'If-None-Match': etag}).status_code == 304
+        assert client.post('/api/assessment', json=dict(answers, smoker=0),
+                           headers={'If-None-Match': etag}).status_code == 200
+
+        assert client.get('/api/assessment?bmi=heavy').status_code == 400
+
+def test_admin_model_endpoints_require_token(monkeypatch):
+    """Model admin endpoints are off without a token and check it when set"""
+    import app as app_module
+    with app.test_client() as client:
+        monkeypatch.setattr(app_module, 'ADMIN_TOKEN', None)
+        assert client.get('/admin/model').status_code == 404
+
+        monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+        assert client.get('/admin/model').status_code == 401
+        response = client.get('/admin/model', headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == 200
+        assert response.get_json()['current']['version'] >= 1
+
+        response = client.post('/admin/model/reload?wait=1',
+                               headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == 200
+
 if __name__ == '__main__':
     test_api_endpoints()
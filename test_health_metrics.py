@@ -0,0 +1,123 @@
+"""
+Parity tests: vectorized health-metric calculators vs the original scalar code
+"""
+
+import json
+import math
+
+import numpy as np
+import pytest
+
+import app
+from health_metrics import bmi_categories, cholesterol_levels, fitness_levels, heart_rate_zones
+
+
+# The if/elif implementations the vectorized versions replaced
+def reference_heart_rate_zone(age, current_hr):
+    max_hr = 220 - age
+    percentage = (current_hr / max_hr) * 100
+    if percentage < 50:
+        zone = 'Resting'
+    elif percentage < 60:
+        zone = 'Fat Burn'
+    elif percentage < 70:
+        zone = 'Aerobic'
+    elif percentage < 85:
+        zone = 'Anaerobic'
+    else:
+        zone = 'Red Line'
+    return {'zone': zone, 'percentage': min(percentage, 100), 'current_hr': current_hr, 'max_hr': max_hr}
+
+
+def reference_bmi_category(bmi):
+    if bmi < 18.5:
+        category, percentage = 'Underweight', 30
+    elif bmi < 25:
+        category, percentage = 'Normal', 85
+    elif bmi < 30:
+        category, percentage = 'Overweight', 50
+    else:
+        category, percentage = 'Obese', 20
+    return {'category': category, 'percentage': percentage, 'value': bmi}
+
+
+def reference_cholesterol_level(high_cholesterol):
+    if high_cholesterol:
+        return {'level': 'High Risk', 'percentage': 25}
+    return {'level': 'Normal', 'percentage': 80}
+
+
+def reference_fitness_level(age, physical_activity):
+    base_fitness = 60 if physical_activity else 30
+    age_factor = max(0, (50 - age) / 50 * 20)
+    total_fitness = min(95, base_fitness + age_factor)
+    if total_fitness >= 80:
+        level = 'Excellent'
+    elif total_fitness >= 65:
+        level = 'Good'
+    elif total_fitness >= 50:
+        level = 'Fair'
+    else:
+        level = 'Poor'
+    return {'level': level, 'percentage': total_fitness}
+
+
+def same(a, b):
+    """Equal values, treating NaN as equal to NaN"""
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return a == b
+
+
+def assert_columns_match(columns, expected_rows):
+    for i, expected in enumerate(expected_rows):
+        for key, value in expected.items():
+            actual = columns[key][i].item()
+            assert same(actual, value), (i, key, actual, value)
+
+
+rng = np.random.default_rng(7)
+AGES = np.concatenate([np.arange(0, 131), rng.uniform(0, 130, 2000), [np.nan]])
+BMIS = np.concatenate([[18.5, 25, 30, np.nextafter(18.5, 0), np.nextafter(25, 0),
+                        np.nextafter(30, 0), np.nan, -1, 0], rng.uniform(5, 80, 5000)])
+
+
+@pytest.mark.parametrize('current_hr', [0, 60, 85.5, 150, 200])
+def test_heart_rate_zones(current_hr):
+    ages = AGES[AGES != 220]
+    hr = np.full(len(ages), current_hr)
+    assert_columns_match(heart_rate_zones(ages, hr),
+                         [reference_heart_rate_zone(a, current_hr) for a in ages])
+    # Thresholds land exactly on the bin edges
+    edges = np.array([50.0, 60.0, 70.0, 85.0, 100.0])
+    assert_columns_match(heart_rate_zones(np.zeros(5), edges * 2.2),
+                         [reference_heart_rate_zone(0.0, hr) for hr in edges * 2.2])
+
+
+def test_bmi_categories():
+    assert_columns_match(bmi_categories(BMIS), [reference_bmi_category(b) for b in BMIS])
+
+
+def test_cholesterol_levels():
+    flags = np.array([0, 1, 2, -1, 0.5, np.nan])
+    assert_columns_match(cholesterol_levels(flags), [reference_cholesterol_level(f) for f in flags])
+
+
+@pytest.mark.parametrize('physical_activity', [0, 1])
+def test_fitness_levels(physical_activity):
+    activity = np.full(len(AGES), physical_activity)
+    assert_columns_match(fitness_levels(AGES, activity),
+                         [reference_fitness_level(a, physical_activity) for a in AGES])
+
+
+def test_scalar_wrappers_match_reference():
+    # Compared as JSON, so an int percentage that became a float shows up
+    same = lambda result, reference: json.dumps(result) == json.dumps(reference)
+    for age in (18, 35, 50, 64, 90):
+        assert same(app.calculate_heart_rate_zone(age, 130), reference_heart_rate_zone(age, 130))
+        for activity in (0, 1):
+            assert same(app.calculate_fitness_level(age, activity), reference_fitness_level(age, activity))
+    for bmi in (17.0, 18.5, 24.99, 29.9, 41.2):
+        assert same(app.calculate_bmi_category(bmi), reference_bmi_category(bmi))
+    for flag in (0, 1):
+        assert same(app.calculate_cholesterol_level(flag), reference_cholesterol_level(flag))
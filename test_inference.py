@@ -0,0 +1,62 @@
+"""
+Parity tests for the pandas-free inference path
+"""
+
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FEATURE_COLUMNS
+from inference import FastPredictor, PipelinePredictor, load_predictor
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(MODEL_PATH, 'rb') as f:
+            return pickle.load(f)
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(7)
+    n = 2000
+    rows = rng.integers(0, 2, size=(n, len(FEATURE_COLUMNS))).astype(np.float64)
+    rows[:, FEATURE_COLUMNS.index('BMI')] = rng.uniform(12, 60, n).round(1)
+    rows[:, FEATURE_COLUMNS.index('Stroke')] = 0
+    rows[:, FEATURE_COLUMNS.index('GenHlth')] = rng.integers(1, 6, n)
+    rows[:, FEATURE_COLUMNS.index('MentHlth')] = rng.integers(0, 31, n)
+    rows[:, FEATURE_COLUMNS.index('PhysHlth')] = rng.integers(0, 31, n)
+    rows[:, FEATURE_COLUMNS.index('Age')] = rng.integers(1, 14, n)
+    rows[:, FEATURE_COLUMNS.index('Education')] = rng.integers(1, 7, n)
+    rows[:, FEATURE_COLUMNS.index('Income')] = rng.integers(1, 9, n)
+    return rows
+
+
+def test_fast_predictor_matches_pipeline_bit_for_bit(pipeline, rows):
+    fast = FastPredictor.from_pipeline(pipeline)
+    df = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+    assert np.array_equal(fast.predict_proba(rows), pipeline.predict_proba(df)[:, 1])
+    assert np.array_equal(fast.predict(rows), pipeline.predict(df))
+
+
+def test_single_row_path_matches_batch_path(pipeline, rows):
+    fast = FastPredictor.from_pipeline(pipeline)
+    batch = fast.predict_proba(rows[:200])
+
+    for row, expected in zip(rows[:200], batch):
+        assert fast.predict_proba_one(list(row)) == expected
+        assert fast.predict_one(list(row)) == int(expected > 0.5)
+
+
+def test_load_predictor_falls_back_for_unsupported_pipelines(pipeline):
+    assert isinstance(load_predictor(pipeline), FastPredictor)
+    assert isinstance(load_predictor(object()), PipelinePredictor)
@@ -0,0 +1,95 @@
+"""
+Tests for the precomputed prediction lookup table
+"""
+
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pytest
+
+from export_trees import export_pipeline
+from features import FEATURE_COLUMNS
+from inference import FastPredictor
+from lookup_table import LookupTablePredictor, build_table
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
+
+# Keep the grid small: most features fixed, a few varied
+DOMAINS = {column: [0] for column in FEATURE_COLUMNS}
+DOMAINS.update({'HighBP': [0, 1], 'GenHlth': [1, 2, 3, 4, 5], 'Age': [20, 45, 70],
+                'Education': [4], 'Income': [5], 'CholCheck': [1]})
+BINS = {'BMI': ([25, 30], [22.0, 27.5, 35.0])}
+
+
+@pytest.fixture(scope='module')
+def fast():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(MODEL_PATH, 'rb') as f:
+            pipeline = pickle.load(f)
+    return pipeline, FastPredictor.from_pipeline(pipeline)
+
+
+@pytest.fixture(scope='module')
+def table(fast, tmp_path_factory):
+    pipeline, predictor = fast
+    directory = tmp_path_factory.mktemp('lut')
+    array_path, manifest_path = str(directory / 't.lut.npy'), str(directory / 't.lut.json')
+    build_table(predictor, export_pipeline(pipeline), array_path, manifest_path,
+                domains=DOMAINS, bins=BINS, chunk_rows=7)
+    return LookupTablePredictor.load(array_path, manifest_path, fallback=predictor)
+
+
+def grid_row(**values):
+    row = [float(DOMAINS[c][0]) for c in FEATURE_COLUMNS]
+    row[FEATURE_COLUMNS.index('BMI')] = 22.0
+    for column, value in values.items():
+        row[FEATURE_COLUMNS.index(column)] = value
+    return row
+
+
+def test_grid_cells_match_live_model(table, fast):
+    _, predictor = fast
+    rows = np.array([grid_row(HighBP=bp, GenHlth=g, Age=a, BMI=b)
+                     for bp in (0, 1) for g in range(1, 6) for a in (20, 45, 70)
+                     for b in (22.0, 27.5, 35.0)])
+    assert (table.cell_index(rows) >= 0).all()
+    np.testing.assert_allclose(table.predict_proba(rows), predictor.predict_proba(rows),
+                               atol=1 / 65535)
+
+
+def test_bmi_uses_bin_representative(table, fast):
+    _, predictor = fast
+    assert table.predict_proba_one(grid_row(BMI=33.3)) == \
+        table.predict_proba_one(grid_row(BMI=35.0))
+    assert table.predict_one(grid_row(BMI=33.3)) == predictor.predict_one(grid_row(BMI=35.0))
+
+
+def test_inputs_outside_grid_use_fallback(table, fast):
+    _, predictor = fast
+    rows = np.array([grid_row(Smoker=1), grid_row(BMI=np.nan), grid_row()])
+    index = table.cell_index(rows)
+    assert list(index[:2]) == [-1, -1] and index[2] >= 0
+    np.testing.assert_array_equal(table.predict_proba(rows)[:2], predictor.predict_proba(rows[:2]))
+
+
+def test_explanations_describe_the_binned_row_the_table_scored(table):
+    from explanations import ModelExplanations
+    from model_loader import file_sha256
+    from prediction_cache import PredictionCache
+
+    explanations = ModelExplanations(MODEL_PATH, file_sha256(MODEL_PATH), PredictionCache(),
+                                     predictor=table)
+    row = grid_row(HighBP=1, GenHlth=4, Age=70, BMI=31.4)
+    explanation = explanations.explain(row)
+    assert explanation['binned'] == {'BMI': 35.0}
+    bmi = next(f for f in explanation['contributions'] if f['feature'] == 'BMI')
+    assert bmi['value'] == 31.4
+    probability = 1 / (1 + np.exp(-explanation['margin']))
+    assert probability == pytest.approx(table.predict_proba_one(row), abs=1 / 65535)
+
+    # Rows outside the grid are scored, and explained, unchanged
+    outside = grid_row(HighChol=1, BMI=31.4)
+    assert explanations.explain(outside)['binned'] == {}
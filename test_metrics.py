@@ -0,0 +1,121 @@
+"""
+Tests for the request instrumentation and the /metrics endpoint
+"""
+
+import os
+import re
+import subprocess
+import sys
+import threading
+
+import metrics
+import app as webapp
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample(text, series):
+    """Value of one exposition line, e.g. ``name{a="b"}``"""
+    match = re.search(rf'^{re.escape(series)} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram('test_render_seconds', 'Test histogram', ('route',), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels('a"b').observe(value)
+    text = metrics.render()
+    assert '# TYPE test_render_seconds histogram' in text
+    assert sample(text, 'test_render_seconds_bucket{route="a\\"b",le="0.1"}') == 2
+    assert sample(text, 'test_render_seconds_bucket{route="a\\"b",le="1"}') == 3
+    assert sample(text, 'test_render_seconds_bucket{route="a\\"b",le="+Inf"}') == 4
+    assert sample(text, 'test_render_seconds_count{route="a\\"b"}') == 4
+    assert sample(text, 'test_render_seconds_sum{route="a\\"b"}') == 3.65
+
+
+def test_threads_never_lose_updates():
+    counter = metrics.Counter('test_threads_total', 'Test counter')
+
+    def work():
+        for _ in range(20000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sample(metrics.render(), 'test_threads_total') == 80000
+
+
+def test_exited_threads_hand_their_lane_on():
+    counter = metrics.Counter('test_lanes_total', 'Test counter')
+    counter.inc()
+    lanes = len(metrics._slots.lanes)
+    for _ in range(20):
+        thread = threading.Thread(target=counter.inc)
+        thread.start()
+        thread.join()
+    assert len(metrics._slots.lanes) <= lanes + 1
+    assert sample(metrics.render(), 'test_lanes_total') == 21
+
+
+def test_endpoint_reports_request_stages_and_inference():
+    client = webapp.app.test_client()
+    client.post('/', data={'age': 63, 'bmi': 27.4, 'highbp': 1})
+    client.post('/', data={'age': 63, 'bmi': 27.4, 'highbp': 1})
+    client.post('/api/predict/batch', json=[{'age': 40}, {'age': 41}, {'age': 42}])
+
+    response = client.get('/metrics')
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    for stage in ('parse', 'predict', 'render'):
+        assert sample(text, f'cardiocheck_stage_seconds_count{{route="index",stage="{stage}"}}') >= 2
+    assert sample(text, 'cardiocheck_request_seconds_count{route="index",status="200"}') >= 2
+    assert sample(text, 'cardiocheck_batch_rows_bucket{source="api",le="4"}') >= 1
+    assert sample(text, 'cardiocheck_prediction_cache_lookups_total{result="hit"}') >= 1
+    engine = type(webapp.model_registry.current.predictor).__name__
+    assert sample(text, f'cardiocheck_model_inference_seconds_count{{engine="{engine}",kind="batch"}}') >= 1
+    assert sample(text, f'cardiocheck_process_resident_memory_bytes{{pid="{os.getpid()}"}}') > 0
+
+
+WORKER = r'''
+import os, sys, threading
+import metrics
+metrics.Counter('test_worker_total', 'Per-process increments').inc(int(sys.argv[1]))
+metrics.RESIDENT_BYTES.set(123)
+# A short-lived thread records into a lane of its own
+thread = threading.Thread(target=metrics.Counter('test_worker_total', 'Per-process increments').inc)
+thread.start()
+thread.join()
+if sys.argv[2] == 'fork':
+    pid = os.fork()
+    if pid == 0:
+        metrics.Counter('test_worker_total', 'Per-process increments').inc(1000)
+        os._exit(0)
+    os.waitpid(pid, 0)
+print(metrics.render())
+'''
+
+
+def test_workers_are_aggregated_through_the_shared_directory(tmp_path):
+    env = dict(os.environ, CARDIOCHECK_METRICS_DIR=str(tmp_path), PYTHONPATH=ROOT)
+    run = lambda *args: subprocess.run([sys.executable, '-c', WORKER, *args], env=env, cwd=ROOT,
+                                       capture_output=True, text=True, check=True).stdout
+    run('5', 'plain')
+    text = run('7', 'fork')
+
+    # Counters of exited processes still count; gauges only for the live process
+    assert sample(text, 'test_worker_total') == 5 + 1 + 7 + 1 + 1000
+    gauges = re.findall(r'^cardiocheck_process_resident_memory_bytes\{pid="(\d+)"\}', text, re.M)
+    assert len(gauges) == 1
+
+    # One lane per thread recording at once; exited processes are folded into the totals and removed
+    lanes = list(tmp_path.glob('*.bin'))
+    pids = {int(path.name.split('-')[0]) for path in lanes}
+    assert len(pids) == 3 and len(lanes) == 5
+    for pid in pids:
+        metrics.mark_process_dead(pid, str(tmp_path))
+    assert not list(tmp_path.glob('*.bin')) and not list(tmp_path.glob('*.layout.json'))
+    text = run('2', 'plain')
+    assert sample(text, 'test_worker_total') == 5 + 1 + 7 + 1 + 1000 + 2 + 1
@@ -0,0 +1,70 @@
+"""
+Tests for the micro-batching prediction scheduler
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+class RecordingModel:
+    """predict_batch stand-in that returns row[0] / 100 and remembers batch sizes"""
+
+    def __init__(self, delay=None):
+        self.batch_sizes = []
+        self.release = delay
+
+    def predict_batch(self, rows):
+        if self.release is not None:
+            self.release.wait(5)
+        self.batch_sizes.append(len(rows))
+        return [row[0] / 100 for row in rows]
+
+
+def test_concurrent_rows_are_coalesced_and_dispatched_back():
+    model = RecordingModel()
+    batcher = MicroBatcher(model.predict_batch, max_batch_size=64, max_wait_us=50000)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda i: batcher.submit([i]), range(16)))
+
+    assert results == [i / 100 for i in range(16)]
+    assert sum(model.batch_sizes) == 16
+    assert len(model.batch_sizes) < 16
+    stats = batcher.stats()
+    assert stats['rows'] == 16 and stats['batches'] == len(model.batch_sizes)
+    assert sum(stats['queue_wait_histogram_us'].values()) == 16
+
+
+def test_batches_never_exceed_max_size():
+    release = threading.Event()
+    model = RecordingModel(delay=release)
+    batcher = MicroBatcher(model.predict_batch, max_batch_size=4, max_wait_us=1000000)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futures = [pool.submit(batcher.submit, [i]) for i in range(10)]
+        release.set()
+        assert [f.result() for f in futures] == [i / 100 for i in range(10)]
+    assert max(model.batch_sizes) <= 4
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def broken(rows):
+        raise ValueError('model exploded')
+
+    batcher = MicroBatcher(broken, max_batch_size=8, max_wait_us=1000)
+    with pytest.raises(ValueError, match='model exploded'):
+        batcher.submit([1])
+    # The flusher survives and keeps serving
+    batcher.predict_batch = RecordingModel().predict_batch
+    assert batcher.submit([50]) == 0.5
+
+
+def test_disabled_batcher_calls_model_directly():
+    model = RecordingModel()
+    batcher = MicroBatcher(model.predict_batch, max_batch_size=32, max_wait_us=0)
+    assert not batcher.enabled
+    assert batcher.submit([25]) == 0.25
+    assert model.batch_sizes == [1]
+    assert batcher.stats()['batches'] == 0
@@ -0,0 +1,94 @@
+"""
+Tests for the versioned model bundle format
+"""
+
+import json
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FEATURE_COLUMNS
+from inference import FastPredictor, PipelinePredictor
+from model_bundle import ModelBundle, migrate
+from model_loader import file_sha256, load_model
+from tree_evaluator import CompiledTreePredictor
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(MODEL_PATH, 'rb') as f:
+            return pickle.load(f)
+
+
+@pytest.fixture(scope='module')
+def bundle_path(tmp_path_factory):
+    return migrate(MODEL_PATH, str(tmp_path_factory.mktemp('bundle') / 'model.bundle'))
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(5)
+    rows = rng.integers(0, 2, size=(500, len(FEATURE_COLUMNS))).astype(np.float64)
+    rows[:, FEATURE_COLUMNS.index('BMI')] = rng.uniform(12, 60, len(rows)).round(1)
+    rows[:, FEATURE_COLUMNS.index('Age')] = rng.integers(1, 14, len(rows))
+    return rows
+
+
+def test_bundle_scores_exactly_like_the_pickle(pipeline, bundle_path, rows):
+    bundle = ModelBundle.open(bundle_path)
+    assert bundle.manifest['source_sha256'] == file_sha256(MODEL_PATH)
+    assert bundle.manifest['schema']['feature_columns'] == FEATURE_COLUMNS
+
+    expected = FastPredictor.from_pipeline(pipeline).predict_proba(rows)
+    np.testing.assert_array_equal(bundle.predictor().predict_proba(rows), expected)
+    np.testing.assert_allclose(bundle.compiled_predictor().predict_proba(rows), expected, atol=1e-6)
+
+    frame = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    np.testing.assert_array_equal(bundle.to_pipeline().predict_proba(frame),
+                                  pipeline.predict_proba(frame))
+
+
+def test_arrays_are_read_only_views_of_the_file(bundle_path):
+    bundle = ModelBundle.open(bundle_path)
+    mean = bundle.array('mean')
+    assert not mean.flags.writeable and not mean.flags.owndata
+    assert bundle._booster is None
+
+
+def test_loader_never_unpickles_a_bundle(bundle_path, rows, monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError('unpickled')
+    monkeypatch.setattr(pickle, 'load', refuse)
+    monkeypatch.setattr(pickle, 'loads', refuse)
+
+    assert isinstance(load_model(bundle_path), CompiledTreePredictor)
+    assert type(load_model(bundle_path, engine='fast')) is FastPredictor
+    assert isinstance(load_model(bundle_path, engine='pipeline'), PipelinePredictor)
+
+
+def test_rejects_other_files_and_future_versions(bundle_path, tmp_path):
+    with pytest.raises(ValueError, match='not a model bundle'):
+        ModelBundle.open(MODEL_PATH)
+
+    data = bytearray(open(bundle_path, 'rb').read())
+    marker = b'"format_version": 1'
+    data[data.index(marker):data.index(marker) + len(marker)] = b'"format_version": 9'
+    future = tmp_path / 'future.bundle'
+    future.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match='Unsupported bundle format 9'):
+        ModelBundle.open(str(future))
+
+
+def test_manifest_is_plain_json(bundle_path):
+    manifest = ModelBundle.open(bundle_path).manifest
+    assert json.loads(json.dumps(manifest)) == manifest
+    assert manifest['model']['num_boosted_rounds'] == 100
+    assert manifest['sections']['booster']['encoding'] == 'zlib'
@@ -0,0 +1,98 @@
+"""
+Tests for parallel, cached cross-validation in the model evaluator
+"""
+
+import os
+import pickle
+import warnings
+
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model_evaluation
+from features import FEATURE_COLUMNS
+from model_evaluation import HeartDiseaseModelEvaluator
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
+
+
+@pytest.fixture
+def evaluator(tmp_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(MODEL_PATH, 'rb') as f:
+            pipeline = pickle.load(f)
+    # Keep the folds quick to fit
+    pipeline.set_params(classifier__n_estimators=10)
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 2, size=(600, len(FEATURE_COLUMNS))).astype(float),
+                     columns=FEATURE_COLUMNS)
+    X['BMI'] = rng.uniform(15, 50, len(X)).round(1)
+    y = pd.Series(((X['HighBP'] + X['BMI'] / 40 + rng.uniform(0, 1, len(X))) > 1.8).astype(int))
+
+    evaluator = HeartDiseaseModelEvaluator(n_jobs=2, cache_dir=str(tmp_path / 'cache'))
+    evaluator.model, evaluator.X, evaluator.y = pipeline, X, y
+    evaluator.split_data()
+    evaluator.model.fit(evaluator.X_train, evaluator.y_train)
+    return evaluator
+
+
+def test_cross_validation_matches_sklearn_and_is_cached(evaluator, monkeypatch):
+    from sklearn.model_selection import cross_val_score
+    expected = cross_val_score(evaluator.model, evaluator.X, evaluator.y, cv=5, scoring='accuracy')
+
+    scores = evaluator.cross_validate(cv=5)
+    np.testing.assert_allclose(scores, expected)
+
+    # A fresh evaluator on the same model and data never refits
+    def refit(*args):
+        raise AssertionError('fold was refitted')
+    monkeypatch.setattr(model_evaluation, '_fit_and_score_fold', refit)
+    again = HeartDiseaseModelEvaluator(n_jobs=1, cache_dir=evaluator.cache_dir)
+    again.model, again.X, again.y = evaluator.model, evaluator.X, evaluator.y
+    np.testing.assert_array_equal(again.cross_validate(cv=5), scores)
+
+    # Different data is a different cache entry
+    again.y = 1 - evaluator.y
+    with pytest.raises(AssertionError, match='refitted'):
+        again.cross_validate(cv=5)
+
+
+def test_cache_key_follows_parameters_not_fitted_state(evaluator):
+    from sklearn.base import clone
+    key = evaluator._cv_cache_path(5, 'accuracy')
+    # An unfitted copy with the same parameters shares the cached folds
+    evaluator.model = clone(evaluator.model)
+    assert evaluator._cv_cache_path(5, 'accuracy') == key
+    evaluator.model.set_params(classifier__max_depth=2)
+    assert evaluator._cv_cache_path(5, 'accuracy') != key
+
+
+def test_report_without_a_split_does_not_crash(evaluator):
+    evaluator.X_test = None
+    evaluator._evaluation = None
+    assert evaluator.print_evaluation_report() is None
+
+
+def test_test_set_predictions_are_memoized(evaluator, monkeypatch):
+    first = evaluator.evaluate_model()
+    monkeypatch.setattr(evaluator.model, 'predict', lambda X: pytest.fail('predicted twice'))
+    assert evaluator.evaluate_model() is first
+
+    evaluator.split_data(random_state=1)
+    monkeypatch.undo()
+    assert evaluator.evaluate_model() is not first
+
+
+def test_importing_the_evaluator_loads_no_heavy_libraries():
+    code = ("import sys, model_evaluation; "
+            "print(sorted(m for m in ('matplotlib', 'seaborn', 'sklearn', 'pandas', 'xgboost') "
+            "if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(MODEL_PATH),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
@@ -0,0 +1,86 @@
+"""
+Tests for hot model reload and rollback
+"""
+
+import os
+import pickle
+import shutil
+import warnings
+
+import pytest
+
+from features import extract_features
+from model_registry import ModelRegistry
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / 'model.pkl'
+    shutil.copy(MODEL_PATH, path)
+    return str(path)
+
+
+def write_retrained(path, scale_factor):
+    """Write a variant of the model whose predictions differ measurably"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(MODEL_PATH, 'rb') as f:
+            pipeline = pickle.load(f)
+    scaler = pipeline.named_steps['preprocessor'].named_transformers_['scaler']
+    scaler.scale_ = scaler.scale_ * scale_factor
+    with open(path, 'wb') as f:
+        pickle.dump(pipeline, f)
+
+
+def probability(registry):
+    return registry.current.predict_proba_one(extract_features({'bmi': 38, 'age': 60}))
+
+
+def test_reload_swaps_and_rollback_restores(model_path):
+    registry = ModelRegistry(model_path, engine='fast', keep=3)
+    first = registry.load_initial()
+    before = probability(registry)
+
+    write_retrained(model_path, scale_factor=3.0)
+    second = registry.reload()
+    assert second is registry.current and second.number == 2
+    assert probability(registry) != before
+
+    assert registry.rollback() is first
+    assert probability(registry) == before
+    # Reloading the same file again reuses the already-validated version
+    assert registry.reload() is second
+
+
+def test_in_flight_requests_keep_their_version(model_path):
+    registry = ModelRegistry(model_path, engine='fast')
+    registry.load_initial()
+    in_flight = registry.current
+    write_retrained(model_path, scale_factor=3.0)
+    registry.reload_async().join()
+
+    assert registry.current is not in_flight
+    # The old version object still scores independently of the swap
+    assert in_flight.predict_proba_one(extract_features({})) >= 0
+
+
+def test_broken_model_is_rejected_and_old_version_keeps_serving(model_path):
+    registry = ModelRegistry(model_path, engine='fast')
+    original = registry.load_initial()
+    with open(model_path, 'wb') as f:
+        f.write(b'not a pickle')
+
+    assert registry.reload() is None
+    assert registry.current is original
+    assert registry.status()['last_error']
+
+
+def test_history_is_bounded(model_path):
+    registry = ModelRegistry(model_path, engine='fast', keep=2)
+    registry.load_initial()
+    for factor in (2.0, 3.0):
+        write_retrained(model_path, scale_factor=factor)
+        registry.reload()
+    assert [v['version'] for v in registry.status()['history']] == [2, 3]
@@ -0,0 +1,78 @@
+"""
+Tests for incremental (chunked, external-memory) training
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset import load_dataset
+from features import FEATURE_COLUMNS
+from inference import FastPredictor
+from pickle_generator import TARGET_COLUMN, split_indices, train_in_memory, train_incremental
+
+
+def write_dataset(path, n, seed):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.integers(0, 2, size=(n, len(FEATURE_COLUMNS))).astype(float),
+                     columns=FEATURE_COLUMNS)
+    X['BMI'] = rng.integers(15, 50, n).astype(float)
+    X['Age'] = rng.integers(1, 14, n).astype(float)
+    risk = X['HighBP'] + X['Age'] / 8 + X['BMI'] / 40 + rng.uniform(0, 1.5, n)
+    X.insert(0, TARGET_COLUMN, (risk > 2.6).astype(float))
+    X.to_csv(path, index=False)
+    return load_dataset(str(path))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    return write_dataset(tmp_path / 'heart_health.csv', 3000, seed=0)
+
+
+def test_incremental_training_matches_in_memory_scaling(dataset):
+    reference, rows = train_in_memory(dataset, nthread=1)
+    pipeline, incremental_rows = train_incremental(dataset, chunk_rows=500, rounds=20, nthread=1)
+    assert incremental_rows == rows == 2400
+
+    scaler = pipeline.named_steps['preprocessor'].named_transformers_['scaler']
+    expected = reference.named_steps['preprocessor'].named_transformers_['scaler']
+    np.testing.assert_allclose(scaler.mean_, expected.mean_)
+    np.testing.assert_allclose(scaler.scale_, expected.scale_)
+
+    # The saved pipeline is an ordinary sklearn pipeline the app can load
+    X, y = dataset.split(TARGET_COLUMN, dtype=np.float64)
+    _, test = split_indices(y)
+    probabilities = pipeline.predict_proba(X.iloc[test])[:, 1]
+    fast = FastPredictor.from_pipeline(pipeline).predict_proba(X.iloc[test].to_numpy())
+    np.testing.assert_allclose(fast, probabilities, atol=1e-6)
+    assert np.mean((probabilities > 0.5) == y.iloc[test]) > 0.8
+
+
+def test_continue_boosting_keeps_scaler_and_adds_rounds(dataset, tmp_path):
+    pipeline, _ = train_incremental(dataset, chunk_rows=1000, rounds=15, nthread=1)
+    saved = tmp_path / 'model.pkl'
+    with open(saved, 'wb') as f:
+        pickle.dump(pipeline, f)
+
+    new_data = write_dataset(tmp_path / 'new.csv', 1000, seed=1)
+    continued, rows = train_incremental(new_data, chunk_rows=300, continue_from=str(saved),
+                                        rounds=5, nthread=1)
+    assert rows == 800
+    classifier = continued.named_steps['classifier']
+    assert classifier.get_booster().num_boosted_rounds() == classifier.n_estimators == 20
+
+    scaler = continued.named_steps['preprocessor'].named_transformers_['scaler']
+    original = pipeline.named_steps['preprocessor'].named_transformers_['scaler']
+    np.testing.assert_array_equal(scaler.mean_, original.mean_)
+
+
+def test_incremental_training_without_external_memory_matrix(dataset, monkeypatch):
+    import xgboost as xgb
+
+    # XGBoost < 3.0 has no ExtMemQuantileDMatrix
+    monkeypatch.delattr(xgb, 'ExtMemQuantileDMatrix', raising=False)
+    pipeline, rows = train_incremental(dataset, chunk_rows=500, rounds=10, nthread=1)
+    assert rows == 2400
+    assert pipeline.named_steps['classifier'].get_booster().num_boosted_rounds() == 10
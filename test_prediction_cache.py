@@ -0,0 +1,152 @@
+"""
+Tests for the memoizing prediction cache
+"""
+
+import os
+import threading
+
+from features import FEATURE_COLUMNS
+from prediction_cache import PredictionCache, SQLiteCacheStore
+
+BMI = FEATURE_COLUMNS.index('BMI')
+
+
+def make_row(bmi=25.0, age=45.0):
+    row = [0.0] * len(FEATURE_COLUMNS)
+    row[BMI] = bmi
+    row[FEATURE_COLUMNS.index('Age')] = age
+    return row
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = 0
+        self.rows = []
+
+    def __call__(self, row):
+        self.calls += 1
+        self.rows.append(row)
+        return row[BMI] / 100
+
+
+def test_bmi_is_quantized_before_scoring_and_keying():
+    cache = PredictionCache(maxsize=16, bmi_precision=1)
+    model = CountingModel()
+
+    first = cache.get_or_compute(make_row(bmi=24.96), model)
+    second = cache.get_or_compute(make_row(bmi=25.04), model)
+
+    assert model.calls == 1
+    assert model.rows[0][BMI] == 25.0
+    assert first == second == 0.25
+    assert cache.stats()['hits'] == 1
+
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(maxsize=2)
+    model = CountingModel()
+    for age in (30, 40, 30, 50, 40):
+        cache.get_or_compute(make_row(age=age), model)
+
+    stats = cache.stats()
+    # 30 is refreshed before 50 arrives, so 40 is the one evicted
+    assert model.calls == 4
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 4, 2)
+    assert stats['size'] == 2
+
+
+def test_batch_lookup_scores_only_misses_in_one_call():
+    cache = PredictionCache(maxsize=16)
+    cache.get_or_compute(make_row(age=30), CountingModel())
+    batches = []
+
+    def score_batch(rows):
+        batches.append(len(rows))
+        return [0.5] * len(rows)
+
+    results = cache.get_or_compute_many([make_row(age=30), make_row(age=60), make_row(age=70)],
+                                        score_batch)
+    assert batches == [2]
+    assert results == [0.25, 0.5, 0.5]
+
+
+def test_batch_keys_match_single_rows_and_large_batches_skip_the_cache():
+    cache = PredictionCache(maxsize=16, max_batch_lookup=3)
+    rows = [make_row(bmi=24.96, age=30), make_row(bmi=-0.0, age=60), make_row(bmi=31.46)]
+    canonical = cache.canonical_matrix(rows)
+    assert canonical.tolist() == [cache.canonical_row(row) for row in rows]
+    assert cache.keys(canonical) == [cache.key(cache.canonical_row(row)) for row in rows]
+
+    scored = []
+
+    def score_batch(matrix):
+        scored.append(matrix[:, BMI].tolist())
+        return matrix[:, BMI] / 100
+
+    assert cache.get_or_compute_many(rows, score_batch) == [0.25, 0.0, 0.315]
+    # Over max_batch_lookup: canonical rows scored in one call, nothing looked up or stored
+    results = cache.get_or_compute_many(rows + rows[:1], score_batch)
+    assert results == [0.25, 0.0, 0.315, 0.25]
+    assert scored[-1] == [25.0, 0.0, 31.5, 25.0]
+    assert (cache.stats()['misses'], cache.stats()['size']) == (3, 3)
+
+
+def test_model_file_change_invalidates(tmp_path):
+    model_file = tmp_path / 'model.pkl'
+    model_file.write_bytes(b'v1')
+    cache = PredictionCache(maxsize=16, watch_paths=[str(model_file)], check_interval=0)
+    model = CountingModel()
+
+    cache.get_or_compute(make_row(), model)
+    cache.get_or_compute(make_row(), model)
+    model_file.write_bytes(b'v2-retrained')
+    os.utime(model_file, ns=(0, 10 ** 9))
+    cache.get_or_compute(make_row(), model)
+
+    assert model.calls == 2
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_sqlite_store_shares_results_between_caches(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    worker_a = PredictionCache(maxsize=16, store=SQLiteCacheStore(db_path))
+    worker_b = PredictionCache(maxsize=16, store=SQLiteCacheStore(db_path))
+    model = CountingModel()
+
+    worker_a.get_or_compute(make_row(), model)
+    assert worker_b.get_or_compute(make_row(), model) == 0.25
+    assert model.calls == 1
+    assert worker_b.stats()['store_hits'] == 1
+
+
+def test_disabled_cache_scores_the_same_canonical_rows():
+    cache = PredictionCache(maxsize=0)
+    model = CountingModel()
+    assert cache.get_or_compute(make_row(bmi=24.96), model) == 0.25
+    cache.get_or_compute(make_row(bmi=24.96), model)
+    assert model.calls == 2
+    assert model.rows[0][BMI] == 25.0
+    # Batches too: turning the cache off never changes an answer
+    enabled = PredictionCache(maxsize=16)
+    rows = [make_row(bmi=24.96), make_row(bmi=31.46)]
+    score = lambda matrix: [model(row) for row in matrix]
+    assert cache.get_or_compute_many(rows, score) == enabled.get_or_compute_many(rows, score)
+
+
+def test_concurrent_batches_keep_every_count():
+    cache = PredictionCache(maxsize=4096)
+    rows = [make_row(bmi=20 + i / 10) for i in range(50)]
+    score = lambda matrix: [row[BMI] / 100 for row in matrix]
+    cache.get_or_compute_many(rows, score)
+
+    def work():
+        for _ in range(200):
+            cache.get_or_compute_many(rows, score)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats['hits'] == 4 * 200 * 50 and stats['misses'] == 50
@@ -0,0 +1,102 @@
+"""
+Tests for bulk offline scoring
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from features import FEATURE_COLUMNS, extract_feature_matrix, extract_features
+from model_loader import load_model
+from score_file import score_file
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
+
+PATIENTS = [
+    {'id': 'p1', 'age': '61', 'bmi': '33.1', 'highbp': '1', 'highchol': '1', 'genhlth': '5'},
+    {'id': 'p2', 'age': '27', 'bmi': '', 'highbp': '0', 'highchol': '', 'genhlth': '1'},
+    {'id': 'p3', 'age': 'old', 'bmi': '25', 'highbp': '0', 'highchol': '0', 'genhlth': '3'},
+    {'id': 'p4', 'age': '45', 'bmi': 'nan', 'highbp': '1', 'highchol': '0', 'genhlth': '2'},
+    {'id': 'p5', 'age': '70', 'bmi': '28.4', 'highbp': '1', 'highchol': '1', 'genhlth': '4'}
+]
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return load_model(MODEL_PATH, engine='fast')
+
+
+def expected(record, predictor):
+    try:
+        return float(predictor.predict_proba([extract_features(record)])[0])
+    except ValueError:
+        return None
+
+
+def write_csv(path, records):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_feature_matrix_matches_extract_features():
+    columns = {key: [p[key] for p in PATIENTS] for key in PATIENTS[0]}
+    matrix, errors = extract_feature_matrix(columns, len(PATIENTS))
+    for i, record in enumerate(PATIENTS):
+        try:
+            assert matrix[i].tolist() == extract_features(record)
+        except ValueError as e:
+            assert errors[i] == str(e)
+    assert sorted(errors) == [2, 3]
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_csv_scoring_streams_chunks_in_order(tmp_path, predictor, workers):
+    source = tmp_path / 'patients.csv'
+    write_csv(source, PATIENTS * 3)
+    output = tmp_path / 'scores.csv'
+
+    rows, errors, _ = score_file(str(source), str(output), model_path=MODEL_PATH,
+                                 chunk_rows=4, workers=workers)
+    assert (rows, errors) == (15, 6)
+
+    results = read_csv(output)
+    assert [r['row'] for r in results] == [str(i) for i in range(15)]
+    for result, record in zip(results, PATIENTS * 3):
+        assert result['id'] == record['id']
+        probability = expected(record, predictor)
+        if probability is None:
+            assert result['error'] and not result['probability']
+        else:
+            assert float(result['probability']) == pytest.approx(probability, abs=1e-9)
+            assert int(result['prediction']) == int(probability > 0.5)
+
+
+def test_ndjson_with_brfss_columns_and_bad_lines(tmp_path, predictor):
+    rng = np.random.default_rng(3)
+    rows = rng.integers(0, 2, size=(6, len(FEATURE_COLUMNS))).astype(float)
+    rows[:, FEATURE_COLUMNS.index('BMI')] = rng.uniform(18, 45, 6).round(1)
+    rows[:, FEATURE_COLUMNS.index('Stroke')] = 0  # not a form field, so always scored as 0
+    for column in ('GenHlth', 'Age', 'Education', 'Income'):
+        rows[:, FEATURE_COLUMNS.index(column)] += 1  # these categories start at 1
+    source = tmp_path / 'patients.jsonl'
+    lines = [json.dumps(dict(zip(FEATURE_COLUMNS, row.tolist()))) for row in rows]
+    lines.insert(2, '{not json')
+    source.write_text('\n'.join(lines) + '\n')
+    output = tmp_path / 'scores.ndjson'
+
+    count, errors, _ = score_file(str(source), str(output), model_path=MODEL_PATH, chunk_rows=3)
+    assert (count, errors) == (7, 1)
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert 'line 3' in results[2]['error']
+    scored = [r['probability'] for r in results if 'probability' in r]
+    np.testing.assert_allclose(scored, predictor.predict_proba(rows), atol=1e-9)
@@ -0,0 +1,116 @@
+"""
+Tests for the NumPy-only compiled tree evaluator
+"""
+
+import os
+import pickle
+import shutil
+import warnings
+
+import numpy as np
+import pytest
+
+from export_trees import export_pipeline
+from features import FEATURE_COLUMNS
+from inference import FastPredictor
+from model_loader import file_sha256, load_model
+from tree_evaluator import CompiledTreePredictor
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best_heart_model.pkl')
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(MODEL_PATH, 'rb') as f:
+            return pickle.load(f)
+
+
+def random_rows(n, seed=3):
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, 2, size=(n, len(FEATURE_COLUMNS))).astype(np.float64)
+    rows[:, FEATURE_COLUMNS.index('BMI')] = rng.uniform(12, 60, n)
+    rows[:, FEATURE_COLUMNS.index('GenHlth')] = rng.integers(1, 6, n)
+    rows[:, FEATURE_COLUMNS.index('PhysHlth')] = rng.integers(0, 31, n)
+    rows[:, FEATURE_COLUMNS.index('Age')] = rng.integers(1, 14, n)
+    return rows
+
+
+def test_compiled_trees_match_booster(pipeline):
+    compiled = CompiledTreePredictor(export_pipeline(pipeline))
+    fast = FastPredictor.from_pipeline(pipeline)
+    rows = random_rows(5000)
+    # Missing values must follow each split's default direction
+    rows[::97, FEATURE_COLUMNS.index('BMI')] = np.nan
+
+    np.testing.assert_allclose(compiled.predict_proba(rows), fast.predict_proba(rows),
+                               rtol=0, atol=1e-6)
+    assert np.array_equal(compiled.predict(rows), fast.predict(rows))
+    assert compiled.predict_one(list(rows[0])) == fast.predict_one(list(rows[0]))
+
+
+def test_loader_ignores_stale_export(pipeline, tmp_path):
+    model_path = tmp_path / 'model.pkl'
+    shutil.copy(MODEL_PATH, model_path)
+    np.savez(tmp_path / 'model.npz', **export_pipeline(pipeline, file_sha256(model_path)))
+    assert isinstance(load_model(str(model_path)), CompiledTreePredictor)
+
+    np.savez(tmp_path / 'model.npz', **export_pipeline(pipeline, 'stale'))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        assert isinstance(load_model(str(model_path)), FastPredictor)
+        assert not isinstance(load_model(str(model_path)), CompiledTreePredictor)
+    # Asking for the compiled engine explicitly still uses it
+    assert isinstance(load_model(str(model_path), engine='trees'), CompiledTreePredictor)
+
+
+def test_export_without_iteration_indptr(pipeline, monkeypatch):
+    import export_trees
+
+    # Export only the first 60 rounds, as for a model with a best_iteration
+    from_pipeline = FastPredictor.from_pipeline
+
+    def early_stopped(pipeline):
+        fast = from_pipeline(pipeline)
+        fast.iteration_range = (0, 60)
+        return fast
+
+    monkeypatch.setattr(export_trees.FastPredictor, 'from_pipeline', early_stopped)
+    expected = export_pipeline(pipeline)
+    assert len(expected['roots']) == 60
+    loads = export_trees.json.loads
+
+    def old_format(raw):
+        # XGBoost < 2.0 model JSON
+        model = loads(raw)
+        del model['learner']['gradient_booster']['model']['iteration_indptr']
+        return model
+
+    monkeypatch.setattr(export_trees.json, 'loads', old_format)
+    exported = export_pipeline(pipeline)
+    assert exported.keys() == expected.keys()
+    for name in expected:
+        np.testing.assert_array_equal(exported[name], expected[name])
+
+
+def test_rows_near_the_threshold_use_the_booster(pipeline, tmp_path, monkeypatch):
+    import tree_evaluator
+
+    model_path = tmp_path / 'model.pkl'
+    shutil.copy(MODEL_PATH, model_path)
+    np.savez(tmp_path / 'model.npz', **export_pipeline(pipeline, file_sha256(model_path)))
+    compiled = load_model(str(model_path), engine='trees')
+    fast = FastPredictor.from_pipeline(pipeline)
+    rows = random_rows(200)
+    approximate = compiled.predict_proba(rows)
+    assert compiled.exact_rows == 0
+
+    # Widen the band so that some rows fall inside it
+    band = np.sort(np.abs(approximate - 0.5))[50]
+    monkeypatch.setattr(tree_evaluator, 'EXACT_TOLERANCE', band)
+    near = np.abs(approximate - 0.5) < band
+    probabilities = compiled.predict_proba(rows)
+    assert compiled.exact_rows == near.sum() == 50
+    np.testing.assert_array_equal(probabilities[near], fast.predict_proba(rows)[near])
+    np.testing.assert_array_equal(probabilities[~near], approximate[~near])
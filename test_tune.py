@@ -0,0 +1,49 @@
+"""
+Tests for the ASHA hyperparameter search
+"""
+
+import numpy as np
+
+from test_pickle_generator import write_dataset
+from tune import ASHA, objective, rung_rounds, tune
+
+
+def test_rungs_grow_by_eta():
+    assert rung_rounds(20, 540, 3) == [20, 60, 180, 540]
+    assert rung_rounds(10, 100, 3) == [10, 30, 90]
+
+
+def test_asha_promotes_only_the_top_third():
+    search = ASHA(n_trials=9, rounds=[1, 3, 9], eta=3, latency_weight=0.1)
+    # Nine workers start a trial each before any result is in
+    jobs = [search.next_job() for _ in range(9)]
+    assert [rung for _, _, rung in jobs] == [0] * 9
+    quality = {trial: params['learning_rate'] for trial, params, _ in jobs}
+    for trial in quality:
+        search.report(0, {'trial': trial, 'auc': quality[trial], 'latency_us': 100.0})
+
+    # Trials are exhausted: the remaining jobs are the 3 best trials, then the best of those
+    promoted = [search.next_job() for _ in range(3)]
+    assert search.next_job() is None
+    ranked = sorted(quality, key=quality.get, reverse=True)
+    assert sorted(trial for trial, _, _ in promoted) == sorted(ranked[:3])
+    assert all(rung == 1 for _, _, rung in promoted)
+    for trial, _, _ in promoted:
+        search.report(1, {'trial': trial, 'auc': quality[trial], 'latency_us': 100.0})
+    assert search.next_job()[::2] == (ranked[0], 2)
+
+
+def test_objective_trades_auc_for_latency():
+    assert objective(0.85, 0.0, 0.1) == 0.85
+    assert np.isclose(objective(0.85, 500.0, 0.1), 0.80)
+
+
+def test_search_picks_a_top_rung_trial(tmp_path):
+    write_dataset(tmp_path / 'heart_health.csv', 2000, seed=0)
+    log = tmp_path / 'trials.jsonl'
+    params, best, preprocessor = tune(str(tmp_path / 'heart_health.csv'), n_trials=4, workers=1,
+                                      min_rounds=2, max_rounds=6, eta=3, log=str(log))
+    assert best['rounds'] == 6 and best['auc'] > 0.8
+    assert set(params) >= {'max_depth', 'learning_rate'}
+    assert preprocessor.named_transformers_['scaler'].n_samples_seen_ == 1280
+    assert len(log.read_text().splitlines()) == 5
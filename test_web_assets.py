@@ -0,0 +1,94 @@
+"""
+Tests for the pre-rendered page shell and the fingerprinted asset build
+"""
+
+import gzip
+import json
+import os
+import re
+
+import pytest
+from jinja2.utils import htmlsafe_json_dumps
+from werkzeug.http import parse_accept_header
+
+import app as webapp
+from features import risk_label
+from web_assets import MANIFEST_NAME, AssetManifest, PageShell, choose_encoding, encoded_variants
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    root = tmp_path / 'static'
+    (root / 'css').mkdir(parents=True)
+    (root / 'css' / 'site.css').write_text('body { color: red; }\n' * 100)
+    (root / 'tiny.js').write_text('let a = 1;')
+    return root
+
+
+def test_build_fingerprints_and_precompresses(static_dir):
+    out = static_dir / 'dist'
+    manifest = AssetManifest.load_or_build(str(static_dir), str(out))
+    url = manifest.url('css/site.css')
+    assert re.fullmatch(r'/assets/css/site\.[0-9a-f]{12}\.css', url)
+    asset = manifest.get(url[len('/assets/'):])
+    assert asset.content_type == 'text/css; charset=utf-8'
+    assert gzip.decompress(asset.variants['gzip']) == asset.variants[None]
+    assert os.path.exists(out / (url[len('/assets/'):] + '.gz'))
+    # Too small to be worth compressing; the build directory is not an input
+    assert list(manifest.get(manifest.url('tiny.js')[len('/assets/'):]).variants) == [None]
+    assert manifest.url('dist/' + MANIFEST_NAME) is None
+
+    # A changed source gets a new name; the old copy stays for pages that link to it
+    (static_dir / 'css' / 'site.css').write_text('body { color: blue; }\n' * 100)
+    rebuilt = AssetManifest.load_or_build(str(static_dir), str(out))
+    assert rebuilt.url('css/site.css') != url
+    assert os.path.exists(out / url[len('/assets/'):])
+
+
+def test_encoding_follows_accept_encoding():
+    variants = encoded_variants(b'x' * 4096)
+    assert choose_encoding(variants, parse_accept_header('gzip, br')) in ('br', 'gzip')
+    assert choose_encoding(variants, parse_accept_header('gzip')) == 'gzip'
+    assert choose_encoding(variants, parse_accept_header('br;q=0, gzip')) == 'gzip'
+    assert choose_encoding(variants, parse_accept_header('identity')) is None
+
+
+def test_shell_only_fills_in_the_prediction():
+    renders = []
+
+    def render(prediction):
+        renders.append(prediction)
+        return f"<p>head</p><script>x = {htmlsafe_json_dumps(prediction)};</script>"
+
+    shell = PageShell(render, common=(None, 'Low'))
+    assert shell.html(None) == '<p>head</p><script>x = null;</script>'
+    assert shell.html("'</script>") == '<p>head</p><script>x = "\\u0027\\u003c/script\\u003e";</script>'
+    assert shell.page('Low') is shell.page('Low')
+    assert list(shell.page('other').variants) == [None]
+    assert len(renders) == 1
+
+
+def test_index_serves_the_shell_and_immutable_assets():
+    client = webapp.app.test_client()
+    page = client.get('/')
+    html = page.get_data(as_text=True)
+    assert 'window.serverPrediction = null;' in html
+
+    compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == page.data
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    etag = compressed.headers['ETag'].strip('"')
+    assert client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+    posted = client.post('/', data={'age': 63, 'bmi': 27.4, 'highbp': 1}).get_data(as_text=True)
+    prediction = re.search(r'serverPrediction = (.*);', posted).group(1)
+    assert json.loads(prediction) in (risk_label(0), risk_label(1))
+    assert posted.replace(prediction, 'null') == html
+
+    for url in re.findall(r'"(/assets/[^"]+)"', html):
+        asset = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert asset.status_code == 200
+        assert asset.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert asset.headers['Content-Encoding'] == 'gzip'
+    assert client.get('/assets/js/main.000000000000.js').status_code == 404
@@ -0,0 +1,120 @@
+"""
+NumPy-only evaluator for a compiled XGBoost tree ensemble.
+
+``export_trees.py`` flattens every tree of the trained booster into shared
+node arrays (feature, threshold, left, right, default_left, value) and
+saves them with the scaler layout to ``best_heart_model.npz``. This module
+scores rows from those arrays without importing xgboost, sklearn or pandas,
+so a serving process only needs NumPy.
+
+Rows are scored by walking all trees at once: a (rows x trees) matrix of
+node indices is advanced one level per step with vectorized gathers.
+Leaves point back at themselves, so the walk simply runs for the depth of
+the deepest tree.
+
+The walk sums leaf values in a different order than XGBoost, so its
+probabilities agree with the booster only to about 1e-6. A row that close
+to the decision threshold could get the other label, so when the model
+file is at hand such rows are scored again by the booster itself (loaded
+on first need), and labels always match XGBoost's.
+"""
+
+import threading
+
+import numpy as np
+
+from inference import DECISION_THRESHOLD, FastPredictor
+
+FORMAT_VERSION = 1
+
+# Bound the (rows x trees) node matrix so large batches are scored in chunks
+MAX_CHUNK_ROWS = 2048
+# Rows this close to DECISION_THRESHOLD are re-scored by the exact booster
+EXACT_TOLERANCE = 1e-5
+
+
+class CompiledTreePredictor(FastPredictor):
+    """Score rows from exported tree arrays using only NumPy"""
+
+    def __init__(self, arrays, exact=None):
+        """``exact`` returns the FastPredictor of the same model, for rows near the threshold"""
+        version = int(arrays['format_version'])
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported tree export version {version}")
+        objective = str(arrays['objective'])
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported objective {objective!r}")
+
+        super().__init__(
+            booster=None,
+            order=arrays['order'],
+            mean=arrays['mean'],
+            scale=arrays['scale'],
+            missing=float(arrays['missing'])
+        )
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.default_left = arrays['default_left']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.base_margin = float(arrays['base_margin'])
+        self.source_sha256 = str(arrays['source_sha256'])
+        self.exact_rows = 0
+        self.exact = exact
+        self._exact_cached = None
+        self._exact_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Load an export written by ``export_trees.py``"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def exact_predictor(self):
+        """The booster-backed predictor, loaded on first use; None if there is none"""
+        if self._exact_cached is None and self.exact is not None:
+            with self._exact_lock:
+                if self._exact_cached is None and self.exact is not None:
+                    try:
+                        self._exact_cached = self.exact()
+                    except Exception as e:
+                        print(f"Exact scoring near the threshold unavailable: {type(e).__name__}: {e}")
+                        self.exact = None
+        return self._exact_cached
+
+    def predict_margin(self, matrix):
+        """Raw ensemble margin for already-scaled float32 rows"""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if not np.isnan(self.missing):
+            matrix = np.where(matrix == self.missing, np.float32(np.nan), matrix)
+        has_missing = bool(np.isnan(matrix).any())
+        margins = np.empty(len(matrix), dtype=np.float64)
+        for start in range(0, len(matrix), MAX_CHUNK_ROWS):
+            chunk = matrix[start:start + MAX_CHUNK_ROWS]
+            margins[start:start + len(chunk)] = self._margin_chunk(chunk, has_missing)
+        return margins
+
+    def _margin_chunk(self, matrix, has_missing):
+        # Index into the flattened chunk: row offset + feature of the current node
+        flat = matrix.ravel()
+        row_offsets = (np.arange(len(matrix), dtype=np.intp) * matrix.shape[1])[:, None]
+        nodes = np.repeat(self.roots[None, :], len(matrix), axis=0)
+        for _ in range(self.max_depth):
+            x = flat.take(row_offsets + self.feature.take(nodes))
+            go_left = x < self.threshold.take(nodes)
+            if has_missing:
+                go_left |= np.isnan(x) & self.default_left.take(nodes)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        return self.value.take(nodes).sum(axis=1, dtype=np.float64) + self.base_margin
+
+    def _predict_matrix(self, matrix):
+        probabilities = 1.0 / (1.0 + np.exp(-self.predict_margin(matrix)))
+        if self.exact is not None:
+            near = np.abs(probabilities - DECISION_THRESHOLD) < EXACT_TOLERANCE
+            if near.any() and self.exact_predictor() is not None:
+                probabilities[near] = self._exact_cached._predict_matrix(matrix[near])
+                self.exact_rows += int(near.sum())
+        return probabilities
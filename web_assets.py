@@ -0,0 +1,258 @@
+"""
+Pre-rendered page shell and fingerprinted, precompressed static assets.
+
+The assessment page is the same for every visitor apart from the
+prediction, so ``PageShell`` renders the template once, with a marker
+where the prediction goes, and keeps the HTML before and after it. A
+request only encodes its prediction and joins the three pieces. The
+pages for the possible model outcomes (and the empty form) are built up
+front together with their gzip and Brotli encodings and an ETag; other
+messages (input errors) are joined per request and sent uncompressed.
+
+Static files are copied into a build directory under content-hashed
+names (``css/main.<sha256[:12]>.css``) with ``.gz`` and ``.br`` variants
+next to them, and a manifest maps each source path to its copy. A
+fingerprinted URL never changes content, so it is served with an
+immutable one-year ``Cache-Control``; the next deploy links to new names.
+``AssetManifest`` holds the files in memory and picks the smallest
+encoding the client's ``Accept-Encoding`` allows. Brotli needs the
+optional ``brotli`` package; without it only gzip variants are made.
+
+Run the build at deploy time so workers start without compressing:
+
+    python web_assets.py build [--static static] [--out static/dist]
+
+If the manifest is missing or older than the sources, the app rebuilds
+it on first use, and if that fails too it links to the plain ``/static``
+files instead.
+
+Environment overrides:
+    CARDIOCHECK_ASSET_DIR   build directory (default static/dist; '' to
+                            serve plain /static files)
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import secrets
+
+from jinja2.utils import htmlsafe_json_dumps
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+# Content-Encoding token and file suffix, most compact first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+# Below this the encoding headers cost more than compression saves
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compress(data, encoding):
+    """``data`` in ``encoding`` ('gzip' or 'br') at the best ratio, or None if unavailable"""
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical between builds
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    brotli = _brotli()
+    return brotli.compress(data, quality=11) if brotli is not None else None
+
+
+def encoded_variants(data, compressible=True):
+    """{encoding: bytes}: the identity body (key None) plus each encoding that makes it smaller"""
+    variants = {None: data}
+    if compressible and len(data) >= MIN_COMPRESS_BYTES:
+        for encoding, _ in ENCODINGS:
+            encoded = compress(data, encoding)
+            if encoded is not None and len(encoded) < len(data):
+                variants[encoding] = encoded
+    return variants
+
+
+def choose_encoding(variants, accept_encodings):
+    """Smallest variant the client accepts; ``accept_encodings`` is werkzeug's parsed header"""
+    acceptable = [encoding for encoding in variants
+                  if encoding is not None and accept_encodings.quality(encoding) > 0]
+    return min(acceptable, key=lambda encoding: len(variants[encoding]), default=None)
+
+
+def fingerprinted_name(path, digest):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:12]}{ext}"
+
+
+def _source_files(static_dir, out_dir):
+    skip = os.path.abspath(out_dir)
+    for directory, dirnames, filenames in os.walk(static_dir):
+        dirnames[:] = sorted(d for d in dirnames
+                             if os.path.abspath(os.path.join(directory, d)) != skip)
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            yield os.path.relpath(path, static_dir).replace(os.sep, '/'), path
+
+
+def _source_signature(static_dir, out_dir):
+    """(path, size, mtime) of every source file, to tell whether a build is stale"""
+    signature = []
+    for name, path in _source_files(static_dir, out_dir):
+        stat = os.stat(path)
+        signature.append([name, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_assets(static_dir, out_dir):
+    """Write fingerprinted copies and their encodings of every file under ``static_dir``.
+
+    Returns the manifest, also written to ``out_dir/manifest.json``. Copies
+    from earlier builds are left in place for pages that still link to them.
+    """
+    files = {}
+    signature = _source_signature(static_dir, out_dir)
+    for name, path in _source_files(static_dir, out_dir):
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        target = fingerprinted_name(name, digest)
+        variants = encoded_variants(data, name.endswith(COMPRESSIBLE))
+        for encoding, body in variants.items():
+            suffix = dict(ENCODINGS).get(encoding, '')
+            _write_atomic(os.path.join(out_dir, target + suffix), body)
+        files[name] = {
+            'path': target,
+            'sha256': digest,
+            'bytes': {encoding or 'identity': len(body) for encoding, body in variants.items()}
+        }
+    manifest = {'format_version': FORMAT_VERSION, 'sources': signature, 'files': files}
+    _write_atomic(os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=1).encode())
+    return manifest
+
+
+class Asset:
+    """One fingerprinted file held in memory with its encodings"""
+
+    def __init__(self, name, sha256, variants):
+        self.name = name
+        self.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type.endswith('javascript'):
+            self.content_type += '; charset=utf-8'
+        self.sha256 = sha256
+        self.variants = variants
+
+
+class AssetManifest:
+    """Fingerprinted URLs of the static files and their in-memory encodings"""
+
+    def __init__(self, files, url_prefix='/assets/'):
+        self.url_prefix = url_prefix
+        self._urls = {name: url_prefix + asset_path for name, (asset_path, _) in files.items()}
+        self._assets = {asset_path: asset for asset_path, asset in files.values()}
+
+    @classmethod
+    def load(cls, out_dir, url_prefix='/assets/'):
+        """Read a build from ``out_dir``"""
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        files = {}
+        for name, entry in manifest['files'].items():
+            variants = {}
+            for encoding in [None] + [encoding for encoding, _ in ENCODINGS]:
+                if (encoding or 'identity') in entry['bytes']:
+                    suffix = dict(ENCODINGS).get(encoding, '')
+                    with open(os.path.join(out_dir, entry['path'] + suffix), 'rb') as f:
+                        variants[encoding] = f.read()
+            files[name] = (entry['path'], Asset(name, entry['sha256'], variants))
+        return cls(files, url_prefix)
+
+    @classmethod
+    def load_or_build(cls, static_dir, out_dir, url_prefix='/assets/'):
+        """The build in ``out_dir``, rebuilt first if it is missing or older than ``static_dir``"""
+        manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+        fresh = False
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            fresh = (manifest.get('format_version') == FORMAT_VERSION and
+                     manifest['sources'] == _source_signature(static_dir, out_dir))
+        if not fresh:
+            print(f"Building static assets into {out_dir}; run web_assets.py build at deploy time")
+            build_assets(static_dir, out_dir)
+        return cls.load(out_dir, url_prefix)
+
+    def url(self, name):
+        """Fingerprinted URL of a static file, or None if it is not part of the build"""
+        return self._urls.get(name)
+
+    def get(self, asset_path):
+        """Asset for a fingerprinted path (the part of the URL after the prefix), or None"""
+        return self._assets.get(asset_path)
+
+
+class Page:
+    """A fully rendered response body; prebuilt pages also carry their encodings and ETag"""
+
+    def __init__(self, html, prebuilt=True):
+        body = html.encode('utf-8')
+        self.variants = encoded_variants(body) if prebuilt else {None: body}
+        self.etag = hashlib.sha256(body).hexdigest()[:32] if prebuilt else None
+
+
+class PageShell:
+    """A template rendered once, with the prediction filled in per request"""
+
+    def __init__(self, render, common=(None,)):
+        """``render(prediction)`` renders the template; ``common`` predictions get prebuilt pages"""
+        # The template writes the prediction with |tojson, so it appears JSON-encoded
+        marker = f"cardiocheck-prediction-{secrets.token_hex(8)}"
+        html = render(marker)
+        encoded_marker = str(htmlsafe_json_dumps(marker))
+        if html.count(encoded_marker) != 1:
+            raise ValueError('The template must output the prediction exactly once, with |tojson')
+        self._head, self._tail = html.split(encoded_marker)
+        self._pages = {prediction: Page(self.html(prediction)) for prediction in common}
+
+    def html(self, prediction):
+        """The page for ``prediction``, without rendering the template again"""
+        # str(): joining a Markup would escape the shell
+        return self._head + str(htmlsafe_json_dumps(prediction)) + self._tail
+
+    def page(self, prediction):
+        """Prebuilt Page for a common prediction, or an uncompressed one built now"""
+        page = self._pages.get(prediction)
+        return page if page is not None else Page(self.html(prediction), prebuilt=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='fingerprint and precompress the static files')
+    build.add_argument('--static', default='static')
+    build.add_argument('--out', default=os.path.join('static', 'dist'))
+    args = parser.parse_args()
+
+    manifest = build_assets(args.static, args.out)
+    for name, entry in manifest['files'].items():
+        sizes = ', '.join(f"{encoding} {size / 1024:.1f} KB" for encoding, size in entry['bytes'].items())
+        print(f"{name:28s} -> {entry['path']:36s} {sizes}")
+    print(f"Wrote {len(manifest['files'])} assets to {args.out}")
+
+
+if __name__ == '__main__':
+    main()